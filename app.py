@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import logging
 import time
@@ -6,13 +6,29 @@ import threading
 import os
 from datetime import datetime
 import json
+from werkzeug.http import dump_options_header
 from werkzeug.utils import secure_filename
 import tempfile
+import heapq
+import itertools
 
 # 导入爬虫模块
-from sehuatang_crawler import SehuatangCrawler
+from async_crawler import create_crawler
 from proxy_config import proxy_config
-from scheduler import task_scheduler
+from crawler_config import crawler_config, validate_config
+from scheduler import task_scheduler, OVERLAP_POLICIES
+from driver_pool import driver_pool
+from result_writer import partial_path
+from checkpoint import CrawlCheckpoint, checkpoint_path
+from result_store import result_store
+from job_queue import job_queue
+from http_cache import http_cache
+from task_log import TaskLog, recent_logs
+from task_events import task_events
+from task_registry import task_registry
+from task_history import ACTIVE_STATUSES, task_history
+from shared_state import PROCESS_ID, LeaderElection
+from work_queue import work_queue
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 CORS(app)  # 允许跨域请求
@@ -23,28 +39,71 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# 全局变量存储爬取任务状态
-crawl_tasks = {}
-task_counter = 0
+# 爬取任务保存在全局任务表 task_registry 中，已结束的任务写入历史记录后按保留时间从内存中淘汰
+# 多进程部署时由持有领导锁的进程运行定时任务调度器
+scheduler_election = None
 
 class CrawlTask:
-    def __init__(self, task_id, theme_id, mode, start_page, end_page, proxy, output_file):
+    def __init__(self, task_id, theme_id, mode, start_page, end_page, proxy, output_file, incremental=False,
+                 stop_after_known_pages=None, resume=False, themes=None):
         self.task_id = task_id
+        self.registry = None  # 登记到的任务表，状态变化时更新其索引
         self.theme_id = theme_id
         self.mode = mode
         self.start_page = start_page
         self.end_page = end_page
         self.proxy = proxy
         self.output_file = output_file
-        self.status = "pending"  # pending, running, completed, failed
+        self.incremental = incremental
+        self.stop_after_known_pages = stop_after_known_pages
+        self.resume = resume  # 从检查点继续爬取
+        self.themes = themes  # 多主题任务: [{"theme_id", "start_page", "end_page"}]
+        self.theme_stats = []  # 多主题任务中各主题的统计
+        self._status = "pending"  # pending, queued, running, completed, failed, cancelled
         self.progress = 0
         self.total_links = 0
         self.found_links = 0
+        self.new_links = 0  # 结果库中首次收录的链接数
         self.error_message = ""
+        self.created_at = datetime.now()
         self.start_time = None
         self.end_time = None
         self.thread = None
-        self.logs = []
+        self.crawler = None
+        self.logs = TaskLog()  # 与爬虫实例共用的日志缓冲区
+        self.logs.listener = lambda: task_events.publish(task_id)
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        old_status, self._status = self._status, value
+        if self.registry:
+            self.registry.status_changed(self, old_status)
+        task_events.publish(self.task_id)
+
+    def snapshot(self):
+        """写入任务记录的内容：状态字典(含 output_file)和缓冲区中的日志"""
+        return dict(self.to_dict(), output_file=self.output_file), self.logs.since(0, self.logs.max_size)["entries"]
+
+    def finish(self):
+        """任务结束，写入任务记录"""
+        task_registry.finish(self)
+
+    def request_cancel(self):
+        """取消任务：排队中的任务直接移出队列并返回 "dequeued"，运行中的任务请求爬虫停止并返回 "requested"，
+        任务未在运行时返回 None"""
+        if self.status == "queued" and job_queue.cancel(self.task_id):
+            self.status = "cancelled"
+            self.end_time = datetime.now()
+            self.finish()
+            return "dequeued"
+        if self.status not in ("pending", "running") or not self.crawler:
+            return None
+        self.crawler.cancel()
+        return "requested"
 
     def to_dict(self):
         return {
@@ -54,14 +113,20 @@ class CrawlTask:
             "start_page": self.start_page,
             "end_page": self.end_page,
             "proxy": self.proxy,
+            "incremental": self.incremental,
+            "themes": self.themes,
+            "theme_stats": self.theme_stats,
             "status": self.status,
+            "queue_position": job_queue.position(self.task_id) if self.status == "queued" else 0,
             "progress": self.progress,
             "total_links": self.total_links,
             "found_links": self.found_links,
+            "new_links": self.new_links,
             "error_message": self.error_message,
+            "created_at": self.created_at.isoformat(),
             "start_time": self.start_time.isoformat() if self.start_time else None,
             "end_time": self.end_time.isoformat() if self.end_time else None,
-            "logs": self.logs
+            "log_count": self.logs.last_seq
         }
 
 def crawl_worker(task):
@@ -71,40 +136,61 @@ def crawl_worker(task):
         task.start_time = datetime.now()
         
         # 创建爬虫实例，传入代理设置
-        crawler = SehuatangCrawler(proxy=task.proxy)
+        crawler = create_crawler(proxy=task.proxy)
+        crawler.logs = task.logs
+        task.crawler = crawler
         
         # 设置进度回调
         def progress_callback(current, total, found):
             task.progress = int((current / total) * 100) if total > 0 else 0
             task.total_links = total
             task.found_links = found
+            task_events.publish(task.task_id)
         
         crawler.set_progress_callback(progress_callback)
         
-        # 开始爬取
-        result = crawler.crawl(
-            theme_id=task.theme_id,
-            mode=task.mode,
-            start_page=task.start_page,
-            end_page=task.end_page,
-            output_file=task.output_file
-        )
+        # 开始爬取，多主题任务共用同一个爬虫实例
+        if task.themes:
+            result = crawler.crawl_themes(
+                task.themes,
+                mode=task.mode,
+                output_file=task.output_file,
+                incremental=task.incremental,
+                stop_after_known_pages=task.stop_after_known_pages,
+                resume=task.resume,
+                task_id=task.task_id
+            )
+        else:
+            result = crawler.crawl(
+                theme_id=task.theme_id,
+                mode=task.mode,
+                start_page=task.start_page,
+                end_page=task.end_page,
+                output_file=task.output_file,
+                incremental=task.incremental,
+                stop_after_known_pages=task.stop_after_known_pages,
+                resume=task.resume,
+                task_id=task.task_id
+            )
         
         if result["success"]:
             task.status = "completed"
             task.found_links = result["magnet_count"]
-            task.logs = result.get("logs", [])
+            task.new_links = result.get("new_magnet_count", 0)
+            task.theme_stats = result.get("themes", [])
         else:
-            task.status = "failed"
+            task.status = "cancelled" if result.get("cancelled") else "failed"
             task.error_message = result["error"]
-            task.logs = result.get("logs", [])
             
     except Exception as e:
         task.status = "failed"
         task.error_message = str(e)
         logging.error(f"爬取任务 {task.task_id} 失败: {str(e)}")
     finally:
+        task.crawler = None
         task.end_time = datetime.now()
+        task.finish()
+        task_events.publish(task.task_id)
 
 @app.route('/api/themes', methods=['GET'])
 def get_themes():
@@ -136,8 +222,6 @@ def get_themes():
 @app.route('/api/crawl', methods=['POST'])
 def start_crawl():
     """开始爬取任务"""
-    global task_counter
-    
     try:
         data = request.get_json()
         theme_id = data.get('theme_id')
@@ -145,6 +229,23 @@ def start_crawl():
         start_page = data.get('start_page', 1)
         end_page = data.get('end_page', 1)
         proxy = data.get('proxy', '')  # 代理设置
+        incremental = bool(data.get('incremental', False))  # 增量模式: 跳过已抓取过的帖子
+        stop_after_known_pages = data.get('stop_after_known_pages')  # 增量模式下连续多少页全为旧帖时停止
+        
+        # 多主题任务: theme_ids 为主题ID列表，或 themes 为带各自页码范围的主题列表
+        themes = data.get('themes') or data.get('theme_ids')
+        if themes:
+            themes = [
+                {"theme_id": str(t.get('theme_id')), "start_page": t.get('start_page', start_page),
+                 "end_page": t.get('end_page', end_page)} if isinstance(t, dict)
+                else {"theme_id": str(t), "start_page": start_page, "end_page": end_page}
+                for t in themes
+            ]
+            if any(t["start_page"] > t["end_page"] for t in themes):
+                return jsonify({"success": False, "error": "起始页不能大于结束页"}), 400
+            theme_id = ",".join(t["theme_id"] for t in themes)
+            start_page = min(t["start_page"] for t in themes)
+            end_page = max(t["end_page"] for t in themes)
         
         if not theme_id:
             return jsonify({"success": False, "error": "缺少主题ID"}), 400
@@ -153,24 +254,28 @@ def start_crawl():
             return jsonify({"success": False, "error": "起始页不能大于结束页"}), 400
         
         # 生成任务ID和输出文件名
-        task_counter += 1
-        task_id = f"task_{task_counter}_{int(time.time())}"
+        task_id = task_registry.next_task_id()
         output_file = f"magnet_links_{task_id}.txt"
         
         # 创建任务
-        task = CrawlTask(task_id, theme_id, mode, start_page, end_page, proxy, output_file)
-        crawl_tasks[task_id] = task
+        task = CrawlTask(task_id, theme_id, mode, start_page, end_page, proxy, output_file, incremental,
+                         stop_after_known_pages, themes=themes)
+        task_registry.add(task)
         
-        # 启动后台线程
-        task.thread = threading.Thread(target=crawl_worker, args=(task,))
-        task.thread.daemon = True
-        task.thread.start()
+        # 加入任务队列，达到并发上限时排队，队列已满时拒绝
+        task.status = "queued"
+        position = job_queue.submit(task_id, crawl_worker, (task,))
+        if position is None:
+            task_registry.remove(task_id)
+            return jsonify({"success": False, "error": "任务队列已满，请稍后再试"}), 429
         
         return jsonify({
             "success": True,
             "task_id": task_id,
-            "message": "爬取任务已启动"
-        })
+            "queued": position > 0,
+            "queue_position": position,
+            "message": f"任务已加入队列，前面还有 {position - 1} 个任务" if position else "爬取任务已启动"
+        }), 202 if position else 200
         
     except Exception as e:
         logging.error(f"启动爬取任务失败: {str(e)}")
@@ -178,58 +283,333 @@ def start_crawl():
 
 @app.route('/api/tasks/<task_id>', methods=['GET'])
 def get_task_status(task_id):
-    """获取任务状态"""
-    if task_id not in crawl_tasks:
+    """获取任务状态，已从内存淘汰的任务从历史记录中读取"""
+    task = task_registry.get(task_id)
+    record = task.to_dict() if task else task_history.get(task_id)
+    if not record:
         return jsonify({"success": False, "error": "任务不存在"}), 404
     
-    task = crawl_tasks[task_id]
     return jsonify({
         "success": True,
-        "data": task.to_dict()
+        "data": record
+    })
+
+@app.route('/api/tasks/<task_id>/logs', methods=['GET'])
+def get_task_logs(task_id):
+    """增量获取任务日志，after 为上次返回的 next 游标"""
+    after = max(0, request.args.get('after', 0, type=int))
+    limit = min(2000, max(1, request.args.get('limit', 500, type=int)))
+    task = task_registry.get(task_id)
+    if task:
+        logs = task.logs.since(after, limit)
+    else:
+        # 已从内存淘汰的任务读取结束时保存的日志
+        entries = task_history.get_logs(task_id)
+        if entries is None:
+            return jsonify({"success": False, "error": "任务不存在"}), 404
+        last_seq = entries[-1]["seq"] if entries else 0
+        entries = [entry for entry in entries if entry["seq"] > after][:limit]
+        logs = {"entries": entries, "next": entries[-1]["seq"] if entries else max(after, last_seq),
+                "last_seq": last_seq, "dropped": 0}
+    return jsonify({
+        "success": True,
+        "data": logs["entries"],
+        "next": logs["next"],
+        "last_seq": logs["last_seq"],
+        "dropped": logs["dropped"]
+    })
+
+@app.route('/api/tasks/<task_id>/resume', methods=['POST'])
+def resume_task(task_id):
+    """从检查点继续中断的爬取任务"""
+    try:
+        task = task_registry.get(task_id)
+        record = task_history.get(task_id) if not task else None
+        status = task.status if task else (record or {}).get("status")
+        if status in ("pending", "queued", "running"):
+            return jsonify({"success": False, "error": "任务正在运行"}), 400
+        if status == "completed":
+            return jsonify({"success": False, "error": "任务已完成"}), 400
+        
+        if task:
+            output_file = task.output_file
+        else:
+            output_file = (record or {}).get("output_file") or f"magnet_links_{task_id}.txt"
+        checkpoint = CrawlCheckpoint.read(output_file)
+        if not checkpoint:
+            return jsonify({"success": False, "error": "没有可继续的检查点"}), 404
+        
+        # 服务重启或任务已从内存淘汰时，按检查点中保存的参数重建
+        rebuilt = not task
+        if rebuilt:
+            params = checkpoint.get("params", {})
+            themes = params.get("themes")
+            task = CrawlTask(task_id, params.get("theme_id"), params.get("mode", "1"),
+                             params.get("start_page", 1), params.get("end_page", 1), params.get("proxy"),
+                             output_file, params.get("incremental", False), params.get("stop_after_known_pages"),
+                             themes=themes)
+            if themes:
+                task.theme_id = ",".join(t["theme_id"] for t in themes)
+                task.start_page = min(t["start_page"] for t in themes)
+                task.end_page = max(t["end_page"] for t in themes)
+            if record:
+                task.created_at = datetime.fromisoformat(record["created_at"])
+            task_registry.add(task)
+        
+        # 提交后工作线程可能立即开始运行，需要重置的状态在提交前设置
+        previous = (task.status, task.resume, task.error_message, task.end_time)
+        task.resume = True
+        task.error_message = ""
+        task.end_time = None
+        task.status = "queued"
+        position = job_queue.submit(task_id, crawl_worker, (task,))
+        if position is None:
+            if rebuilt:
+                task_registry.remove(task_id)
+            else:
+                task.status, task.resume, task.error_message, task.end_time = previous
+            return jsonify({"success": False, "error": "任务队列已满，请稍后再试"}), 429
+        
+        return jsonify({
+            "success": True,
+            "task_id": task_id,
+            "queued": position > 0,
+            "queue_position": position,
+            "message": f"任务将从第 {checkpoint.get('page')} 页继续" + (f"，排队位置 {position}" if position else "")
+        })
+    except Exception as e:
+        logging.error(f"继续爬取任务失败: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/tasks/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """取消正在运行的爬取任务，已完成的进度保存在检查点中，可以继续"""
+    task = task_registry.get(task_id)
+    if not task:
+        record = task_history.get(task_id)
+        if not record:
+            return jsonify({"success": False, "error": "任务不存在"}), 404
+        # 多进程部署时任务可能在其他进程中运行，由该进程同步状态时取消
+        if not task_registry.shared or not task_history.request_cancel(task_id):
+            return jsonify({"success": False, "error": "任务未在运行"}), 400
+        return jsonify({
+            "success": True,
+            "task_id": task_id,
+            "message": "已请求取消任务"
+        })
+    
+    # 还在排队的任务直接移出队列
+    outcome = task.request_cancel()
+    if outcome == "dequeued":
+        return jsonify({
+            "success": True,
+            "task_id": task_id,
+            "message": "已从队列中移除任务"
+        })
+    if not outcome:
+        return jsonify({"success": False, "error": "任务未在运行"}), 400
+    
+    return jsonify({
+        "success": True,
+        "task_id": task_id,
+        "message": "已请求取消任务"
     })
 
+def _parse_time(value):
+    """解析时间参数，支持 Unix 时间戳(秒)和 ISO 格式"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
 @app.route('/api/tasks', methods=['GET'])
 def get_all_tasks():
-    """获取所有任务"""
-    tasks = [task.to_dict() for task in crawl_tasks.values()]
+    """分页获取任务，按创建时间倒序，内存中的任务和历史任务合并排序；
+    支持按状态(status，逗号分隔)、主题(theme)、创建时间范围(since/until)筛选，
+    cursor 为上一页返回的 next_cursor"""
+    try:
+        limit = min(200, max(1, request.args.get('limit', 50, type=int)))
+        statuses = [status for status in request.args.get('status', '').split(',') if status]
+        theme_id = request.args.get('theme') or None
+        since = _parse_time(request.args.get('since'))
+        until = _parse_time(request.args.get('until'))
+        before = None
+        if request.args.get('cursor'):
+            created_at, task_id = request.args['cursor'].split(':', 1)
+            before = (float(created_at), task_id)
+    except ValueError:
+        return jsonify({"success": False, "error": "参数格式错误"}), 400
+    
+    live = task_registry.query(statuses, theme_id, since, until, before)
+    history = task_history.query(statuses, theme_id, since, until, before, limit + 1,
+                                 exclude=set(task_registry.ids()))
+    # 两个来源各自有序，归并后取一页，多取一条判断是否还有下一页
+    merged = list(itertools.islice(
+        heapq.merge(live, history, key=lambda item: item[:2], reverse=True), limit + 1))
+    page = merged[:limit]
     return jsonify({
         "success": True,
-        "data": tasks
+        "data": [item[2].to_dict() if isinstance(item[2], CrawlTask) else item[2] for item in page],
+        "next_cursor": f"{page[-1][0]!r}:{page[-1][1]}" if len(merged) > limit else None
     })
 
+# 任务推送中按字段比较变化的属性，未变化的字段不重复推送
+STREAM_FIELDS = ("status", "queue_position", "progress", "total_links", "found_links", "new_links",
+                 "error_message", "start_time", "end_time", "theme_stats")
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _task_delta(task_id, sent, include_logs, record=None):
+    """生成任务相对上次推送的变化，sent 记录每个任务已推送的字段值和日志游标；没有变化时返回 None。
+    record 为已从共享库读出的任务记录"""
+    task = task_registry.get(task_id)
+    # 多进程部署时其他进程的任务从共享库读取，不推送日志
+    if not task and record is None and task_registry.shared:
+        record = task_history.get(task_id)
+    if not task and not record:
+        return {"task_id": task_id, "deleted": True} if sent.pop(task_id, None) else None
+    
+    current = task.to_dict() if task else record
+    previous = sent.get(task_id)
+    if previous is None:
+        delta = dict(current)
+        previous = sent[task_id] = {"fields": {}, "log_seq": 0}
+    else:
+        delta = {key: current[key] for key in STREAM_FIELDS if current[key] != previous["fields"].get(key)}
+        delta["task_id"] = task_id if delta else None
+    previous["fields"] = {key: current[key] for key in STREAM_FIELDS}
+    
+    if include_logs and task and task.logs.last_seq > previous["log_seq"]:
+        logs = task.logs.since(previous["log_seq"], 200)
+        previous["log_seq"] = logs["last_seq"]
+        delta["task_id"] = task_id
+        delta["logs"] = [f"[{log['time']}] {log['level']}: {log['message']}" for log in logs["entries"]]
+    return delta if delta.get("task_id") else None
+
+@app.route('/api/tasks/stream', methods=['GET'])
+def stream_tasks():
+    """以 Server-Sent Events 推送任务变化：连接时先推送全部任务(snapshot)，
+    之后只推送有变化的任务及其变化的字段(delta)，推送频率不超过 stream_max_rate"""
+    include_logs = request.args.get('logs', '1') != '0'
+    min_interval = 1.0 / max(0.1, float(crawler_config.get("stream_max_rate")))
+    heartbeat = max(1, crawler_config.get("stream_heartbeat"))
+    
+    # 多进程部署时其他进程的任务变化只能从共享库轮询
+    poll_interval = crawler_config.get("shared_state_interval") if task_registry.shared else heartbeat
+    
+    def generate():
+        subscription = task_events.subscribe()
+        sent = {}
+        try:
+            polled_at = time.time()
+            live_ids = task_registry.ids()
+            snapshot = [_task_delta(task_id, sent, include_logs) for task_id in live_ids]
+            if task_registry.shared:
+                # 其他进程的任务只在共享库中，与任务列表一样合并进快照
+                others = task_history.query(limit=crawler_config.get("max_tasks_in_memory"), exclude=set(live_ids))
+                snapshot += [_task_delta(task_id, sent, include_logs, record) for _, task_id, record in others]
+            yield _sse("snapshot", {"tasks": [delta for delta in snapshot if delta]})
+            last_push = time.monotonic()
+            while True:
+                changed = subscription.wait(min(heartbeat, poll_interval))
+                if task_registry.shared:
+                    now = time.time()
+                    changed |= set(task_history.updated_since(polled_at - 1))
+                    polled_at = now
+                if not changed:
+                    if time.monotonic() - last_push >= heartbeat:
+                        last_push = time.monotonic()
+                        yield ": keepalive\n\n"
+                    continue
+                # 距上次推送不足最小间隔时等待，期间的变化合并到同一次推送
+                time.sleep(max(0, last_push + min_interval - time.monotonic()))
+                changed |= subscription.wait(0)
+                last_push = time.monotonic()
+                deltas = [_task_delta(task_id, sent, include_logs) for task_id in sorted(changed)]
+                deltas = [delta for delta in deltas if delta]
+                if deltas:
+                    yield _sse("delta", {"tasks": deltas})
+        finally:
+            task_events.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _task_record(task_id):
+    """任务的状态字典(含 output_file)，内存中没有时从历史记录读取"""
+    task = task_registry.get(task_id)
+    if task:
+        return dict(task.to_dict(), output_file=task.output_file)
+    return task_history.get(task_id)
+
 @app.route('/api/download/<task_id>', methods=['GET'])
 def download_result(task_id):
-    """下载爬取结果"""
-    if task_id not in crawl_tasks:
+    """下载爬取结果，运行中的任务返回已找到的部分结果"""
+    task = _task_record(task_id)
+    if not task:
         return jsonify({"success": False, "error": "任务不存在"}), 404
     
-    task = crawl_tasks[task_id]
-    if task.status != "completed":
-        return jsonify({"success": False, "error": "任务尚未完成"}), 400
+    if task["status"] in ("pending", "queued"):
+        return jsonify({"success": False, "error": "任务尚未开始"}), 400
+    
+    download_name = f"magnet_links_{task['theme_id']}_{task['mode']}_{task['start_page']}-{task['end_page']}.txt"
+    if task["status"] != "completed":
+        download_name = download_name.replace(".txt", "_partial.txt")
     
-    if not os.path.exists(task.output_file):
+    # 优先从结果库读取，运行中的任务也能拿到已收录的链接
+    if result_store.task_magnet_count(task_id):
+        return Response(
+            (magnet + "\n" for magnet in result_store.iter_task_magnets(task_id)),
+            mimetype="text/plain",
+            # 多主题任务的文件名包含逗号，需要加引号
+            headers={"Content-Disposition": dump_options_header("attachment", {"filename": download_name})}
+        )
+    
+    result_file = task["output_file"]
+    if task["status"] != "completed" and not os.path.exists(result_file):
+        result_file = partial_path(task["output_file"])
+    
+    if not os.path.exists(result_file):
         return jsonify({"success": False, "error": "结果文件不存在"}), 404
     
     return send_file(
-        task.output_file,
+        os.path.abspath(result_file),
         as_attachment=True,
-        download_name=f"magnet_links_{task.theme_id}_{task.mode}_{task.start_page}-{task.end_page}.txt"
+        download_name=download_name,
+        max_age=0
     )
 
 @app.route('/api/tasks/<task_id>', methods=['DELETE'])
 def delete_task(task_id):
     """删除任务"""
-    if task_id not in crawl_tasks:
+    task = _task_record(task_id)
+    if not task:
         return jsonify({"success": False, "error": "任务不存在"}), 404
     
-    task = crawl_tasks[task_id]
+    # 未结束的任务先取消：排队中的任务直接移出队列，运行中的任务停止后才能删除，避免删除正在写入的文件
+    if task["status"] in ACTIVE_STATUSES:
+        local_task = task_registry.get(task_id)
+        if local_task:
+            outcome = local_task.request_cancel()
+        else:
+            outcome = task_registry.shared and task_history.request_cancel(task_id)
+        if outcome != "dequeued":
+            return jsonify({"success": False, "error": "任务正在运行，已请求取消，请在任务停止后再删除"}), 409
     
     # 删除结果文件
-    if os.path.exists(task.output_file):
-        os.remove(task.output_file)
+    output_file = task["output_file"]
+    for result_file in (output_file, partial_path(output_file), checkpoint_path(output_file)):
+        if os.path.exists(result_file):
+            os.remove(result_file)
     
-    # 从任务列表中移除
-    del crawl_tasks[task_id]
+    # 从任务表、历史记录和结果库中移除，已收录的磁力链接保留用于去重
+    task_registry.remove(task_id)
+    task_history.delete(task_id)
+    task_events.publish(task_id)
+    result_store.delete_task(task_id)
     
     return jsonify({
         "success": True,
@@ -243,26 +623,89 @@ def health_check():
         "success": True,
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_tasks": len([t for t in crawl_tasks.values() if t.status == "running"])
+        "active_tasks": task_registry.count("running"),
+        "queued_tasks": task_registry.count("queued"),
+        "tasks": task_registry.stats(),
+        "process": PROCESS_ID,
+        "scheduler_leader": task_scheduler.running,
+        "driver_pool": driver_pool.stats()
+    })
+
+@app.route('/api/queue', methods=['GET'])
+def get_queue():
+    """获取任务队列状态"""
+    return jsonify({
+        "success": True,
+        "data": job_queue.stats()
     })
 
+@app.route('/api/workers', methods=['GET'])
+def get_workers():
+    """获取分布式工作队列状态"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": work_queue.stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    """获取页面缓存状态"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": http_cache.stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/cache', methods=['DELETE'])
+def clear_cache():
+    """清空页面缓存"""
+    try:
+        http_cache.clear()
+        return jsonify({"success": True, "message": "页面缓存已清空"})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """获取结果库统计"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": result_store.stats()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/magnets/lookup', methods=['GET'])
+def lookup_magnet():
+    """查询磁力链接或 infohash 是否已收录"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"success": False, "error": "缺少查询参数 q"}), 400
+        
+        record = result_store.lookup(query)
+        return jsonify({
+            "success": True,
+            "found": record is not None,
+            "data": record
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/logs', methods=['GET'])
 def get_recent_logs():
-    """获取最近的日志"""
+    """获取最近的日志，新的在前"""
     try:
-        # 获取所有任务的日志
-        all_logs = []
-        for task in crawl_tasks.values():
-            if hasattr(task, 'logs') and task.logs:
-                all_logs.extend(task.logs)
-        
-        # 按时间排序，返回最近的50条日志
-        all_logs.sort(reverse=True)
-        recent_logs = all_logs[:50]
-        
+        limit = min(500, max(1, request.args.get('limit', 50, type=int)))
         return jsonify({
             "success": True,
-            "data": recent_logs
+            "data": recent_logs.latest(limit)
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -299,15 +742,50 @@ def set_proxy_config():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/crawler/config', methods=['GET'])
+def get_crawler_config():
+    """获取爬虫配置"""
+    try:
+        return jsonify({
+            "success": True,
+            "data": crawler_config.get_config()
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/crawler/config', methods=['POST'])
+def set_crawler_config():
+    """更新爬虫配置"""
+    try:
+        data = request.get_json() or {}
+        if not isinstance(data, dict):
+            return jsonify({"success": False, "error": "配置必须是 JSON 对象"}), 400
+        
+        # 保存的配置会被之后的所有爬取读取，取值无效时直接拒绝
+        error = validate_config(data)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        config = crawler_config.update(**data)
+        
+        return jsonify({
+            "success": True,
+            "data": config,
+            "message": "爬虫配置已保存"
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 # 定时任务相关API
 @app.route('/api/scheduled-tasks', methods=['GET'])
 def get_scheduled_tasks():
     """获取所有定时任务"""
     try:
         tasks = task_scheduler.get_all_tasks()
+        running = task_scheduler.running_task_ids()
         return jsonify({
             "success": True,
-            "data": [task.to_dict() for task in tasks]
+            "data": [dict(task.to_dict(), running=task.task_id in running) for task in tasks]
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -323,6 +801,9 @@ def create_scheduled_task():
             if field not in data:
                 return jsonify({"success": False, "error": f"缺少必要字段: {field}"}), 400
         
+        if data.get('overlap_policy', 'skip') not in OVERLAP_POLICIES:
+            return jsonify({"success": False, "error": "不支持的重叠运行策略"}), 400
+        
         task_id = task_scheduler.add_task(
             name=data['name'],
             theme_id=data['theme_id'],
@@ -330,7 +811,10 @@ def create_scheduled_task():
             start_page=data['start_page'],
             end_page=data['end_page'],
             schedule_type=data['schedule_type'],
-            schedule_value=data['schedule_value']
+            schedule_value=data['schedule_value'],
+            incremental=bool(data.get('incremental', True)),
+            overlap_policy=data.get('overlap_policy', 'skip'),
+            timeout_minutes=int(data.get('timeout_minutes', 0))
         )
         
         return jsonify({
@@ -374,6 +858,22 @@ def delete_scheduled_task(task_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/scheduled-tasks/<task_id>/runs', methods=['GET'])
+def get_scheduled_task_runs(task_id):
+    """分页获取定时任务的运行历史"""
+    try:
+        if not task_scheduler.get_task(task_id):
+            return jsonify({"success": False, "error": "任务不存在"}), 404
+        
+        page = max(1, request.args.get('page', 1, type=int))
+        page_size = min(100, max(1, request.args.get('page_size', 20, type=int)))
+        return jsonify({
+            "success": True,
+            "data": task_scheduler.get_runs(task_id, page, page_size)
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/scheduled-tasks/<task_id>/enable', methods=['POST'])
 def enable_scheduled_task(task_id):
     """启用定时任务"""
@@ -414,7 +914,31 @@ def serve_frontend(path):
         return send_from_directory(app.static_folder, path)
     return send_from_directory(app.static_folder, 'index.html')
 
+def _scheduler_leader_tick():
+    """调度领导进程每次续约后调用：刷新定时任务，并把已退出进程的运行中任务记录改为失败"""
+    task_scheduler.leader_tick()
+    try:
+        task_history.fail_stale()
+    except Exception as e:
+        print(f"标记已退出进程的任务失败: {e}")
+
+def start_services(shared=False):
+    """启动后台服务。shared 为 True 时用于 gunicorn/waitress 多进程部署：任务状态同步到共享库，
+    各进程争抢领导锁，只有领导进程运行定时任务调度器"""
+    global scheduler_election
+    if shared:
+        task_registry.start_sync()
+        task_scheduler.shared = True
+        scheduler_election = LeaderElection("scheduler", task_scheduler.start, task_scheduler.stop,
+                                            _scheduler_leader_tick)
+        scheduler_election.start()
+    else:
+        task_scheduler.start()
+    # 按配置预热浏览器池
+    if crawler_config.get("driver_prewarm"):
+        threading.Thread(target=driver_pool.warm_up, args=(crawler_config.get("driver_prewarm"),), daemon=True).start()
+
 if __name__ == '__main__':
-    # 启动定时任务调度器
-    task_scheduler.start()
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # 开发服务器，单进程运行；生产环境使用 wsgi.py
+    start_services()
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -0,0 +1,340 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+from fetcher import BASE_URL, USER_AGENT, AGE_GATE_TEXT, SAFEID_PATTERN, SeleniumFetcher
+from crawler_config import crawler_config
+from http_cache import CachedBody, http_cache
+from sehuatang_crawler import SehuatangCrawler
+from distributed_crawler import DistributedCrawler
+
+try:
+    import aiohttp
+    from yarl import URL
+    USE_AIOHTTP = True
+except ImportError:
+    USE_AIOHTTP = False
+
+try:
+    from aiohttp_socks import ProxyConnector
+    USE_AIOHTTP_SOCKS = True
+except ImportError:
+    USE_AIOHTTP_SOCKS = False
+
+
+class AsyncRateLimiter:
+    """协程版令牌桶限速器，同时限制每秒请求数和同时进行中的请求数"""
+
+    def __init__(self, rate: float, max_in_flight: int):
+        self.rate = float(rate)
+        self.max_in_flight = max_in_flight
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def _take_token(self):
+        if self.rate <= 0:
+            return
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait_time)
+
+    async def __aenter__(self):
+        await self._in_flight.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._in_flight.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._in_flight.release()
+
+
+class AsyncCrawlEngine:
+    """进程内共享的异步抓取引擎，所有任务的列表页和帖子页请求都在同一个事件循环中执行"""
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._limiters = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="async-crawl-engine", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """把协程提交到引擎的事件循环，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def call_soon(self, callback, *args):
+        """在事件循环线程中执行回调"""
+        self._ensure_loop().call_soon_threadsafe(callback, *args)
+
+    def _session(self, proxy=None):
+        """按代理复用 aiohttp 会话，连接池和年龄验证 Cookie 在任务之间共享"""
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            pool_size = crawler_config.get("http_pool_size")
+            if proxy and proxy.startswith("socks"):
+                if not USE_AIOHTTP_SOCKS:
+                    raise RuntimeError("异步引擎使用 SOCKS 代理需要安装 aiohttp-socks")
+                connector = ProxyConnector.from_url(proxy, limit=pool_size)
+            else:
+                connector = aiohttp.TCPConnector(limit=pool_size)
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "User-Agent": USER_AGENT,
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
+                }
+            )
+            self._sessions[proxy] = session
+        return session
+
+    def _limiter(self, url: str) -> AsyncRateLimiter:
+        """获取 URL 所在主机共享的限速器，配置变化时重新创建"""
+        host = urlparse(url).netloc or urlparse(BASE_URL).netloc
+        rate = crawler_config.get("requests_per_second")
+        max_in_flight = crawler_config.get("max_in_flight")
+        limiter = self._limiters.get(host)
+        if limiter is None or limiter.rate != float(rate) or limiter.max_in_flight != max_in_flight:
+            limiter = AsyncRateLimiter(rate, max_in_flight)
+            self._limiters[host] = limiter
+        return limiter
+
+    async def _get(self, session, url: str, proxy=None, headers: dict = None):
+        """返回 (状态码, HTML, 响应头)，304 时 HTML 为空"""
+        # SOCKS 代理由连接器处理，HTTP 代理按请求传入
+        request_proxy = proxy if proxy and not proxy.startswith("socks") else None
+        timeout = aiohttp.ClientTimeout(total=crawler_config.get("http_timeout"))
+        async with self._limiter(url):
+            async with session.get(url, proxy=request_proxy, timeout=timeout, headers=headers) as response:
+                if response.status == 304:
+                    return response.status, "", response.headers
+                response.raise_for_status()
+                body = await response.read()
+        html = body.decode(response.get_encoding() if response.charset else "utf-8", errors="replace")
+        return response.status, html, response.headers
+
+    async def fetch(self, url: str, proxy=None, log=None, retries: int = 2, cached: dict = None) -> str:
+        """抓取页面 HTML，失败或无法通过年龄验证时返回空字符串；
+        cached 为已过期的缓存条目时发送条件请求，未修改则直接使用缓存内容"""
+        session = self._session(proxy)
+        for attempt in range(retries):
+            try:
+                status, html, headers = await self._get(session, url, proxy, http_cache.validators(cached))
+                if status == 304 and cached:
+                    await asyncio.to_thread(http_cache.touch, url)
+                    return CachedBody(cached["body"])
+                if AGE_GATE_TEXT in html:
+                    match = SAFEID_PATTERN.search(html)
+                    if not match:
+                        log(f"HTTP 无法处理年龄验证页面: {url}", "WARNING")
+                        return ""
+                    session.cookie_jar.update_cookies({"_safe": match.group(1)}, response_url=URL(BASE_URL))
+                    log("已通过 HTTP 方式处理年龄验证")
+                    status, html, headers = await self._get(session, url, proxy)
+                    if AGE_GATE_TEXT in html:
+                        log(f"HTTP 年龄验证未生效: {url}", "WARNING")
+                        return ""
+                await asyncio.to_thread(http_cache.put, url, html, headers.get("ETag"), headers.get("Last-Modified"))
+                return html
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log(f"HTTP 抓取 {url} 失败 (第 {attempt + 1}/{retries} 次): {str(e)}", "WARNING")
+                if attempt < retries - 1:
+                    await asyncio.sleep(attempt + 1)
+        return ""
+
+    async def _close_sessions(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    def close(self):
+        """关闭所有会话并停止事件循环"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"关闭异步抓取会话失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+class AsyncSehuatangCrawler(SehuatangCrawler):
+    """基于 asyncio 的爬虫，与 SehuatangCrawler 的 crawl() 参数和返回结果一致；
+    帖子页并发由事件循环中的协程完成，不再为每个帖子占用一个线程，取消时立即中止进行中的请求"""
+
+    def __init__(self, proxy=None, fetch_backend=None):
+        super().__init__(proxy=proxy, fetch_backend=fetch_backend)
+        self._pending = set()
+
+    def cancel(self):
+        """请求取消，并中止事件循环中正在进行的抓取"""
+        super().cancel()
+        async_engine.call_soon(self._cancel_pending)
+
+    def _cancel_pending(self):
+        for task in list(self._pending):
+            task.cancel()
+
+    async def fetch_page_async(self, url: str, retries: int = 3) -> str:
+        """抓取页面内容，优先使用共享的 aiohttp 会话，失败时在线程中回退到 Selenium"""
+        cached = await asyncio.to_thread(http_cache.get, url)
+        if cached and cached["fresh"]:
+            self.metrics.record_cache_hit()
+            return cached["body"]
+        started = time.monotonic()
+        html = ""
+        if self.fetch_backend == "http":
+            html = await async_engine.fetch(url, proxy=self.proxy, log=self.add_log, retries=retries,
+                                            cached=cached)
+            if html:
+                self.add_log(f"成功抓取 {url}", "DEBUG")
+            else:
+                self.add_log(f"HTTP 抓取失败，回退到 Selenium: {url}", "WARNING")
+        if not html:
+            if self.selenium_fetcher is None:
+                self.selenium_fetcher = SeleniumFetcher(proxy=self.proxy, log=self.add_log)
+            html = await asyncio.to_thread(self.selenium_fetcher.fetch, url, retries)
+            await asyncio.to_thread(http_cache.put, url, html)
+        self.metrics.record_fetch(time.monotonic() - started, html)
+        return html
+
+    async def _fetch_thread_magnets_async(self, semaphore: asyncio.Semaphore, thread_url: str):
+        """抓取单个帖子页面并提取磁力链接；抓取失败或被取消时返回 None"""
+        try:
+            async with semaphore:
+                if self.cancelled:
+                    return thread_url, None
+                thread_html = await self.fetch_page_async(thread_url)
+                if thread_html:
+                    return thread_url, await asyncio.to_thread(self.extract_magnet_links, thread_html)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.add_log(f"处理 {thread_url} 失败: {str(e)}", "ERROR")
+        return thread_url, None
+
+    async def _crawl_threads_async(self, run, step: int, theme_id: str, page_num: int, thread_urls: list):
+        """并发抓取一页中的帖子，结果按完成顺序依次写入，保证结果文件和检查点只有一个写入者"""
+        await asyncio.to_thread(run.checkpoint.start_page, page_num, thread_urls, step)
+        semaphore = asyncio.Semaphore(crawler_config.get("thread_workers"))
+        tasks = [asyncio.create_task(self._fetch_thread_magnets_async(semaphore, url)) for url in thread_urls]
+        self._pending.update(tasks)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                thread_url, magnet_links = await next_done
+                await asyncio.to_thread(self._handle_thread_result, run, theme_id, thread_url, magnet_links)
+        finally:
+            self._pending.difference_update(tasks)
+
+    async def crawl_themes_async(self, themes: list, mode: str = '1', start_page: int = 1, end_page: int = 1,
+                                 output_file: str = "magnet_links.txt", incremental: bool = False,
+                                 stop_after_known_pages: int = None, resume: bool = False, task_id: str = None):
+        """在事件循环中执行爬取任务，参数和返回结果与 crawl_themes() 相同"""
+        run = None
+        try:
+            run, error = await asyncio.to_thread(self._begin_run, self._normalize_themes(themes, start_page, end_page),
+                                                 mode, output_file, incremental, stop_after_known_pages, resume, task_id)
+            if error:
+                return error
+            self.add_log(f"异步抓取引擎，帖子并发数: {crawler_config.get('thread_workers')}")
+
+            for step, theme_id, page_num in self._pending_steps(run):
+                if self.cancelled:
+                    break
+                label = self._page_label(run, theme_id, page_num)
+                self.add_log(f"开始处理{label}")
+
+                thread_urls = self._take_resume_pending(run, theme_id, page_num)
+                if thread_urls is None:
+                    start_url = self.listing_url(self.themes[theme_id], mode, page_num)
+                    listing = asyncio.create_task(self.fetch_page_async(start_url))
+                    self._pending.add(listing)
+                    try:
+                        main_html = await listing
+                    except asyncio.CancelledError:
+                        break
+                    finally:
+                        self._pending.discard(listing)
+                    if not main_html:
+                        self.add_log(f"无法访问{label}: {start_url}", "ERROR")
+                        continue
+                    self.metrics.record_listing()
+                    run.theme_stats[theme_id]["pages"] += 1
+
+                    # 解析页面和写检查点等同步操作放到线程中执行，不阻塞事件循环中的其他任务
+                    thread_urls = await asyncio.to_thread(self.extract_thread_urls, main_html)
+                    if not thread_urls:
+                        self.add_log(f"{label}未找到任何主题链接", "WARNING")
+                        continue
+                    if await asyncio.to_thread(self._listing_exhausted, run, theme_id, page_num, thread_urls):
+                        continue
+                    thread_urls = await asyncio.to_thread(self._select_threads, run, theme_id, page_num, thread_urls)
+
+                await self._crawl_threads_async(run, step, theme_id, page_num, thread_urls)
+                if self.cancelled:
+                    break
+                await asyncio.to_thread(run.checkpoint.finish_page, page_num, step)
+                self._should_stop(run, theme_id, page_num)
+
+            return await asyncio.to_thread(self._finish_run, run)
+
+        except Exception as e:
+            self.add_log(f"爬取过程中发生错误: {str(e)}", "ERROR")
+            return {"success": False, "error": str(e), "logs": self.logs.lines()}
+        finally:
+            if run and run.sink:
+                await asyncio.to_thread(run.sink.close)
+            await asyncio.to_thread(self.close_fetchers)
+
+    def crawl_themes(self, themes: list, mode: str = '1', start_page: int = 1, end_page: int = 1,
+                     output_file: str = "magnet_links.txt", incremental: bool = False,
+                     stop_after_known_pages: int = None, resume: bool = False, task_id: str = None):
+        """提交到共享事件循环执行并等待结果，供 crawl_worker 和定时任务直接调用"""
+        future = async_engine.submit(self.crawl_themes_async(
+            themes, mode=mode, start_page=start_page, end_page=end_page, output_file=output_file,
+            incremental=incremental, stop_after_known_pages=stop_after_known_pages, resume=resume,
+            task_id=task_id
+        ))
+        return future.result()
+
+
+def create_crawler(proxy=None, fetch_backend=None) -> SehuatangCrawler:
+    """按 crawl_engine 配置创建爬虫实例"""
+    if crawler_config.get("crawl_engine") == "distributed":
+        return DistributedCrawler(proxy=proxy, fetch_backend=fetch_backend)
+    if crawler_config.get("crawl_engine") == "async":
+        if USE_AIOHTTP:
+            return AsyncSehuatangCrawler(proxy=proxy, fetch_backend=fetch_backend)
+        print("未安装 aiohttp，使用线程爬取引擎")
+    return SehuatangCrawler(proxy=proxy, fetch_backend=fetch_backend)
+
+
+# 全局异步抓取引擎
+async_engine = AsyncCrawlEngine()
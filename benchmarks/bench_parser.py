@@ -0,0 +1,112 @@
+"""页面解析微基准测试
+
+对比原先基于 BeautifulSoup(html.parser) 的解析方式与 page_parser 的单次扫描解析，
+在 fixtures 中保存的列表页和帖子页上统计每页解析耗时。
+
+用法: python benchmarks/bench_parser.py [-n 次数]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_parser import parse_thread_urls, parse_magnet_links
+from magnet import canonical_infohash
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_thread_urls(html: str) -> list:
+    """原 SehuatangCrawler.extract_thread_urls 的解析逻辑(不含日志)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    thread_urls = set()
+    thread_base = {}
+    patterns = [
+        r'thread-\d+-\d+-\d+\.html',
+        r'thread-\d+\.html',
+        r'thread\.php\?tid=\d+',
+        r'forum\.php\?mod=viewthread&tid=\d+'
+    ]
+    for a_tag in soup.find_all('a', href=True):
+        href = a_tag.get('href', '')
+        for pattern in patterns:
+            if re.search(pattern, href):
+                if href.startswith('/'):
+                    href = f"https://sehuatang.org{href}"
+                elif not href.startswith('http'):
+                    href = f"https://sehuatang.org/{href}"
+                if 'thread-' in href and '.html' in href:
+                    match = re.match(r'.*?(thread-\d+)-\d+-\d+\.html', href)
+                    if match:
+                        thread_id = match.group(1)
+                        if thread_id not in thread_base:
+                            full_url = f"https://sehuatang.org/{thread_id}-1-1.html"
+                            thread_urls.add(full_url)
+                            thread_base[thread_id] = full_url
+                elif 'tid=' in href:
+                    match = re.search(r'tid=(\d+)', href)
+                    if match:
+                        thread_id = f"thread-{match.group(1)}"
+                        if thread_id not in thread_base:
+                            full_url = f"https://sehuatang.org/{thread_id}-1-1.html"
+                            thread_urls.add(full_url)
+                            thread_base[thread_id] = full_url
+                break
+    return list(thread_urls)
+
+
+def legacy_magnet_links(html: str) -> list:
+    """原 SehuatangCrawler.extract_magnet_links 的解析逻辑"""
+    soup = BeautifulSoup(html, 'html.parser')
+    magnet_links = []
+    for tag in soup.select('div.blockcode, div.t_msgfont, div.postcontent, div.message, p'):
+        text = tag.get_text()
+        magnet_links.extend(re.findall(r'magnet:\?xt=urn:[a-z0-9]+:[a-z0-9]{32,}', text, re.IGNORECASE))
+    for a_tag in soup.select('a'):
+        href = a_tag.get('href', '')
+        if href.startswith('magnet:'):
+            magnet_links.append(href)
+    return magnet_links
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def bench(label: str, func, html: str, number: int):
+    seconds = min(timeit.repeat(lambda: func(html), number=number, repeat=3)) / number
+    print(f"  {label:<28} {seconds * 1000:8.3f} ms/页")
+    return seconds
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="页面解析微基准测试")
+    arg_parser.add_argument("-n", "--number", type=int, default=50, help="每轮解析次数")
+    args = arg_parser.parse_args()
+
+    forum_html = load_fixture("forum.html")
+    thread_html = load_fixture("thread.html")
+
+    # 先确认新旧解析结果一致，磁力链接按规范 infohash 比较
+    assert set(parse_thread_urls(forum_html)) == set(legacy_thread_urls(forum_html))
+    assert ({canonical_infohash(link) for link in parse_magnet_links(thread_html)}
+            == {canonical_infohash(link) for link in legacy_magnet_links(thread_html)})
+
+    cases = [
+        ("列表页 forum.html", forum_html, legacy_thread_urls, parse_thread_urls),
+        ("帖子页 thread.html", thread_html, legacy_magnet_links, parse_magnet_links),
+    ]
+    for title, html, legacy, current in cases:
+        print(f"{title} ({len(html) // 1024} KB)")
+        old = bench("BeautifulSoup html.parser", legacy, html, args.number)
+        new = bench("page_parser (lxml)", current, html, args.number)
+        print(f"  加速比: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
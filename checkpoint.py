@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+def checkpoint_path(output_file: str) -> str:
+    """爬取任务检查点文件的路径"""
+    return output_file + CHECKPOINT_SUFFIX
+
+
+class CrawlCheckpoint:
+    """爬取进度检查点，记录当前页、待抓取、已完成和抓取失败的帖子，用于中断后继续爬取"""
+
+    def __init__(self, output_file: str, interval: float = 10.0):
+        self.path = checkpoint_path(output_file)
+        self.interval = interval
+        self.params = {}
+        self.page = None
+        self.step = None  # 多主题任务按交错顺序排列的列表页序号
+        self.pending: List[str] = []
+        self.completed = set()
+        self.failed: Dict[str, str] = {}  # 抓取失败的帖子 -> 主题ID，继续任务时重新抓取
+        self.total_threads = 0
+        self.processed_threads = 0
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read(output_file: str) -> Optional[dict]:
+        """读取检查点文件，不存在或损坏时返回 None"""
+        path = checkpoint_path(output_file)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取检查点失败: {e}")
+            return None
+
+    def load(self, output_file: str) -> bool:
+        """从检查点文件恢复进度"""
+        data = self.read(output_file)
+        if not data:
+            return False
+        self.params = data.get("params", {})
+        self.page = data.get("page")
+        self.step = data.get("step")
+        self.pending = data.get("pending", [])
+        self.completed = set(data.get("completed", []))
+        self.failed = data.get("failed", {})
+        self.total_threads = data.get("total_threads", 0)
+        self.processed_threads = data.get("processed_threads", 0)
+        return True
+
+    def start_page(self, page: int, pending: List[str], step: int = None):
+        """开始处理新的一页，立即保存"""
+        with self._lock:
+            self.page = page
+            self.step = step
+            self.pending = list(pending)
+        self.save(force=True)
+
+    def finish_page(self, page: int, step: int = None):
+        """当前页处理完毕，下次从下一页继续"""
+        with self._lock:
+            self.page = page + 1
+            self.step = step + 1 if step is not None else None
+            self.pending = []
+        self.save(force=True)
+
+    def mark_done(self, thread_url: str):
+        """记录一个帖子已完成，按时间间隔保存"""
+        with self._lock:
+            self.completed.add(thread_url)
+            self.failed.pop(thread_url, None)
+            if thread_url in self.pending:
+                self.pending.remove(thread_url)
+        self.save()
+
+    def mark_failed(self, thread_url: str, theme_id: str):
+        """记录一个抓取失败的帖子，不算完成"""
+        with self._lock:
+            self.failed[thread_url] = theme_id
+        self.save()
+
+    def save(self, force: bool = False):
+        """原子地写入检查点文件"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.interval:
+                return
+            self._last_save = now
+            data = {
+                "params": self.params,
+                "page": self.page,
+                "step": self.step,
+                "pending": self.pending,
+                "completed": sorted(self.completed),
+                "failed": self.failed,
+                "total_threads": self.total_threads,
+                "processed_threads": self.processed_threads,
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"保存检查点失败: {e}")
+
+    def clear(self):
+        """任务结束后删除检查点"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,87 @@
+import math
+import threading
+import time
+from typing import List, Optional
+from http_cache import CachedBody
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """已排序数据的百分位数(最近秩法)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def fetched_size(html: str) -> int:
+    """页面经网络传输的字节数，304 重新验证后沿用的缓存内容为 0"""
+    return 0 if isinstance(html, CachedBody) else len(html.encode("utf-8"))
+
+
+class CrawlMetrics:
+    """一次爬取的运行指标：抓取的页面数、下载字节数、抓取耗时分布和磁力链接新旧数量"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.listing_pages = 0
+        self.thread_pages = 0
+        self.failed_fetches = 0
+        self.cache_hits = 0
+        self.bytes_downloaded = 0
+        self.magnets_found = 0
+        self.new_magnets = 0
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def record_fetch(self, seconds: float, html: str):
+        """记录一次页面抓取，失败时 html 为空"""
+        self.record_fetch_size(seconds, fetched_size(html) if html else None)
+
+    def record_fetch_size(self, seconds: Optional[float], size: Optional[int]):
+        """按字节数记录一次页面抓取，用于汇总工作进程上报的抓取结果；
+        失败时 size 为 None，304 重新验证时为 0，耗时未知时 seconds 为 None"""
+        with self._lock:
+            if seconds is not None:
+                self._latencies.append(seconds)
+            if size is None:
+                self.failed_fetches += 1
+            else:
+                self.bytes_downloaded += size
+
+    def record_cache_hit(self):
+        """页面直接由未过期的缓存提供，没有发出请求"""
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_listing(self):
+        with self._lock:
+            self.listing_pages += 1
+
+    def record_thread(self, magnet_count: int, new_count: int):
+        with self._lock:
+            self.thread_pages += 1
+            self.magnets_found += magnet_count
+            self.new_magnets += new_count
+
+    def summary(self) -> dict:
+        """汇总指标，耗时单位为毫秒"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "duration": round(time.time() - self.started_at, 3),
+                "listing_pages": self.listing_pages,
+                "thread_pages": self.thread_pages,
+                "fetches": len(latencies),
+                "failed_fetches": self.failed_fetches,
+                "cache_hits": self.cache_hits,
+                "bytes_downloaded": self.bytes_downloaded,
+                "latency_ms": {
+                    "p50": round(percentile(latencies, 50) * 1000, 1),
+                    "p90": round(percentile(latencies, 90) * 1000, 1),
+                    "p99": round(percentile(latencies, 99) * 1000, 1),
+                    "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+                },
+                "magnets_found": self.magnets_found,
+                "new_magnets": self.new_magnets,
+                "duplicate_magnets": self.magnets_found - self.new_magnets
+            }
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from typing import Optional
+
+# 爬虫默认配置
+DEFAULT_CONFIG = {
+    "fetch_backend": "http",      # http: requests 直连并回退 Selenium; selenium: 仅使用浏览器
+    "crawl_engine": "thread",     # thread: 线程池并发抓取帖子; async: 共享事件循环的 aiohttp 协程抓取; distributed: 由 worker.py 工作进程抓取
+    "http_timeout": 15,           # 单次 HTTP 请求超时(秒)
+    "http_pool_size": 10,         # HTTP 连接池大小
+    "thread_workers": 8,          # 并发抓取帖子页面的线程数
+    "max_concurrent_crawls": 2,   # 同时运行的爬取任务数，超出的任务排队
+    "max_queued_crawls": 20,      # 排队任务数上限，队列满时拒绝新任务
+    "requests_per_second": 5,     # 每个站点每秒最多请求数，0 表示不限速；分布式抓取时为所有工作进程合计
+    "max_in_flight": 8,           # 每个站点同时进行中的最大请求数
+    "driver_pool_size": 2,        # 进程内共享的 WebDriver 数量上限
+    "driver_max_pages": 200,      # 单个 WebDriver 抓取多少页后回收
+    "driver_max_memory_mb": 1024, # 单个 WebDriver 内存超过该值(MB)后回收，0 表示不限制
+    "driver_prewarm": 0,          # 服务启动时预先启动的 WebDriver 数量
+    "db_file": "crawler.db",      # SQLite 数据库文件
+    "thread_recheck_hours": 72,   # 增量爬取时已抓取帖子超过该时长(小时)后重新检查，0 表示不再检查
+    "stop_after_known_pages": 1,  # 增量爬取普通模式下连续多少个列表页全部为已抓取帖子时停止翻页，0 表示不提前停止
+    "checkpoint_interval": 10,    # 爬取检查点的保存间隔(秒)
+    "log_buffer_size": 2000,      # 每个任务保留的最近日志条数，超出后覆盖最早的日志
+    "log_level": "INFO",          # 任务日志的最低级别: DEBUG, INFO, WARNING, ERROR
+    "recent_log_size": 500,       # 全局最近日志(/api/logs)保留的条数
+    "stream_max_rate": 2,         # 任务推送(SSE)每个连接每秒最多推送次数，期间的变化合并推送
+    "stream_heartbeat": 15,       # 任务推送没有变化时发送心跳的间隔(秒)
+    "task_retention_seconds": 3600,  # 已结束的任务在内存中保留的时间(秒)，之后只能从历史记录中查询
+    "max_tasks_in_memory": 200,   # 内存中保留的任务数上限，超出时淘汰最早结束的任务
+    "shared_state_interval": 2,   # 多进程部署时任务状态写入共享库的间隔(秒)
+    "leader_lock_ttl": 15,        # 多进程部署时调度器领导锁的租约时长(秒)
+    "distributed_listing_prefetch": 2,  # 分布式抓取时提前写入工作队列的列表页数
+    "work_lease_seconds": 300,    # 工作进程领取工作项的租约时长(秒)，过期未完成的工作项由其他工作进程重新领取
+    "work_max_attempts": 3,       # 工作项最多执行次数，超过后视为抓取失败
+    "work_poll_interval": 0.5,    # 工作进程和提交任务的进程轮询工作队列的间隔(秒)
+    "http_cache_enabled": True,   # 是否启用页面响应磁盘缓存
+    "http_cache_file": "http_cache.db",  # 页面响应缓存的 SQLite 文件
+    "http_cache_max_mb": 200,     # 缓存压缩后的总大小上限(MB)，超出时淘汰最久未访问的页面
+    "listing_cache_ttl": 300,     # 列表页缓存有效期(秒)，过期后重新验证
+    "thread_cache_ttl": 86400     # 帖子页缓存有效期(秒)，过期后重新验证
+}
+
+# 只能取固定几个值的配置项
+CONFIG_CHOICES = {
+    "fetch_backend": ("http", "selenium"),
+    "crawl_engine": ("thread", "async", "distributed"),
+    "log_level": ("DEBUG", "INFO", "WARNING", "ERROR")
+}
+
+# 数值配置项的取值范围: (是否只接受整数, 下限, 是否可以等于下限)
+CONFIG_RANGES = {
+    "http_timeout": (False, 0, False),
+    "http_pool_size": (True, 1, True),
+    "thread_workers": (True, 1, True),
+    "max_concurrent_crawls": (True, 1, True),
+    "max_queued_crawls": (True, 0, True),
+    "requests_per_second": (False, 0, True),
+    "max_in_flight": (True, 1, True),
+    "driver_pool_size": (True, 1, True),
+    "driver_max_pages": (True, 1, True),
+    "driver_max_memory_mb": (True, 0, True),
+    "driver_prewarm": (True, 0, True),
+    "thread_recheck_hours": (False, 0, True),
+    "stop_after_known_pages": (True, 0, True),
+    "checkpoint_interval": (False, 0, False),
+    "log_buffer_size": (True, 1, True),
+    "recent_log_size": (True, 1, True),
+    "stream_max_rate": (False, 0, False),
+    "stream_heartbeat": (False, 0, False),
+    "task_retention_seconds": (False, 0, True),
+    "max_tasks_in_memory": (True, 1, True),
+    "shared_state_interval": (False, 0, False),
+    "leader_lock_ttl": (False, 0, False),
+    "distributed_listing_prefetch": (True, 1, True),
+    "work_lease_seconds": (False, 0, False),
+    "work_max_attempts": (True, 1, True),
+    "work_poll_interval": (False, 0, False),
+    "http_cache_max_mb": (False, 0, False),
+    "listing_cache_ttl": (False, 0, True),
+    "thread_cache_ttl": (False, 0, True)
+}
+
+
+def validate_config(data: dict) -> Optional[str]:
+    """检查要更新的配置项，返回第一个错误的说明，全部有效时返回 None"""
+    for key, value in data.items():
+        if key not in DEFAULT_CONFIG:
+            return f"未知的配置项: {key}"
+        default = DEFAULT_CONFIG[key]
+        if key in CONFIG_CHOICES:
+            if value not in CONFIG_CHOICES[key]:
+                return f"{key} 只能是 {', '.join(CONFIG_CHOICES[key])} 之一"
+        elif isinstance(default, bool):
+            if not isinstance(value, bool):
+                return f"{key} 必须是布尔值"
+        elif isinstance(default, str):
+            if not isinstance(value, str) or not value.strip():
+                return f"{key} 必须是非空字符串"
+        else:
+            integer_only, minimum, allow_minimum = CONFIG_RANGES[key]
+            number_types = (int,) if integer_only else (int, float)
+            if isinstance(value, bool) or not isinstance(value, number_types):
+                return f"{key} 必须是{'整数' if integer_only else '数字'}"
+            if value < minimum or (value == minimum and not allow_minimum):
+                return f"{key} 必须{'不小于' if allow_minimum else '大于'} {minimum}"
+    return None
+
+
+class CrawlerConfig:
+    def __init__(self, config_file: str = "crawler_config.json"):
+        self.config_file = config_file
+        self._mtime = self._file_mtime()
+        self._checked_at = time.monotonic()
+        self.config = self.load_config()
+
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.config_file)
+        except OSError:
+            return None
+
+    def _reload_if_changed(self):
+        # 多进程部署时配置可能被其他进程修改，最多每秒检查一次文件修改时间
+        now = time.monotonic()
+        if now - self._checked_at < 1:
+            return
+        self._checked_at = now
+        mtime = self._file_mtime()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self.config = self.load_config()
+
+    def load_config(self) -> dict:
+        """加载爬虫配置，缺失的项使用默认值"""
+        config = dict(DEFAULT_CONFIG)
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config.update(json.load(f))
+            except Exception as e:
+                print(f"加载爬虫配置失败: {e}")
+        return config
+
+    def save_config(self):
+        """保存爬虫配置"""
+        try:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self._mtime = self._file_mtime()
+        except Exception as e:
+            print(f"保存爬虫配置失败: {e}")
+
+    def get(self, key: str, default=None):
+        """获取单个配置项"""
+        self._reload_if_changed()
+        return self.config.get(key, DEFAULT_CONFIG.get(key, default))
+
+    def update(self, **kwargs) -> dict:
+        """更新配置项，忽略未知的键；调用前用 validate_config 检查取值"""
+        for key, value in kwargs.items():
+            if key in DEFAULT_CONFIG:
+                self.config[key] = value
+        self.save_config()
+        return self.get_config()
+
+    def get_config(self) -> dict:
+        """获取完整配置"""
+        self._reload_if_changed()
+        return self.config.copy()
+
+# 全局爬虫配置实例
+crawler_config = CrawlerConfig()
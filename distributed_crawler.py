@@ -0,0 +1,159 @@
+import time
+from crawler_config import crawler_config
+from sehuatang_crawler import SehuatangCrawler
+from work_queue import KIND_LISTING, KIND_THREAD, work_queue
+
+# 工作项持续这么久没有进展且没有工作进程在处理时提醒启动工作进程(秒)
+STALL_WARNING_SECONDS = 30
+
+
+class DistributedCrawler(SehuatangCrawler):
+    """分布式爬虫，与 SehuatangCrawler 的 crawl() 参数和返回结果一致；
+    列表页和帖子页拆分为工作项写入共享工作队列，由任意数量的工作进程(worker.py)抓取解析，
+    本进程只负责调度、过滤帖子并汇总结果，检查点、结果文件和结果库仍只有一个写入者"""
+
+    def __init__(self, proxy=None, fetch_backend=None):
+        super().__init__(proxy=proxy, fetch_backend=fetch_backend)
+        self.job_id = None
+        self._listing_items = {}  # 已写入工作队列的列表页: 步骤序号 -> 工作项ID
+
+    def _payload(self, url: str) -> dict:
+        return {"url": url, "proxy": self.proxy, "fetch_backend": self.fetch_backend}
+
+    def _enqueue_listings(self, run, step: int):
+        """写入当前步骤及之后 distributed_listing_prefetch 个列表页的工作项，工作进程可以提前抓取"""
+        window = crawler_config.get("distributed_listing_prefetch")
+        steps = [
+            ahead for ahead in range(step, min(len(run.steps), step + 1 + window))
+            if ahead not in self._listing_items and run.steps[ahead][0] not in run.stopped_themes
+        ]
+        if not steps:
+            return
+        payloads = []
+        for ahead in steps:
+            theme_id, page_num = run.steps[ahead]
+            payloads.append(self._payload(self.listing_url(self.themes[theme_id], run.mode, page_num)))
+        self._listing_items.update(zip(steps, work_queue.enqueue(self.job_id, KIND_LISTING, payloads)))
+
+    def _drop_stopped_listings(self, run):
+        """已停止翻页的主题不再需要预先写入的列表页"""
+        stopped = [step for step in self._listing_items if run.steps[step][0] in run.stopped_themes]
+        work_queue.cancel([self._listing_items.pop(step) for step in stopped])
+
+    def _record_remote_fetch(self, status: str, result):
+        """汇总工作进程上报的抓取指标"""
+        if status != "done":
+            self.metrics.record_fetch_size(None, None)
+        elif result["fetch"].get("cached"):
+            self.metrics.record_cache_hit()
+        else:
+            self.metrics.record_fetch_size(result["fetch"]["seconds"], result["fetch"]["size"])
+
+    def _wait_items(self, item_ids: list):
+        """轮询等待工作项结束，按结束先后返回 (工作项ID, 状态, 结果)；取消时停止等待"""
+        remaining = set(item_ids)
+        last_progress = time.monotonic()
+        warned = False
+        while remaining and not self.cancelled:
+            finished = work_queue.collect(sorted(remaining))
+            if finished:
+                last_progress = time.monotonic()
+                warned = False
+                for item_id in sorted(finished):
+                    remaining.discard(item_id)
+                    status, result = finished[item_id]
+                    yield item_id, status, result
+                continue
+            if not warned and time.monotonic() - last_progress > STALL_WARNING_SECONDS \
+                    and not work_queue.leased_count(self.job_id):
+                self.add_log(f"{len(remaining)} 个工作项等待超过 {STALL_WARNING_SECONDS} 秒无人领取，"
+                             f"请确认已启动 worker.py", "WARNING")
+                warned = True
+            time.sleep(crawler_config.get("work_poll_interval"))
+
+    def _fetch_listing(self, run, step: int):
+        """等待工作进程抓取并解析列表页，返回帖子链接；抓取失败或已取消时返回 None。
+        后面的列表页同时写入队列，处理本页帖子期间工作进程可以先抓取"""
+        self._enqueue_listings(run, step)
+        item_id = self._listing_items.pop(step)
+        for _, status, result in self._wait_items([item_id]):
+            self._record_remote_fetch(status, result)
+            if status == "done":
+                return result["thread_urls"]
+        return None
+
+    def _crawl_threads(self, executor, run, step: int, theme_id: str, page_num: int, thread_urls: list):
+        """把一页中的帖子写入工作队列，结果按完成顺序依次写入结果文件、结果库，更新检查点和进度"""
+        run.checkpoint.start_page(page_num, thread_urls, step)
+        item_ids = work_queue.enqueue(self.job_id, KIND_THREAD, [self._payload(url) for url in thread_urls])
+        thread_by_item = dict(zip(item_ids, thread_urls))
+        for item_id, status, result in self._wait_items(item_ids):
+            self._record_remote_fetch(status, result)
+            thread_url = thread_by_item.pop(item_id)
+            if status != "done":
+                self.add_log(f"处理 {thread_url} 失败: 超过重试次数", "ERROR")
+            self._handle_thread_result(run, theme_id, thread_url, result["magnets"] if status == "done" else None)
+        if thread_by_item:
+            # 取消时未领取的帖子从队列中移除，继续任务时重新抓取
+            work_queue.cancel(list(thread_by_item))
+
+    def crawl_themes(self, themes: list, mode: str = '1', start_page: int = 1, end_page: int = 1,
+                     output_file: str = "magnet_links.txt", incremental: bool = False,
+                     stop_after_known_pages: int = None, resume: bool = False, task_id: str = None):
+        """通过工作队列执行爬取任务，参数和返回结果与 SehuatangCrawler.crawl_themes() 相同；
+        列表页按顺序处理(增量停止翻页依赖前面页面的结果)，帖子页由工作进程并发抓取"""
+        run = None
+        try:
+            run, error = self._begin_run(self._normalize_themes(themes, start_page, end_page), mode, output_file,
+                                         incremental, stop_after_known_pages, resume, task_id)
+            if error:
+                return error
+            self.job_id = f"{run.task_id}_{int(time.time() * 1000)}"
+            self._listing_items = {}
+            self.add_log(f"分布式抓取，工作队列任务: {self.job_id}")
+
+            for step, theme_id, page_num in self._pending_steps(run):
+                if self.cancelled:
+                    break
+                label = self._page_label(run, theme_id, page_num)
+                self.add_log(f"开始处理{label}")
+
+                thread_urls = self._take_resume_pending(run, theme_id, page_num)
+                if thread_urls is None:
+                    thread_urls = self._fetch_listing(run, step)
+                    if self.cancelled:
+                        break
+                    if thread_urls is None:
+                        self.add_log(f"无法访问{label}: "
+                                     f"{self.listing_url(self.themes[theme_id], mode, page_num)}", "ERROR")
+                        continue
+                    self.metrics.record_listing()
+                    run.theme_stats[theme_id]["pages"] += 1
+
+                    if not thread_urls:
+                        self.add_log(f"{label}未找到任何主题链接", "WARNING")
+                        continue
+                    if self._listing_exhausted(run, theme_id, page_num, thread_urls):
+                        self._drop_stopped_listings(run)
+                        continue
+                    thread_urls = self._select_threads(run, theme_id, page_num, thread_urls)
+
+                self._crawl_threads(None, run, step, theme_id, page_num, thread_urls)
+                if self.cancelled:
+                    break
+                run.checkpoint.finish_page(page_num, step)
+                if self._should_stop(run, theme_id, page_num):
+                    self._drop_stopped_listings(run)
+
+            return self._finish_run(run)
+
+        except Exception as e:
+            self.add_log(f"爬取过程中发生错误: {str(e)}", "ERROR")
+            return {"success": False, "error": str(e), "logs": self.logs.lines()}
+        finally:
+            if self.job_id:
+                # 未领取的工作项随之取消，工作进程之后写回的结果被忽略
+                work_queue.purge(self.job_id)
+            if run and run.sink:
+                run.sink.close()
+            self.close_fetchers()
@@ -0,0 +1,224 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from crawler_config import crawler_config
+from fetcher import BASE_URL, USER_AGENT, AGE_GATE_TEXT, SAFEID_PATTERN
+
+# 尝试导入webdriver-manager，如果失败则使用默认方式
+try:
+    from webdriver_manager.chrome import ChromeDriverManager
+    USE_WEBDRIVER_MANAGER = True
+except ImportError:
+    USE_WEBDRIVER_MANAGER = False
+
+# 尝试导入psutil，用于统计浏览器内存占用，缺失时不做内存回收
+try:
+    import psutil
+    USE_PSUTIL = True
+except ImportError:
+    USE_PSUTIL = False
+
+
+class PooledDriver:
+    """池中的一个 WebDriver 及其使用统计"""
+
+    def __init__(self, driver, proxy):
+        self.driver = driver
+        self.proxy = proxy
+        self.pages_served = 0
+        self.created_at = time.time()
+        self.broken = False
+
+    def is_healthy(self) -> bool:
+        """检查浏览器会话是否仍然可用"""
+        if self.broken:
+            return False
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self) -> float:
+        """统计 chromedriver 及其子进程(浏览器)的内存占用"""
+        if not USE_PSUTIL:
+            return 0.0
+        try:
+            process = psutil.Process(self.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except:
+            pass
+
+
+class DriverPool:
+    """进程内共享的 WebDriver 池，任务租用已预热的浏览器而不是每次重新启动"""
+
+    def __init__(self):
+        self._idle = []
+        self._total = 0
+        self._cond = threading.Condition()
+        self._driver_path = None
+        self.created_count = 0
+        self.recycled_count = 0
+
+    def _get_driver_path(self):
+        # ChromeDriverManager().install() 只在进程内执行一次
+        if self._driver_path is None:
+            self._driver_path = ChromeDriverManager().install()
+        return self._driver_path
+
+    def create_driver(self, proxy=None):
+        """设置 Selenium WebDriver，支持代理"""
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless")  # 无头模式
+        options.add_argument(f"user-agent={USER_AGENT}")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-plugins")
+        options.add_argument("--disable-images")
+        options.add_experimental_option("excludeSwitches", ["enable-logging"])
+        options.add_experimental_option('useAutomationExtension', False)
+
+        # 添加代理支持
+        if proxy:
+            logging.info(f"使用代理: {proxy}")
+            options.add_argument(f'--proxy-server={proxy}')
+
+        try:
+            if USE_WEBDRIVER_MANAGER:
+                service = Service(self._get_driver_path())
+                driver = webdriver.Chrome(service=service, options=options)
+            else:
+                driver = webdriver.Chrome(options=options)
+        except Exception as e:
+            logging.error(f"Chrome WebDriver 初始化失败: {str(e)}")
+            raise
+
+        self._seed_age_cookie(driver)
+        self.created_count += 1
+        return PooledDriver(driver, proxy)
+
+    def _seed_age_cookie(self, driver):
+        """打开首页并写入年龄验证 Cookie，之后的页面不再出现验证页"""
+        try:
+            driver.get(BASE_URL)
+            html = driver.page_source
+            if AGE_GATE_TEXT in html:
+                match = SAFEID_PATTERN.search(html)
+                if match:
+                    driver.add_cookie({"name": "_safe", "value": match.group(1), "path": "/"})
+                    logging.info("已为 WebDriver 预置年龄验证 Cookie")
+        except Exception as e:
+            logging.warning(f"预置年龄验证 Cookie 失败: {str(e)}")
+
+    def _should_recycle(self, pooled: PooledDriver) -> bool:
+        if not pooled.is_healthy():
+            return True
+        if pooled.pages_served >= crawler_config.get("driver_max_pages"):
+            return True
+        max_memory = crawler_config.get("driver_max_memory_mb")
+        return bool(max_memory) and pooled.memory_mb() > max_memory
+
+    def _acquire(self, proxy, timeout):
+        deadline = time.monotonic() + timeout
+        evicted = None
+        with self._cond:
+            while True:
+                # 优先复用代理设置相同的空闲浏览器
+                for i, pooled in enumerate(self._idle):
+                    if pooled.proxy == proxy:
+                        return self._idle.pop(i)
+                if self._total < crawler_config.get("driver_pool_size"):
+                    self._total += 1
+                    break
+                if self._idle:
+                    # 没有匹配代理的空闲浏览器，关闭一个腾出名额；关闭可能很慢，在锁外进行
+                    evicted = self._idle.pop(0)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("等待空闲 WebDriver 超时")
+                self._cond.wait(remaining)
+        if evicted:
+            evicted.quit()
+        try:
+            return self.create_driver(proxy)
+        except Exception:
+            self._discard()
+            raise
+
+    def _discard(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def _release(self, pooled: PooledDriver):
+        if self._should_recycle(pooled):
+            pooled.quit()
+            self.recycled_count += 1
+            self._discard()
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, proxy=None, timeout: float = 300):
+        """租用一个浏览器，使用完毕后自动归还或回收"""
+        pooled = self._acquire(proxy, timeout)
+        try:
+            yield pooled
+        finally:
+            self._release(pooled)
+
+    def warm_up(self, count: int, proxy=None):
+        """预先启动指定数量的浏览器"""
+        count = min(count, crawler_config.get("driver_pool_size"))
+        for _ in range(count):
+            with self._cond:
+                if self._total >= crawler_config.get("driver_pool_size"):
+                    return
+                self._total += 1
+            try:
+                pooled = self.create_driver(proxy)
+            except Exception:
+                self._discard()
+                return
+            self._release(pooled)
+
+    def stats(self) -> dict:
+        """获取池状态"""
+        with self._cond:
+            return {
+                "size": crawler_config.get("driver_pool_size"),
+                "total": self._total,
+                "idle": len(self._idle),
+                "created": self.created_count,
+                "recycled": self.recycled_count
+            }
+
+    def close_all(self):
+        """关闭所有空闲浏览器"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for pooled in idle:
+            pooled.quit()
+
+
+# 全局浏览器池实例
+driver_pool = DriverPool()
+atexit.register(driver_pool.close_all)
@@ -0,0 +1,278 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from crawler_config import crawler_config
+from http_cache import CachedBody, http_cache
+from result_store import ResultStore, result_store
+
+BASE_URL = "https://sehuatang.org/"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/139.0.0.0 Safari/537.36"
+AGE_GATE_TEXT = "满18岁"
+SAFEID_PATTERN = re.compile(r"var\s+safeid\s*=\s*['\"]([^'\"]+)['\"]")
+
+
+def _default_log(message, level="INFO"):
+    logging.info(message)
+
+
+class RateLimiter:
+    """令牌桶限速器，同时限制每秒请求数和同时进行中的请求数"""
+
+    def __init__(self, rate: float, max_in_flight: int):
+        self.rate = float(rate)
+        self.max_in_flight = max_in_flight
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def _take_token(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    @contextmanager
+    def limit(self):
+        """在限速范围内执行一次请求"""
+        self._in_flight.acquire()
+        try:
+            self._take_token()
+            yield
+        finally:
+            self._in_flight.release()
+
+
+RATE_BUCKET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    host TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class SharedRateLimiter(RateLimiter):
+    """令牌桶保存在共享 SQLite 库中的限速器，多个工作进程合计不超过每秒请求数；
+    同时进行中的请求数仍按进程限制"""
+
+    def __init__(self, host: str, rate: float, max_in_flight: int, store: ResultStore = None):
+        super().__init__(rate, max_in_flight)
+        self.host = host
+        self.store = store or result_store
+        self._ready = False
+
+    def _take_token(self):
+        # 先预订一个令牌，令牌不足时记为欠账，按欠账的多少等待，读改写在一条语句中完成
+        if self.rate <= 0:
+            return
+        now = time.time()
+        with self.store.transaction() as conn:
+            if not self._ready:
+                conn.executescript(RATE_BUCKET_SCHEMA)
+                self._ready = True
+            conn.execute(
+                "INSERT INTO rate_buckets (host, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(host) DO UPDATE SET "
+                "tokens = MIN(?, tokens + MAX(0, excluded.updated - updated) * ?) - 1, "
+                "updated = MAX(updated, excluded.updated)",
+                (self.host, self.capacity - 1, now, self.capacity, self.rate)
+            )
+            tokens = conn.execute("SELECT tokens FROM rate_buckets WHERE host = ?", (self.host,)).fetchone()[0]
+        if tokens < 0:
+            time.sleep(-tokens / self.rate)
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+_shared_rate_limit = False
+
+
+def enable_shared_rate_limit():
+    """多个工作进程共同抓取时调用，之后创建的限速器把令牌桶放在共享库中"""
+    global _shared_rate_limit
+    with _host_limiters_lock:
+        _shared_rate_limit = True
+        _host_limiters.clear()
+
+
+def get_rate_limiter(url: str) -> RateLimiter:
+    """获取 URL 所在主机共享的限速器，配置变化时重新创建"""
+    host = urlparse(url).netloc or urlparse(BASE_URL).netloc
+    rate = crawler_config.get("requests_per_second")
+    max_in_flight = crawler_config.get("max_in_flight")
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None or limiter.rate != float(rate) or limiter.max_in_flight != max_in_flight:
+            if _shared_rate_limit:
+                limiter = SharedRateLimiter(host, rate, max_in_flight)
+            else:
+                limiter = RateLimiter(rate, max_in_flight)
+            _host_limiters[host] = limiter
+        return limiter
+
+
+class HttpFetcher:
+    """基于 requests.Session 的抓取器，复用连接池并保存年龄验证 Cookie"""
+
+    def __init__(self, proxy=None, timeout: int = 15, pool_size: int = 10, log=None):
+        self.timeout = timeout
+        self.log = log or _default_log
+        self._age_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
+        })
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+
+    def pass_age_gate(self, html: str) -> bool:
+        """从年龄验证页面读取 safeid 并写入 _safe Cookie"""
+        match = SAFEID_PATTERN.search(html)
+        if not match:
+            return False
+        with self._age_lock:
+            self.session.cookies.set("_safe", match.group(1), domain="sehuatang.org", path="/")
+        self.log("已通过 HTTP 方式处理年龄验证")
+        return True
+
+    def _get(self, url: str, headers: dict = None) -> requests.Response:
+        with get_rate_limiter(url).limit():
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        if response.status_code == 304:
+            return response
+        response.raise_for_status()
+        if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+            response.encoding = "utf-8"
+        return response
+
+    def fetch(self, url: str, retries: int = 2, cached: dict = None) -> str:
+        """抓取页面 HTML，失败或无法通过年龄验证时返回空字符串；
+        cached 为已过期的缓存条目时发送条件请求，未修改则直接使用缓存内容"""
+        for attempt in range(retries):
+            try:
+                response = self._get(url, http_cache.validators(cached))
+                if response.status_code == 304 and cached:
+                    http_cache.touch(url)
+                    return CachedBody(cached["body"])
+                html = response.text
+                if AGE_GATE_TEXT in html:
+                    if not self.pass_age_gate(html):
+                        self.log(f"HTTP 无法处理年龄验证页面: {url}", "WARNING")
+                        return ""
+                    response = self._get(url)
+                    html = response.text
+                    if AGE_GATE_TEXT in html:
+                        self.log(f"HTTP 年龄验证未生效: {url}", "WARNING")
+                        return ""
+                http_cache.put(url, html, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                return html
+            except Exception as e:
+                self.log(f"HTTP 抓取 {url} 失败 (第 {attempt + 1}/{retries} 次): {str(e)}", "WARNING")
+                if attempt < retries - 1:
+                    time.sleep(attempt + 1)
+        return ""
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    """基于 Selenium 的抓取器，每次抓取从全局浏览器池租用一个已预热的 WebDriver"""
+
+    def __init__(self, proxy=None, log=None):
+        self.proxy = proxy
+        self.log = log or _default_log
+
+    def _wait_ready(self, driver):
+        """等待页面加载完成，代替固定时长的等待"""
+        WebDriverWait(driver, 10).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+
+    def fetch(self, url: str, retries: int = 3) -> str:
+        """使用 Selenium 抓取页面内容，包含重试机制和年龄确认处理"""
+        # 延迟导入，driver_pool 依赖本模块中的常量
+        from driver_pool import driver_pool
+        try:
+            with driver_pool.lease(self.proxy) as pooled:
+                return self._fetch(pooled, url, retries)
+        except Exception as e:
+            self.log(f"获取 WebDriver 失败: {str(e)}", "ERROR")
+            return ""
+
+    def _fetch(self, pooled, url: str, retries: int) -> str:
+        driver = pooled.driver
+        for attempt in range(retries):
+            try:
+                self.log(f"尝试抓取 {url} (第 {attempt + 1}/{retries} 次)", "DEBUG")
+                with get_rate_limiter(url).limit():
+                    driver.get(url)
+                pooled.pages_served += 1
+                self._wait_ready(driver)
+
+                # 检查是否是年龄验证页面
+                if "SEHUATANG.ORG" in driver.title and AGE_GATE_TEXT in driver.page_source:
+                    self.log("检测到年龄验证页面，尝试点击进入按钮")
+                    try:
+                        # 尝试点击中文的进入按钮
+                        enter_buttons = driver.find_elements(By.CSS_SELECTOR, 'a.enter-btn')
+                        if not enter_buttons:
+                            # 尝试点击英文按钮
+                            enter_buttons = driver.find_elements(By.XPATH, '//a[contains(text(), "If you are over 18")]')
+                        if enter_buttons:
+                            enter_buttons[0].click()
+                            self.log("已点击年龄验证进入按钮")
+                            WebDriverWait(driver, 10).until(lambda d: AGE_GATE_TEXT not in d.page_source)
+                            self._wait_ready(driver)
+                    except Exception as age_error:
+                        self.log(f"年龄验证处理: {str(age_error)}")
+
+                # 再次检查页面内容
+                html = driver.page_source
+                if AGE_GATE_TEXT in html or "SEHUATANG.ORG" in driver.title:
+                    self.log("仍然在年龄验证页面，可能需要手动处理", "WARNING")
+                    return ""
+
+                self.log(f"成功抓取 {url}", "DEBUG")
+                return html
+
+            except Exception as e:
+                self.log(f"抓取 {url} 失败 (第 {attempt + 1}/{retries} 次): {str(e)}", "ERROR")
+                if not pooled.is_healthy():
+                    pooled.broken = True
+                    self.log("WebDriver 会话已失效，归还后将被回收", "WARNING")
+                    return ""
+                if attempt < retries - 1:
+                    wait_time = 2 ** (attempt + 1)
+                    self.log(f"等待 {wait_time} 秒后重试...")
+                    time.sleep(wait_time)
+                else:
+                    self.log(f"达到最大重试次数，跳过 {url}", "ERROR")
+                    return ""
+        return ""
+
+    def close(self):
+        # 浏览器归还到全局池中，由池负责回收
+        pass
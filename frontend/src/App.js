@@ -50,15 +50,57 @@ function App() {
     }
   };
 
-  // 定期更新任务状态和日志
+  // 合并服务端推送的任务变化
+  const applyTaskDeltas = (deltas) => {
+    setTasks(prev => {
+      const byId = new Map(prev.map(task => [task.task_id, task]));
+      deltas.forEach(({ logs, deleted, ...delta }) => {
+        if (deleted) {
+          byId.delete(delta.task_id);
+        } else {
+          byId.set(delta.task_id, { ...byId.get(delta.task_id), ...delta });
+        }
+      });
+      return Array.from(byId.values());
+    });
+  };
+
+  // 任务状态通过 SSE 推送更新，不支持或连接失败时回退到定时轮询
   useEffect(() => {
-    fetchTasks();
-    fetchRecentLogs();
-    const interval = setInterval(() => {
+    let pollTimer = null;
+    const startPolling = () => {
+      if (pollTimer) return;
       fetchTasks();
-      fetchRecentLogs();
-    }, 2000); // 每2秒更新一次
-    return () => clearInterval(interval);
+      pollTimer = setInterval(fetchTasks, 2000); // 每2秒更新一次
+    };
+
+    let source = null;
+    if (window.EventSource) {
+      source = new EventSource('/api/tasks/stream?logs=0');
+      source.addEventListener('snapshot', (event) => {
+        // 推送只包含内存中的任务，历史任务从任务列表接口获取
+        fetchTasks().then(() => applyTaskDeltas(JSON.parse(event.data).tasks));
+        if (pollTimer) {
+          clearInterval(pollTimer);
+          pollTimer = null;
+        }
+      });
+      source.addEventListener('delta', (event) => applyTaskDeltas(JSON.parse(event.data).tasks));
+      source.onerror = () => {
+        // EventSource 会自动重连，重连成功后收到 snapshot 时停止轮询
+        startPolling();
+      };
+    } else {
+      startPolling();
+    }
+
+    fetchRecentLogs();
+    const logTimer = setInterval(fetchRecentLogs, 5000);
+    return () => {
+      if (source) source.close();
+      if (pollTimer) clearInterval(pollTimer);
+      clearInterval(logTimer);
+    };
   }, []);
 
   // 开始新任务
@@ -205,56 +205,44 @@ const CrawlForm = ({ onStartTask, loading }) => {
           </Radio.Group>
         </Form.Item>
 
-        <Form.Item
-          noStyle
-          shouldUpdate={(prevValues, currentValues) => prevValues.mode !== currentValues.mode}
-        >
-          {({ getFieldValue }) => {
-            const mode = getFieldValue('mode');
-            if (mode === '1') {
-              return (
-                <Form.Item label="页面范围">
-                  <Space>
-                    <Form.Item
-                      name="start_page"
-                      noStyle
-                      rules={[
-                        { required: true, message: '请输入起始页' },
-                        { type: 'number', min: 1, message: '起始页必须大于0' }
-                      ]}
-                    >
-                      <InputNumber
-                        min={1}
-                        max={100}
-                        placeholder="起始页"
-                        style={{ width: 120 }}
-                      />
-                    </Form.Item>
-                    <span>到</span>
-                    <Form.Item
-                      name="end_page"
-                      noStyle
-                      rules={[
-                        { required: true, message: '请输入结束页' },
-                        { type: 'number', min: 1, message: '结束页必须大于0' }
-                      ]}
-                    >
-                      <InputNumber
-                        min={1}
-                        max={100}
-                        placeholder="结束页"
-                        style={{ width: 120 }}
-                      />
-                    </Form.Item>
-                    <span style={{ color: '#666', fontSize: '12px' }}>
-                      (1-100页)
-                    </span>
-                  </Space>
-                </Form.Item>
-              );
-            }
-            return null;
-          }}
+        {/* 普通模式和热门模式都按页码翻页 */}
+        <Form.Item label="页面范围">
+          <Space>
+            <Form.Item
+              name="start_page"
+              noStyle
+              rules={[
+                { required: true, message: '请输入起始页' },
+                { type: 'number', min: 1, message: '起始页必须大于0' }
+              ]}
+            >
+              <InputNumber
+                min={1}
+                max={100}
+                placeholder="起始页"
+                style={{ width: 120 }}
+              />
+            </Form.Item>
+            <span>到</span>
+            <Form.Item
+              name="end_page"
+              noStyle
+              rules={[
+                { required: true, message: '请输入结束页' },
+                { type: 'number', min: 1, message: '结束页必须大于0' }
+              ]}
+            >
+              <InputNumber
+                min={1}
+                max={100}
+                placeholder="结束页"
+                style={{ width: 120 }}
+              />
+            </Form.Item>
+            <span style={{ color: '#666', fontSize: '12px' }}>
+              (1-100页)
+            </span>
+          </Space>
         </Form.Item>
 
         <Divider />
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Card, Table, Tag, Progress, Button, Space, Popconfirm, message, Tooltip, Modal, Typography, Divider } from 'antd';
 import { 
   DownloadOutlined, 
@@ -19,14 +19,18 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
   const [logModalVisible, setLogModalVisible] = useState(false);
   const [currentLogs, setCurrentLogs] = useState([]);
   const [currentTask, setCurrentTask] = useState(null);
+  const logCursor = useRef(0);
+  const logFetching = useRef(false);
   
   // 获取状态标签
   const getStatusTag = (status) => {
     const statusConfig = {
       pending: { color: 'default', icon: <ClockCircleOutlined />, text: '等待中' },
+      queued: { color: 'default', icon: <ClockCircleOutlined />, text: '排队中' },
       running: { color: 'processing', icon: <LoadingOutlined />, text: '运行中' },
       completed: { color: 'success', icon: <CheckCircleOutlined />, text: '已完成' },
-      failed: { color: 'error', icon: <CloseCircleOutlined />, text: '失败' }
+      failed: { color: 'error', icon: <CloseCircleOutlined />, text: '失败' },
+      cancelled: { color: 'warning', icon: <CloseCircleOutlined />, text: '已取消' }
     };
     
     const config = statusConfig[status] || statusConfig.pending;
@@ -81,13 +85,46 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
     onDownloadResult(taskId);
   };
 
+  // 按游标增量拉取日志，直到读完当前已有的日志
+  const fetchLogs = async (taskId) => {
+    if (logFetching.current) return;
+    logFetching.current = true;
+    try {
+      for (;;) {
+        const response = await fetch(`/api/tasks/${taskId}/logs?after=${logCursor.current}`);
+        const result = await response.json();
+        if (!result.success) return;
+        logCursor.current = result.next;
+        if (result.data.length > 0) {
+          const lines = result.data.map(log => `[${log.time}] ${log.level}: ${log.message}`);
+          setCurrentLogs(prev => [...prev, ...lines]);
+        }
+        if (result.next >= result.last_seq) return;
+      }
+    } catch (error) {
+      console.error('获取日志失败:', error);
+    } finally {
+      logFetching.current = false;
+    }
+  };
+
   // 查看日志
   const handleViewLogs = (record) => {
     setCurrentTask(record);
-    setCurrentLogs(record.logs || []);
+    setCurrentLogs([]);
+    logCursor.current = 0;
     setLogModalVisible(true);
+    fetchLogs(record.task_id);
   };
 
+  // 日志窗口打开且任务未结束时定时拉取新日志
+  const currentStatus = currentTask && (tasks.find(t => t.task_id === currentTask.task_id) || currentTask).status;
+  useEffect(() => {
+    if (!logModalVisible || !currentTask || !['running', 'queued', 'pending'].includes(currentStatus)) return;
+    const timer = setInterval(() => fetchLogs(currentTask.task_id), 2000);
+    return () => clearInterval(timer);
+  }, [logModalVisible, currentTask, currentStatus]);
+
   // 表格列定义
   const columns = [
     {
@@ -118,7 +155,8 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
           '39': '动漫原创',
           '152': '韩国主播'
         };
-        return themeNames[themeId] || themeId;
+        // 多主题任务的 theme_id 为逗号分隔的主题ID
+        return String(themeId).split(',').map(id => themeNames[id] || id).join('、');
       }
     },
     {
@@ -169,9 +207,9 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
       key: 'progress',
       width: 120,
       render: (progress, record) => {
-        if (record.status === 'pending') return '-';
+        if (record.status === 'pending' || record.status === 'queued') return '-';
         if (record.status === 'completed') return '100%';
-        if (record.status === 'failed') return '-';
+        if (record.status === 'failed' || record.status === 'cancelled') return '-';
         return (
           <Progress 
             percent={progress} 
@@ -236,6 +274,17 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
               </Button>
             </Tooltip>
           )}
+          {record.status === 'running' && record.found_links > 0 && (
+            <Tooltip title="下载已找到的部分结果">
+              <Button
+                size="small"
+                icon={<DownloadOutlined />}
+                onClick={() => handleDownload(record.task_id)}
+              >
+                部分
+              </Button>
+            </Tooltip>
+          )}
           <Popconfirm
             title="确定要删除这个任务吗？"
             onConfirm={() => handleDelete(record.task_id)}
@@ -299,7 +348,7 @@ const TaskList = ({ tasks, onDeleteTask, onDownloadResult }) => {
             任务日志
             {currentTask && (
               <Tag color="blue">
-                {currentTask.theme_id} - {currentTask.mode === '2' ? '热门模式' : `第${currentTask.start_page}-${currentTask.end_page}页`}
+                {currentTask.theme_id} - {currentTask.mode === '2' ? '热门模式 ' : ''}第{currentTask.start_page}-{currentTask.end_page}页
               </Tag>
             )}
           </Space>
@@ -0,0 +1,13 @@
+import os
+
+# gunicorn 配置，工作进程数和线程数可通过环境变量调整
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+# 任务推送(SSE)每个连接占用一个线程
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+timeout = 120
+graceful_timeout = 30
+# 不预加载应用，每个工作进程各自打开数据库连接并参与调度器领导选举
+preload_app = False
+accesslog = "-"
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+from crawler_config import crawler_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_responses_size ON responses (size);
+"""
+
+
+class CachedBody(str):
+    """服务器返回 304 后沿用的缓存内容，没有经过网络传输，不计入下载字节数"""
+
+
+def url_ttl(url: str) -> float:
+    """按页面类型决定缓存有效期(秒)：帖子页发布后很少变化，列表页变化频繁"""
+    if "thread-" in url or "mod=viewthread" in url:
+        return crawler_config.get("thread_cache_ttl")
+    return crawler_config.get("listing_cache_ttl")
+
+
+class HttpCache:
+    """页面响应的磁盘缓存，按 URL 保存压缩后的 HTML 及 ETag/Last-Modified，
+    过期后用条件请求重新验证，总大小超出上限时按最近访问时间淘汰；
+    多个进程共用同一个缓存文件，总大小每次从数据库统计"""
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(crawler_config.get("http_cache_enabled"))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file or crawler_config.get("http_cache_file"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def get(self, url: str) -> Optional[dict]:
+        """读取缓存，返回 {body, etag, last_modified, fresh}；未缓存或未启用时返回 None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+        fresh = now - row[3] < url_ttl(url)
+        if fresh:
+            self.hits += 1
+        return {
+            "body": zlib.decompress(row[0]).decode("utf-8"),
+            "etag": row[1],
+            "last_modified": row[2],
+            "fresh": fresh
+        }
+
+    def validators(self, cached: Optional[dict]) -> dict:
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def put(self, url: str, html: str, etag: str = None, last_modified: str = None):
+        """写入或更新缓存，必要时淘汰最久未访问的条目"""
+        if not self.enabled or not html:
+            return
+        body = zlib.compress(html.encode("utf-8"), 6)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, len(body))
+            )
+            self._evict(conn)
+
+    def touch(self, url: str):
+        """服务器返回 304 时刷新缓存的验证时间"""
+        self.revalidated += 1
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    @staticmethod
+    def _total_size(conn: sqlite3.Connection) -> int:
+        """缓存总大小，包含其他进程写入的条目"""
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection):
+        budget = crawler_config.get("http_cache_max_mb") * 1024 * 1024
+        total_size = self._total_size(conn)
+        if total_size <= budget:
+            return
+        # 淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = budget * 0.9
+        while total_size > target:
+            rows = conn.execute("SELECT url, size FROM responses ORDER BY accessed_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            expired = []
+            for url, size in rows:
+                if total_size <= target:
+                    break
+                expired.append((url,))
+                total_size -= size
+            conn.executemany("DELETE FROM responses WHERE url = ?", expired)
+            self.evicted += len(expired)
+
+    def clear(self):
+        """清空缓存"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            entries, total_size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "size_mb": round(total_size / 1024 / 1024, 2),
+                "max_mb": crawler_config.get("http_cache_max_mb"),
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evicted": self.evicted
+            }
+
+
+# 全局响应缓存
+http_cache = HttpCache()
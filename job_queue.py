@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from crawler_config import crawler_config
+
+# 数值越小优先级越高，手动任务优先于定时任务
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 10
+
+
+class Job:
+    """队列中的一个爬取任务"""
+
+    def __init__(self, job_id: str, target: Callable, args: tuple, priority: int, seq: int):
+        self.job_id = job_id
+        self.target = target
+        self.args = args
+        self.priority = priority
+        self.seq = seq
+        self.queued_at = time.time()
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class JobQueue:
+    """全局爬取任务队列，限制同时运行的任务数，超出的任务按优先级排队，队列满时拒绝"""
+
+    def __init__(self):
+        self._heap = []
+        self._queued = {}
+        self._running = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        return max(1, int(crawler_config.get("max_concurrent_crawls")))
+
+    @property
+    def max_depth(self) -> int:
+        return max(0, int(crawler_config.get("max_queued_crawls")))
+
+    def submit(self, job_id: str, target: Callable, args: tuple = (), priority: int = PRIORITY_MANUAL) -> Optional[int]:
+        """提交任务；有空闲名额时立即开始并返回 0，否则返回排队位置，队列已满时返回 None"""
+        with self._lock:
+            if len(self._running) >= self.max_workers and len(self._queued) >= self.max_depth:
+                return None
+            job = Job(job_id, target, args, priority, next(self._seq))
+            heapq.heappush(self._heap, job)
+            self._queued[job_id] = job
+            self._dispatch()
+            return self._position(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """取消一个尚未开始的任务"""
+        with self._lock:
+            job = self._queued.pop(job_id, None)
+            if not job:
+                return False
+            job.cancelled = True
+            return True
+
+    def position(self, job_id: str) -> int:
+        """任务在队列中的位置，从 1 开始；未在排队时返回 0"""
+        with self._lock:
+            return self._position(job_id)
+
+    def _position(self, job_id: str) -> int:
+        job = self._queued.get(job_id)
+        if not job:
+            return 0
+        return 1 + sum(1 for other in self._queued.values() if other < job)
+
+    def _next(self) -> Optional[Job]:
+        """在锁内取出优先级最高的任务，已取消的任务直接丢弃"""
+        while self._heap and len(self._running) < self.max_workers:
+            job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+            del self._queued[job.job_id]
+            self._running[job.job_id] = job
+            return job
+        return None
+
+    def _dispatch(self):
+        # 每个空闲名额启动一个工作线程，线程执行完后继续领取队列中的任务，队列为空时退出
+        job = self._next()
+        while job:
+            threading.Thread(target=self._work, args=(job,), name=f"crawl-{job.job_id}", daemon=True).start()
+            job = self._next()
+
+    def _work(self, job: Job):
+        while job:
+            try:
+                job.target(*job.args)
+            except Exception as e:
+                logging.error(f"队列任务 {job.job_id} 执行失败: {str(e)}")
+            with self._lock:
+                self._running.pop(job.job_id, None)
+                job = self._next()
+
+    def stats(self) -> dict:
+        """队列状态"""
+        with self._lock:
+            queued = sorted(self._queued.values())
+            return {
+                "max_workers": self.max_workers,
+                "max_depth": self.max_depth,
+                "running": len(self._running),
+                "queued": len(queued),
+                "running_jobs": list(self._running),
+                "queued_jobs": [
+                    {"job_id": job.job_id, "priority": job.priority, "queued_at": job.queued_at}
+                    for job in queued
+                ]
+            }
+
+
+# 全局任务队列
+job_queue = JobQueue()
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import re
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, quote
+
+XT_PATTERN = re.compile(r'urn:([a-z0-9]+):([a-z0-9]+)', re.IGNORECASE)
+
+
+def _btih_to_hex(value: str) -> Optional[str]:
+    """把 btih 转成 40 位小写十六进制，支持 32 位 base32 形式"""
+    if len(value) == 40 and re.fullmatch(r'[0-9a-fA-F]{40}', value):
+        return value.lower()
+    if len(value) == 32:
+        try:
+            return binascii.hexlify(base64.b32decode(value.upper())).decode("ascii")
+        except (binascii.Error, ValueError):
+            return None
+    return None
+
+
+def parse_magnet(uri: str) -> Optional[dict]:
+    """解析磁力链接，返回规范化的 infohash、名称和 tracker 列表"""
+    uri = uri.strip().replace("&amp;", "&")
+    if not uri.lower().startswith("magnet:?"):
+        return None
+    infohash = None
+    name = ""
+    trackers = []
+    for key, value in parse_qsl(uri[len("magnet:?"):], keep_blank_values=True):
+        key = key.lower()
+        if key == "xt" and infohash is None:
+            match = XT_PATTERN.fullmatch(value.strip())
+            if not match:
+                continue
+            scheme, digest = match.group(1).lower(), match.group(2)
+            if scheme == "btih":
+                infohash = _btih_to_hex(digest)
+            else:
+                infohash = f"{scheme}:{digest.lower()}"
+        elif key == "dn" and len(value) > len(name):
+            name = value.strip()
+        elif key == "tr" and value and value not in trackers:
+            trackers.append(value.strip())
+    if not infohash:
+        return None
+    return {"infohash": infohash, "name": name, "trackers": trackers}
+
+
+def canonical_infohash(uri: str) -> Optional[str]:
+    """提取磁力链接的规范 infohash，无法解析时返回 None"""
+    parsed = parse_magnet(uri)
+    return parsed["infohash"] if parsed else None
+
+
+def build_magnet(infohash: str, name: str = "", trackers: Iterable[str] = ()) -> str:
+    """按规范格式生成磁力链接"""
+    scheme = "btih"
+    if ":" in infohash:
+        scheme, infohash = infohash.split(":", 1)
+    link = f"magnet:?xt=urn:{scheme}:{infohash}"
+    if name:
+        link += "&dn=" + quote(name)
+    for tracker in trackers:
+        link += "&tr=" + quote(tracker, safe=":/")
+    return link
+
+
+def merge_magnet(existing: dict, other: dict) -> bool:
+    """把同一 infohash 的另一条记录合并进来，保留最长的名称和全部 tracker，返回是否有变化"""
+    changed = False
+    if len(other["name"]) > len(existing["name"]):
+        existing["name"] = other["name"]
+        changed = True
+    for tracker in other["trackers"]:
+        if tracker not in existing["trackers"]:
+            existing["trackers"].append(tracker)
+            changed = True
+    return changed
+
+
+def dedup_magnets(links: Iterable[str]) -> List[str]:
+    """按 infohash 去重并合并信息，返回规范化的磁力链接，保持首次出现的顺序"""
+    merged: Dict[str, dict] = {}
+    for link in links:
+        parsed = parse_magnet(link)
+        if not parsed:
+            continue
+        if parsed["infohash"] in merged:
+            merge_magnet(merged[parsed["infohash"]], parsed)
+        else:
+            merged[parsed["infohash"]] = parsed
+    return [build_magnet(m["infohash"], m["name"], m["trackers"]) for m in merged.values()]
@@ -0,0 +1,81 @@
+import re
+from typing import List
+import lxml.html
+from magnet import dedup_magnets
+
+BASE_URL = "https://sehuatang.org"
+
+# 列表页中的帖子链接: thread-<tid>-<page>-<x>.html、thread.php?tid=<tid>、forum.php?mod=viewthread&tid=<tid>
+THREAD_HREF_PATTERN = re.compile(
+    r'(thread-\d+)-\d+-\d+\.html|thread\.php\?tid=(\d+)|forum\.php\?mod=viewthread&tid=(\d+)'
+)
+# 正文中的磁力链接，连同紧跟其后的 dn/tr 等参数一起提取；infohash 只接受 btmh 多重哈希、
+# 40 位十六进制和 32 位 base32，紧跟下一个链接时不会把 "magnet" 吞进 infohash
+MAGNET_PATTERN = re.compile(
+    r'magnet:\?xt=urn:[a-z0-9]+:(?:1220[0-9a-f]{64}|[0-9a-f]{40}|[a-z2-7]{32})(?=magnet:|[^0-9a-z]|$)'
+    r'(?:&[a-z]{1,3}(?:\.\d+)?=(?:(?!magnet:)[^\s&<>"\'])*)*',
+    re.IGNORECASE
+)
+MAGNET_MARK = re.compile(r'magnet:', re.IGNORECASE)
+
+# 文本中需要断开的块级元素，Discuz 代码块中每个链接占一个 <li> 或以 <br> 分隔
+BLOCK_TAGS = ("br", "li", "p", "div", "tr", "td")
+
+# 可能包含磁力链接正文的容器，与原先的 CSS 选择器一致
+CONTAINER_XPATH = " | ".join(
+    [f"//div[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+     for cls in ("blockcode", "t_msgfont", "postcontent", "message")] + ["//p"]
+)
+
+
+def _parse(html: str):
+    try:
+        return lxml.html.fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        # 带编码声明的字符串或空文档，交给 lxml 按字节解析
+        return lxml.html.fromstring(html.encode("utf-8")) if html.strip() else None
+
+
+def parse_thread_urls(html: str) -> List[str]:
+    """从列表页提取所有主题的第一页链接，按出现顺序去重"""
+    root = _parse(html)
+    if root is None:
+        return []
+    thread_urls = []
+    seen = set()
+    for href in root.xpath("//a/@href"):
+        match = THREAD_HREF_PATTERN.search(href)
+        if not match:
+            continue
+        thread_id = match.group(1) or f"thread-{match.group(2) or match.group(3)}"
+        if thread_id not in seen:
+            seen.add(thread_id)
+            thread_urls.append(f"{BASE_URL}/{thread_id}-1-1.html")
+    return thread_urls
+
+
+def parse_magnet_links(html: str) -> List[str]:
+    """从帖子页提取磁力链接，按 infohash 去重并规范化，保持出现顺序"""
+    # 页面中没有磁力链接时无需解析
+    if not MAGNET_MARK.search(html):
+        return []
+    root = _parse(html)
+    if root is None:
+        return []
+
+    # text_content() 会把相邻块的文本直接拼接，在块之后插入换行，避免前一个链接的参数连上下一个链接
+    for element in root.iter(*BLOCK_TAGS):
+        element.tail = "\n" + (element.tail or "")
+
+    magnet_links = []
+
+    # 只扫描最外层的容器，嵌套的 p/div 文本已包含在外层文本中
+    containers = root.xpath(CONTAINER_XPATH)
+    selected = set(containers)
+    for element in containers:
+        if any(ancestor in selected for ancestor in element.iterancestors()):
+            continue
+        magnet_links.extend(MAGNET_PATTERN.findall(element.text_content()))
+
+    magnet_links.extend(href for href in root.xpath("//a/@href") if href.startswith('magnet:'))
+    return dedup_magnets(magnet_links)
@@ -5,8 +5,22 @@ from typing import Optional
 class ProxyConfig:
     def __init__(self, config_file: str = "proxy_config.json"):
         self.config_file = config_file
+        self._mtime = self._file_mtime()
         self.config = self.load_config()
     
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.config_file)
+        except OSError:
+            return None
+    
+    def _reload_if_changed(self):
+        """多进程部署时配置可能被其他进程修改，文件有变化时重新加载"""
+        mtime = self._file_mtime()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self.config = self.load_config()
+    
     def load_config(self) -> dict:
         """加载代理配置"""
         if os.path.exists(self.config_file):
@@ -26,6 +40,7 @@ class ProxyConfig:
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, ensure_ascii=False, indent=2)
+            self._mtime = self._file_mtime()
         except Exception as e:
             print(f"保存代理配置失败: {e}")
     
@@ -38,12 +53,14 @@ class ProxyConfig:
     
     def get_proxy(self) -> Optional[str]:
         """获取当前代理设置"""
+        self._reload_if_changed()
         if self.config.get("proxy_enabled") and self.config.get("proxy_url"):
             return self.config["proxy_url"]
         return None
     
     def is_enabled(self) -> bool:
         """检查代理是否启用"""
+        self._reload_if_changed()
         return self.config.get("proxy_enabled", False)
     
     def disable_proxy(self):
@@ -53,6 +70,7 @@ class ProxyConfig:
     
     def get_config(self) -> dict:
         """获取完整配置"""
+        self._reload_if_changed()
         return self.config.copy()
 
 # 全局代理配置实例
@@ -0,0 +1,216 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from crawler_config import crawler_config
+from magnet import parse_magnet, merge_magnet, build_magnet
+
+THREAD_ID_PATTERN = re.compile(r'(thread-\d+)')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    theme_id TEXT,
+    last_fetched REAL NOT NULL,
+    magnets TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS magnets (
+    id INTEGER PRIMARY KEY,
+    infohash TEXT NOT NULL UNIQUE,
+    magnet TEXT NOT NULL,
+    thread_id TEXT,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_magnets (
+    task_id TEXT NOT NULL,
+    magnet_id INTEGER NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (task_id, magnet_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_threads_theme ON threads (theme_id);
+CREATE INDEX IF NOT EXISTS idx_magnets_thread ON magnets (thread_id);
+"""
+
+
+def thread_id_from_url(url: str) -> Optional[str]:
+    """从帖子链接中提取 thread-<tid> 形式的主题ID"""
+    match = THREAD_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def magnet_infohash(magnet: str) -> str:
+    """提取磁力链接的规范 infohash 作为去重键，也接受单独的 infohash"""
+    value = magnet.strip()
+    if not value.lower().startswith("magnet:"):
+        value = f"magnet:?xt=urn:btih:{value}"
+    parsed = parse_magnet(value)
+    return parsed["infohash"] if parsed else magnet.strip().lower()
+
+
+class ResultStore:
+    """基于 SQLite 的结果库，按 infohash 跨任务去重磁力链接"""
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file or crawler_config.get("db_file"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def connection(self):
+        """在锁内使用共享连接"""
+        with self._lock:
+            yield self._connect()
+
+    @contextmanager
+    def transaction(self):
+        """在一个事务中批量写入"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def record_thread(self, task_id: Optional[str], thread_url: str, theme_id: Optional[str],
+                      magnets: List[str]) -> List[str]:
+        """记录一个已抓取的帖子及其磁力链接，返回此前从未收录过的链接"""
+        thread_id = thread_id_from_url(thread_url)
+        now = time.time()
+        by_hash = {}
+        for magnet in magnets:
+            parsed = parse_magnet(magnet)
+            if not parsed:
+                continue
+            if parsed["infohash"] in by_hash:
+                merge_magnet(by_hash[parsed["infohash"]], parsed)
+            else:
+                by_hash[parsed["infohash"]] = parsed
+
+        with self.transaction() as conn:
+            if thread_id:
+                conn.execute(
+                    "INSERT OR REPLACE INTO threads (thread_id, url, theme_id, last_fetched, magnets) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (thread_id, thread_url, theme_id, now, json.dumps(sorted(set(magnets))))
+                )
+            if not by_hash:
+                return []
+
+            hashes = list(by_hash)
+            placeholders = ",".join("?" * len(hashes))
+            known = dict(conn.execute(
+                f"SELECT infohash, magnet FROM magnets WHERE infohash IN ({placeholders})", hashes
+            ).fetchall())
+            new_hashes = [h for h in hashes if h not in known]
+            conn.executemany(
+                "INSERT OR IGNORE INTO magnets (infohash, magnet, thread_id, first_seen) VALUES (?, ?, ?, ?)",
+                [(h, self._build(by_hash[h]), thread_id, now) for h in new_hashes]
+            )
+            # 已收录的资源出现更完整的名称或 tracker 时更新
+            updates = []
+            for h, stored in known.items():
+                merged = parse_magnet(stored)
+                if merged and merge_magnet(merged, by_hash[h]):
+                    updates.append((self._build(merged), h))
+            if updates:
+                conn.executemany("UPDATE magnets SET magnet = ? WHERE infohash = ?", updates)
+            if task_id:
+                conn.execute(
+                    f"INSERT OR IGNORE INTO task_magnets (task_id, magnet_id, added_at) "
+                    f"SELECT ?, id, ? FROM magnets WHERE infohash IN ({placeholders})",
+                    [task_id, now] + hashes
+                )
+        return [self._build(by_hash[h]) for h in new_hashes]
+
+    @staticmethod
+    def _build(parsed: dict) -> str:
+        return build_magnet(parsed["infohash"], parsed["name"], parsed["trackers"])
+
+    def lookup(self, magnet_or_hash: str) -> Optional[dict]:
+        """按磁力链接或 infohash 查询是否已收录"""
+        infohash = magnet_infohash(magnet_or_hash)
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT m.id, m.infohash, m.magnet, m.thread_id, m.first_seen, t.url, t.theme_id "
+                "FROM magnets m LEFT JOIN threads t ON t.thread_id = m.thread_id WHERE m.infohash = ?",
+                (infohash,)
+            ).fetchone()
+            if not row:
+                return None
+            tasks = [r[0] for r in conn.execute(
+                "SELECT task_id FROM task_magnets WHERE magnet_id = ? ORDER BY added_at", (row[0],)
+            )]
+        return {
+            "infohash": row[1],
+            "magnet": row[2],
+            "thread_id": row[3],
+            "first_seen": row[4],
+            "thread_url": row[5],
+            "theme_id": row[6],
+            "tasks": tasks
+        }
+
+    def iter_task_magnets(self, task_id: str, batch_size: int = 1000) -> Iterator[str]:
+        """按主键顺序分批读取任务的磁力链接"""
+        last_id = 0
+        while True:
+            with self.connection() as conn:
+                rows = conn.execute(
+                    "SELECT tm.magnet_id, m.magnet FROM task_magnets tm JOIN magnets m ON m.id = tm.magnet_id "
+                    "WHERE tm.task_id = ? AND tm.magnet_id > ? ORDER BY tm.magnet_id LIMIT ?",
+                    (task_id, last_id, batch_size)
+                ).fetchall()
+            for row in rows:
+                yield row[1]
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def task_magnet_count(self, task_id: str) -> int:
+        with self.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM task_magnets WHERE task_id = ?", (task_id,)).fetchone()[0]
+
+    def delete_task(self, task_id: str):
+        """删除任务与磁力链接的关联，磁力链接本身保留用于去重"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM task_magnets WHERE task_id = ?", (task_id,))
+
+    def stats(self) -> dict:
+        """统计结果库数据"""
+        with self.connection() as conn:
+            magnet_count = conn.execute("SELECT COUNT(*) FROM magnets").fetchone()[0]
+            thread_count = conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            task_count = conn.execute("SELECT COUNT(DISTINCT task_id) FROM task_magnets").fetchone()[0]
+            themes = conn.execute(
+                "SELECT t.theme_id, COUNT(DISTINCT t.thread_id), COUNT(m.id) "
+                "FROM threads t LEFT JOIN magnets m ON m.thread_id = t.thread_id GROUP BY t.theme_id"
+            ).fetchall()
+        return {
+            "magnets": magnet_count,
+            "threads": thread_count,
+            "tasks": task_count,
+            "themes": [
+                {"theme_id": theme_id, "threads": threads, "magnets": magnets}
+                for theme_id, threads, magnets in themes
+            ]
+        }
+
+
+# 全局结果库实例
+result_store = ResultStore()
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from typing import Iterable, List
+from magnet import parse_magnet, merge_magnet, build_magnet
+
+PARTIAL_SUFFIX = ".part"
+
+
+def partial_path(output_file: str) -> str:
+    """爬取进行中结果文件的路径"""
+    return output_file + PARTIAL_SUFFIX
+
+
+class MagnetSink:
+    """边爬取边写入的结果文件，按 infohash 去重后追加写入，结束时原子地重命名为最终文件"""
+
+    def __init__(self, output_file: str, resume: bool = False, flush_interval: float = 5.0, flush_every: int = 50):
+        self.output_file = output_file
+        self.partial_file = partial_path(output_file)
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.entries = {}  # infohash -> 解析后的磁力链接，无法解析的链接以原文为键
+        self._dirty = False
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # 继续中断的任务时保留已写入的链接
+        if resume and os.path.exists(self.partial_file):
+            with open(self.partial_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._merge(line.strip())
+            self._file = open(self.partial_file, "a", encoding="utf-8")
+        else:
+            self._file = open(self.partial_file, "w", encoding="utf-8")
+
+    @property
+    def count(self) -> int:
+        return len(self.entries)
+
+    def _merge(self, link: str):
+        """合并一条链接，新的 infohash 返回规范化链接，已存在则返回 None"""
+        parsed = parse_magnet(link)
+        key = parsed["infohash"] if parsed else link
+        existing = self.entries.get(key)
+        if key not in self.entries:
+            self.entries[key] = parsed
+            return build_magnet(parsed["infohash"], parsed["name"], parsed["trackers"]) if parsed else link
+        # 同一资源出现更完整的名称或 tracker 时，结束时重写文件
+        if parsed and existing and merge_magnet(existing, parsed):
+            self._dirty = True
+        return None
+
+    def _lines(self):
+        for key, parsed in self.entries.items():
+            yield (build_magnet(parsed["infohash"], parsed["name"], parsed["trackers"]) if parsed else key) + "\n"
+
+    def add(self, links: Iterable[str]) -> List[str]:
+        """写入新出现的链接，返回本次新增的链接"""
+        with self._lock:
+            new_links = []
+            for link in links:
+                new_link = self._merge(link)
+                if new_link:
+                    new_links.append(new_link)
+            if new_links:
+                # 写入操作系统缓冲，下载部分结果时即可读到
+                self._file.write("".join(link + "\n" for link in new_links))
+                self._file.flush()
+                self._pending += len(new_links)
+            if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+            return new_links
+
+    def _flush(self):
+        """刷新到磁盘，容器被强制停止时也不会丢失已写入的结果"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def finalize(self) -> str:
+        """写完所有数据并原子替换为最终结果文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+            if self._dirty:
+                # 用合并后的信息重写结果
+                tmp_file = self.partial_file + ".tmp"
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    f.writelines(self._lines())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.partial_file)
+            os.replace(self.partial_file, self.output_file)
+            return self.output_file
+
+    def close(self):
+        """刷新并关闭文件，保留未完成的结果供下载或排查"""
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def discard(self):
+        """关闭并删除未完成的结果文件"""
+        self.close()
+        if os.path.exists(self.partial_file):
+            os.remove(self.partial_file)
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from typing import List
+from result_store import ResultStore, result_store
+from shared_state import PROCESS_ID
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduled_tasks (
+    task_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scheduled_runs (
+    run_id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    output_file TEXT,
+    magnet_count INTEGER,
+    metrics TEXT,
+    owner TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduled_runs_task ON scheduled_runs (task_id, started_at);
+"""
+
+RUN_COLUMNS = ("run_id", "task_id", "started_at", "ended_at", "status", "error", "output_file", "magnet_count", "metrics")
+
+
+class ScheduleStore:
+    """定时任务的持久化存储，每个任务一行，保存在结果库的 SQLite 数据库中；
+    每次修改只写入对应的一行，在事务中完成，不会因并发写入或进程崩溃损坏"""
+
+    def __init__(self, store: ResultStore = None):
+        self.store = store or result_store
+        self._ready = False
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            conn.executescript(SCHEMA)
+            self._ready = True
+
+    def load_all(self) -> List[dict]:
+        """读取全部定时任务"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute("SELECT data FROM scheduled_tasks ORDER BY task_id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def version(self) -> tuple:
+        """任务表的版本，其他进程增删改任务后会变化"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            return tuple(conn.execute("SELECT COUNT(*), MAX(updated_at) FROM scheduled_tasks").fetchone())
+
+    def save(self, task_data: dict):
+        """写入或更新单个定时任务"""
+        self.save_many([task_data])
+
+    def save_many(self, tasks: List[dict]):
+        """在一个事务中写入多个定时任务"""
+        now = time.time()
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO scheduled_tasks (task_id, data, updated_at) VALUES (?, ?, ?)",
+                [(task["task_id"], json.dumps(task, ensure_ascii=False), now) for task in tasks]
+            )
+
+    def delete(self, task_id: str):
+        """删除定时任务"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM scheduled_tasks WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM scheduled_runs WHERE task_id = ?", (task_id,))
+
+    def start_run(self, run_id: str, task_id: str, output_file: str, started_at: float = None):
+        """记录一次运行开始，owner 为执行运行的进程"""
+        started_at = started_at or time.time()
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO scheduled_runs "
+                "(run_id, task_id, started_at, status, output_file, owner, heartbeat) "
+                "VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                (run_id, task_id, started_at, output_file, PROCESS_ID, started_at)
+            )
+
+    def touch_runs(self):
+        """刷新当前进程运行中记录的心跳"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "UPDATE scheduled_runs SET heartbeat = ? WHERE status = 'running' AND owner = ?",
+                (time.time(), PROCESS_ID)
+            )
+
+    def finish_run(self, run_id: str, status: str, error: str = None, magnet_count: int = None,
+                   metrics: dict = None, ended_at: float = None):
+        """记录一次运行结束及其指标"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "UPDATE scheduled_runs SET ended_at = ?, status = ?, error = ?, magnet_count = ?, metrics = ? "
+                "WHERE run_id = ?",
+                (ended_at or time.time(), status, error, magnet_count,
+                 json.dumps(metrics, ensure_ascii=False) if metrics else None, run_id)
+            )
+
+    def mark_interrupted_runs(self, stale_after: float = 0) -> int:
+        """把执行进程已退出的运行中记录标记为中断：当前进程的运行不受影响，
+        其他进程的运行超过 stale_after 秒没有心跳时视为该进程已退出"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            return conn.execute(
+                "UPDATE scheduled_runs SET status = 'interrupted' WHERE status = 'running' "
+                "AND (owner IS NULL OR owner != ?) AND (heartbeat IS NULL OR heartbeat <= ?)",
+                (PROCESS_ID, time.time() - stale_after)
+            ).rowcount
+
+    def running_task_ids(self) -> set:
+        """有运行中记录的定时任务ID"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute("SELECT DISTINCT task_id FROM scheduled_runs WHERE status = 'running'").fetchall()
+        return {row[0] for row in rows}
+
+    def list_runs(self, task_id: str, limit: int = 20, offset: int = 0) -> List[dict]:
+        """按开始时间倒序分页读取任务的运行记录"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM scheduled_runs WHERE task_id = ? "
+                f"ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                (task_id, limit, offset)
+            ).fetchall()
+        runs = []
+        for row in rows:
+            run = dict(zip(RUN_COLUMNS, row))
+            run["metrics"] = json.loads(run["metrics"]) if run["metrics"] else None
+            run["duration"] = round(run["ended_at"] - run["started_at"], 3) if run["ended_at"] else None
+            runs.append(run)
+        return runs
+
+    def count_runs(self, task_id: str) -> int:
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            return conn.execute("SELECT COUNT(*) FROM scheduled_runs WHERE task_id = ?", (task_id,)).fetchone()[0]
+
+    def import_json(self, config_file: str) -> int:
+        """把旧版 scheduled_tasks.json 导入数据库，导入后文件改名保留；数据库中已有任务时不导入。
+        多个进程同时启动时只有一个进程的导入生效，文件已被其他进程改名时视为已导入"""
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                tasks = json.load(f).get("tasks", [])
+        except FileNotFoundError:
+            return 0
+        imported = 0
+        if tasks:
+            now = time.time()
+            rows = [(task["task_id"], json.dumps(task, ensure_ascii=False), now) for task in tasks]
+            with self.store.transaction() as conn:
+                self._ensure_schema(conn)
+                # 检查和写入在同一条语句中完成，并发导入时后执行的一方不会写入任何任务
+                imported = conn.execute(
+                    f"INSERT OR REPLACE INTO scheduled_tasks (task_id, data, updated_at) "
+                    f"SELECT column1, column2, column3 FROM (VALUES {', '.join(['(?, ?, ?)'] * len(rows))}) "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM scheduled_tasks)",
+                    [value for row in rows for value in row]
+                ).rowcount
+        try:
+            os.replace(config_file, config_file + ".migrated")
+        except FileNotFoundError:
+            pass
+        return imported
+
+# 全局定时任务存储
+schedule_store = ScheduleStore()
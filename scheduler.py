@@ -1,16 +1,26 @@
-import json
+import heapq
+import itertools
 import os
 import time
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from sehuatang_crawler import SehuatangCrawler
+from async_crawler import create_crawler
 from proxy_config import proxy_config
+from schedule_store import ScheduleStore, schedule_store
+from job_queue import job_queue, PRIORITY_SCHEDULED
+from crawler_config import crawler_config
+from result_writer import partial_path
+from checkpoint import checkpoint_path
+
+# 上一次运行尚未结束时再次到期的处理方式: 跳过本次、结束后补跑一次、取消上一次后重新运行
+OVERLAP_POLICIES = ("skip", "queue", "cancel")
 
 class ScheduledTask:
     def __init__(self, task_id: str, name: str, theme_id: str, mode: str, 
                  start_page: int, end_page: int, schedule_type: str, 
-                 schedule_value: str, enabled: bool = True):
+                 schedule_value: str, enabled: bool = True, incremental: bool = True,
+                 overlap_policy: str = "skip", timeout_minutes: int = 0):
         self.task_id = task_id
         self.name = name
         self.theme_id = theme_id
@@ -20,6 +30,9 @@ class ScheduledTask:
         self.schedule_type = schedule_type  # daily, weekly, interval
         self.schedule_value = schedule_value  # HH:MM, day_of_week, minutes
         self.enabled = enabled
+        self.incremental = incremental  # 只抓取上次运行后出现的新帖子
+        self.overlap_policy = overlap_policy if overlap_policy in OVERLAP_POLICIES else "skip"
+        self.timeout_minutes = timeout_minutes  # 单次运行超时(分钟)，0 表示不限制
         self.last_run = None
         self.next_run = None
         self.run_count = 0
@@ -37,6 +50,9 @@ class ScheduledTask:
             "schedule_type": self.schedule_type,
             "schedule_value": self.schedule_value,
             "enabled": self.enabled,
+            "incremental": self.incremental,
+            "overlap_policy": self.overlap_policy,
+            "timeout_minutes": self.timeout_minutes,
             "last_run": self.last_run.isoformat() if self.last_run else None,
             "next_run": self.next_run.isoformat() if self.next_run else None,
             "run_count": self.run_count,
@@ -72,7 +88,7 @@ class ScheduledTask:
         elif self.schedule_type == "interval":
             # 间隔时间运行
             minutes = int(self.schedule_value)
-            if self.last_run:
+            if self.last_run and self.last_run + timedelta(minutes=minutes) > now:
                 next_run = self.last_run + timedelta(minutes=minutes)
             else:
                 next_run = now + timedelta(minutes=minutes)
@@ -94,34 +110,79 @@ class ScheduledTask:
         return datetime.now() >= self.next_run
 
 class TaskScheduler:
-    def __init__(self, config_file: str = "scheduled_tasks.json"):
-        self.config_file = config_file
+    def __init__(self, config_file: str = "scheduled_tasks.json", store: ScheduleStore = None):
+        self.config_file = config_file  # 旧版 JSON 文件，首次启动时导入数据库
+        self.store = store or schedule_store
         self.scheduled_tasks: Dict[str, ScheduledTask] = {}
         self.running = False
         self.thread = None
+        # 正在排队或运行中的定时任务，每个任务同时只有一次运行
+        self.active_runs: Dict[str, dict] = {}
+        self._runs_lock = threading.Lock()
+        # 按下次运行时间排序的最小堆，任务变化时压入新条目，过期条目在出堆时丢弃
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # 多进程部署时任务可能被其他进程修改，读写前从数据库刷新
+        self.shared = False
+        self._store_version = None
+        self._heartbeat_thread = None
         self.load_tasks()
     
     def load_tasks(self):
         """加载定时任务"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for task_data in data.get("tasks", []):
-                        task = self._create_task_from_dict(task_data)
-                        if task:
-                            self.scheduled_tasks[task.task_id] = task
-            except Exception as e:
-                print(f"加载定时任务失败: {e}")
+        try:
+            imported = self.store.import_json(self.config_file)
+            if imported:
+                print(f"已从 {self.config_file} 导入 {imported} 个定时任务")
+            self._store_version = self.store.version()
+            for task_data in self.store.load_all():
+                task = self._create_task_from_dict(task_data)
+                if task:
+                    self.scheduled_tasks[task.task_id] = task
+                    self._schedule(task)
+        except Exception as e:
+            print(f"加载定时任务失败: {e}")
     
-    def save_tasks(self):
-        """保存定时任务"""
+    def refresh(self):
+        """数据库中的任务被其他进程修改过时重新加载，已有的任务对象原地更新，正在执行的运行仍持有同一对象"""
+        if not self.shared:
+            return
         try:
-            data = {
-                "tasks": [task.to_dict() for task in self.scheduled_tasks.values()]
-            }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            version = self.store.version()
+            if version == self._store_version:
+                return
+            self._store_version = version
+            with self._runs_lock:
+                active = set(self.active_runs)
+            loaded = {}
+            for task_data in self.store.load_all():
+                task = self._create_task_from_dict(task_data)
+                if task:
+                    loaded[task.task_id] = task
+            for task_id in list(self.scheduled_tasks):
+                if task_id not in loaded:
+                    del self.scheduled_tasks[task_id]
+            for task_id, task in loaded.items():
+                existing = self.scheduled_tasks.get(task_id)
+                if existing:
+                    if task_id in active:
+                        # 派发时已算好下次运行时间，不用数据库中可能较早的时间覆盖，避免运行期间再次到期
+                        task.next_run, task.last_run = existing.next_run, existing.last_run
+                    existing.__dict__.update(task.__dict__)
+                    task = existing
+                else:
+                    self.scheduled_tasks[task_id] = task
+                self._schedule(task)
+        except Exception as e:
+            print(f"刷新定时任务失败: {e}")
+    
+    def save_task(self, task: ScheduledTask):
+        """保存单个定时任务，运行期间已被删除的任务不再写回"""
+        if task.task_id not in self.scheduled_tasks:
+            return
+        try:
+            self.store.save(task.to_dict())
         except Exception as e:
             print(f"保存定时任务失败: {e}")
     
@@ -137,7 +198,10 @@ class TaskScheduler:
                 end_page=task_data["end_page"],
                 schedule_type=task_data["schedule_type"],
                 schedule_value=task_data["schedule_value"],
-                enabled=task_data.get("enabled", True)
+                enabled=task_data.get("enabled", True),
+                incremental=task_data.get("incremental", True),
+                overlap_policy=task_data.get("overlap_policy", "skip"),
+                timeout_minutes=task_data.get("timeout_minutes", 0)
             )
             
             if task_data.get("last_run"):
@@ -156,9 +220,10 @@ class TaskScheduler:
             return None
     
     def add_task(self, name: str, theme_id: str, mode: str, start_page: int, 
-                 end_page: int, schedule_type: str, schedule_value: str) -> str:
+                 end_page: int, schedule_type: str, schedule_value: str, incremental: bool = True,
+                 overlap_policy: str = "skip", timeout_minutes: int = 0) -> str:
         """添加定时任务"""
-        task_id = f"scheduled_{int(time.time())}"
+        task_id = f"scheduled_{int(time.time() * 1000)}_{next(self._seq)}"
         task = ScheduledTask(
             task_id=task_id,
             name=name,
@@ -167,43 +232,55 @@ class TaskScheduler:
             start_page=start_page,
             end_page=end_page,
             schedule_type=schedule_type,
-            schedule_value=schedule_value
+            schedule_value=schedule_value,
+            incremental=incremental,
+            overlap_policy=overlap_policy,
+            timeout_minutes=timeout_minutes
         )
-        task.calculate_next_run()
-        
         self.scheduled_tasks[task_id] = task
-        self.save_tasks()
+        self._reschedule(task)
+        self.save_task(task)
         return task_id
     
     def update_task(self, task_id: str, **kwargs) -> bool:
         """更新定时任务"""
+        self.refresh()
         if task_id not in self.scheduled_tasks:
             return False
         
         task = self.scheduled_tasks[task_id]
         for key, value in kwargs.items():
+            if key == "overlap_policy" and value not in OVERLAP_POLICIES:
+                continue
             if hasattr(task, key):
                 setattr(task, key, value)
         
         task.updated_at = datetime.now()
-        task.calculate_next_run()
-        self.save_tasks()
+        self._reschedule(task)
+        self.save_task(task)
         return True
     
     def delete_task(self, task_id: str) -> bool:
         """删除定时任务"""
+        self.refresh()
         if task_id in self.scheduled_tasks:
             del self.scheduled_tasks[task_id]
-            self.save_tasks()
+            self._wake()
+            try:
+                self.store.delete(task_id)
+            except Exception as e:
+                print(f"删除定时任务失败: {e}")
             return True
         return False
     
     def get_task(self, task_id: str) -> Optional[ScheduledTask]:
         """获取任务"""
+        self.refresh()
         return self.scheduled_tasks.get(task_id)
     
     def get_all_tasks(self) -> List[ScheduledTask]:
         """获取所有任务"""
+        self.refresh()
         return list(self.scheduled_tasks.values())
     
     def enable_task(self, task_id: str) -> bool:
@@ -214,17 +291,170 @@ class TaskScheduler:
         """禁用任务"""
         return self.update_task(task_id, enabled=False)
     
-    def execute_task(self, task: ScheduledTask):
+    def _schedule(self, task: ScheduledTask):
+        """把任务的下次运行时间压入堆，并唤醒调度循环重新计算等待时间"""
+        if not task.next_run:
+            task.calculate_next_run()
+        with self._cond:
+            if task.enabled:
+                heapq.heappush(self._heap, (task.next_run.timestamp(), next(self._seq), task.task_id))
+            # 过期条目过多时重建堆
+            if len(self._heap) > 2 * len(self.scheduled_tasks) + 16:
+                self._heap = [entry for entry in self._heap if self._is_current(entry)]
+                heapq.heapify(self._heap)
+            self._cond.notify()
+    
+    def _reschedule(self, task: ScheduledTask):
+        """重新计算下次运行时间并更新调度"""
+        task.calculate_next_run()
+        self._schedule(task)
+    
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+    
+    def _is_current(self, entry) -> bool:
+        """堆条目是否仍对应任务当前的下次运行时间"""
+        due, _, task_id = entry
+        task = self.scheduled_tasks.get(task_id)
+        return bool(task and task.enabled and task.next_run and task.next_run.timestamp() == due)
+    
+    def _next_due(self) -> Optional[ScheduledTask]:
+        """等待到最早的任务到期并返回该任务；调度器停止时返回 None"""
+        with self._cond:
+            while self.running:
+                while self._heap and not self._is_current(self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                return self.scheduled_tasks[heapq.heappop(self._heap)[2]]
+        return None
+    
+    def _dispatch(self, task: ScheduledTask):
+        """派发一个到期的任务"""
+        if not self._handle_overlap(task):
+            # 加入全局任务队列，优先级低于手动任务
+            if not self._submit_run(task):
+                print(f"任务队列已满，定时任务 {task.name} 推迟 1 分钟")
+                task.next_run = datetime.now() + timedelta(minutes=1)
+                self._schedule(task)
+                self.save_task(task)
+                return
+        # 派发后立即计算并保存下次运行时间，避免运行期间被重复触发
+        self._reschedule(task)
+        self.save_task(task)
+    
+    def is_running(self, task_id: str) -> bool:
+        """任务是否有正在排队或运行中的一次运行"""
+        with self._runs_lock:
+            return task_id in self.active_runs
+    
+    def running_task_ids(self) -> set:
+        """有正在排队或运行中的运行的任务ID；多进程部署时包括调度领导进程中的运行"""
+        with self._runs_lock:
+            task_ids = set(self.active_runs)
+        if self.shared:
+            task_ids |= self.store.running_task_ids()
+        return task_ids
+    
+    def _submit_run(self, task: ScheduledTask) -> bool:
+        """把一次运行加入全局任务队列，并登记为该任务当前的运行"""
+        run_id = f"{task.task_id}_{int(time.time() * 1000)}"
+        with self._runs_lock:
+            self.active_runs[task.task_id] = {"run_id": run_id, "crawler": None, "rerun": False, "timed_out": False}
+        if job_queue.submit(run_id, self.execute_task, (task, run_id), priority=PRIORITY_SCHEDULED) is None:
+            with self._runs_lock:
+                self.active_runs.pop(task.task_id, None)
+            return False
+        return True
+    
+    def _handle_overlap(self, task: ScheduledTask):
+        """任务到期时上一次运行仍未结束，按 overlap_policy 处理"""
+        with self._runs_lock:
+            run = self.active_runs.get(task.task_id)
+            if not run:
+                return False
+            if task.overlap_policy == "skip":
+                print(f"定时任务 {task.name} 上一次运行尚未结束，跳过本次")
+            elif task.overlap_policy == "queue":
+                # 多次到期只补跑一次
+                run["rerun"] = True
+                print(f"定时任务 {task.name} 上一次运行尚未结束，结束后补跑")
+            else:
+                run["rerun"] = True
+                if run["crawler"]:
+                    run["crawler"].cancel()
+                elif job_queue.cancel(run["run_id"]):
+                    # 还在排队时直接替换成新的运行
+                    self.active_runs.pop(task.task_id)
+                    return False
+                print(f"定时任务 {task.name} 上一次运行尚未结束，已取消并将重新运行")
+        return True
+    
+    def _record_run_start(self, task: ScheduledTask, run_id: str, output_file: str):
+        try:
+            self.store.start_run(run_id, task.task_id, output_file)
+        except Exception as e:
+            print(f"记录定时任务运行失败: {e}")
+    
+    def _record_run_end(self, run_id: str, status: str, error: Optional[str], magnet_count: Optional[int],
+                        metrics: Optional[dict]):
+        try:
+            self.store.finish_run(run_id, status, error=error, magnet_count=magnet_count, metrics=metrics)
+        except Exception as e:
+            print(f"记录定时任务运行失败: {e}")
+    
+    def get_runs(self, task_id: str, page: int = 1, page_size: int = 20) -> dict:
+        """分页获取定时任务的运行历史，最新的在前"""
+        return {
+            "total": self.store.count_runs(task_id),
+            "page": page,
+            "page_size": page_size,
+            "runs": self.store.list_runs(task_id, limit=page_size, offset=(page - 1) * page_size)
+        }
+    
+    @staticmethod
+    def _discard_partial(output_file: str):
+        """删除取消或超时的运行留下的未完成结果和检查点；每次运行使用新的输出文件，不会从中继续"""
+        for path in (partial_path(output_file), checkpoint_path(output_file)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除未完成的运行文件失败: {e}")
+    
+    def execute_task(self, task: ScheduledTask, run_id: str = None):
         """执行任务"""
+        run_id = run_id or f"{task.task_id}_{int(time.time() * 1000)}"
+        output_file = f"scheduled_magnet_links_{run_id}.txt"
+        timer = None
+        crawler = None
+        self._record_run_start(task, run_id, output_file)
         try:
             print(f"执行定时任务: {task.name}")
             
             # 创建爬虫实例
             proxy = proxy_config.get_proxy()
-            crawler = SehuatangCrawler(proxy=proxy)
+            crawler = create_crawler(proxy=proxy)
+            with self._runs_lock:
+                run = self.active_runs.setdefault(task.task_id, {"run_id": run_id, "rerun": False, "timed_out": False})
+                run["crawler"] = crawler
             
-            # 生成输出文件名
-            output_file = f"scheduled_magnet_links_{task.task_id}_{int(time.time())}.txt"
+            # 超时后取消本次运行
+            if task.timeout_minutes:
+                def on_timeout():
+                    run["timed_out"] = True
+                    print(f"定时任务 {task.name} 运行超过 {task.timeout_minutes} 分钟，取消本次运行")
+                    crawler.cancel()
+                timer = threading.Timer(task.timeout_minutes * 60, on_timeout)
+                timer.daemon = True
+                timer.start()
             
             # 执行爬取
             result = crawler.crawl(
@@ -232,37 +462,84 @@ class TaskScheduler:
                 mode=task.mode,
                 start_page=task.start_page,
                 end_page=task.end_page,
-                output_file=output_file
+                output_file=output_file,
+                incremental=task.incremental,
+                task_id=run_id
             )
+            if run["timed_out"]:
+                result["error"] = "运行超时"
+            
+            if run["timed_out"]:
+                status = "timeout"
+            elif result.get("cancelled"):
+                status = "cancelled"
+            else:
+                status = "success" if result["success"] else "failed"
+            self._record_run_end(run_id, status, result.get("error"), result.get("magnet_count"), result.get("metrics"))
+            if status in ("timeout", "cancelled"):
+                self._discard_partial(output_file)
             
             # 更新任务状态
             task.last_run = datetime.now()
             task.run_count += 1
-            task.calculate_next_run()
-            self.save_tasks()
+            self._reschedule(task)
+            self.save_task(task)
             
             print(f"定时任务执行完成: {task.name}, 结果: {result}")
             
         except Exception as e:
             print(f"执行定时任务失败: {task.name}, 错误: {e}")
+            self._record_run_end(run_id, "failed", str(e), None, crawler.metrics.summary() if crawler else None)
             task.last_run = datetime.now()
-            task.calculate_next_run()
-            self.save_tasks()
+            self._reschedule(task)
+            self.save_task(task)
+        finally:
+            if timer:
+                timer.cancel()
+            with self._runs_lock:
+                run = self.active_runs.pop(task.task_id, None)
+            # 运行期间再次到期的任务在结束后补跑一次
+            if run and run.get("rerun") and task.task_id in self.scheduled_tasks and task.enabled:
+                self._submit_run(task)
+    
+    def _mark_interrupted_runs(self):
+        """把执行进程已退出的运行记录标记为中断；单进程运行时之前进程的记录都已中断，
+        多进程部署时其他进程的运行超过一段时间没有心跳才视为中断"""
+        stale_after = max(30, 10 * crawler_config.get("shared_state_interval")) if self.shared else 0
+        try:
+            self.store.mark_interrupted_runs(stale_after)
+        except Exception as e:
+            print(f"标记中断的运行记录失败: {e}")
+    
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(crawler_config.get("shared_state_interval"))
+            with self._runs_lock:
+                active = bool(self.active_runs)
+            if active:
+                try:
+                    self.store.touch_runs()
+                except Exception as e:
+                    print(f"刷新定时任务运行心跳失败: {e}")
     
-    def check_and_run_tasks(self):
-        """检查并运行到期的任务"""
-        for task in self.scheduled_tasks.values():
-            if task.should_run():
-                # 在新线程中执行任务
-                thread = threading.Thread(target=self.execute_task, args=(task,))
-                thread.daemon = True
-                thread.start()
+    def leader_tick(self):
+        """多进程部署时领导进程每次续约后调用：重新加载其他进程修改过的任务，标记随进程退出而中断的运行"""
+        self.refresh()
+        self._mark_interrupted_runs()
     
     def start(self):
         """启动调度器"""
         if self.running:
             return
         
+        # 多进程部署时只由成为调度领导的进程执行；领导权失而复得时本进程仍在进行的运行不受影响
+        self._mark_interrupted_runs()
+        if self.shared and not self._heartbeat_thread:
+            # 失去领导权后已开始的运行仍会继续，心跳线程不随调度器停止
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="scheduler-heartbeat",
+                                                      daemon=True)
+            self._heartbeat_thread.start()
+        self.refresh()
         self.running = True
         self.thread = threading.Thread(target=self._scheduler_loop)
         self.thread.daemon = True
@@ -272,6 +549,7 @@ class TaskScheduler:
     def stop(self):
         """停止调度器"""
         self.running = False
+        self._wake()
         if self.thread:
             self.thread.join()
         print("定时任务调度器已停止")
@@ -280,11 +558,13 @@ class TaskScheduler:
         """调度器主循环"""
         while self.running:
             try:
-                self.check_and_run_tasks()
-                time.sleep(60)  # 每分钟检查一次
+                # 睡眠到最早的任务到期，任务增删改时立即唤醒
+                task = self._next_due()
+                if task:
+                    self._dispatch(task)
             except Exception as e:
                 print(f"调度器循环错误: {e}")
-                time.sleep(60)
+                time.sleep(1)
 
 # 全局调度器实例
 task_scheduler = TaskScheduler()
@@ -1,27 +1,28 @@
-import logging
 import time
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from bs4 import BeautifulSoup
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# 尝试导入webdriver-manager，如果失败则使用默认方式
-try:
-    from webdriver_manager.chrome import ChromeDriverManager
-    USE_WEBDRIVER_MANAGER = True
-except ImportError:
-    USE_WEBDRIVER_MANAGER = False
+from fetcher import HttpFetcher, SeleniumFetcher
+from crawler_config import crawler_config
+from thread_index import thread_index
+from page_parser import parse_thread_urls, parse_magnet_links
+from result_writer import MagnetSink
+from checkpoint import CrawlCheckpoint
+from crawl_metrics import CrawlMetrics
+from http_cache import http_cache
+from task_log import TaskLog
 
 class SehuatangCrawler:
-    def __init__(self, proxy=None):
-        self.driver = None
+    def __init__(self, proxy=None, fetch_backend=None):
         self.progress_callback = None
         self.proxy = proxy
-        self.logs = []  # 存储操作日志
+        self.fetch_backend = fetch_backend or crawler_config.get("fetch_backend")
+        self.http_fetcher = None
+        self.selenium_fetcher = None
+        self.new_magnet_count = 0  # 结果库中此前从未收录过的磁力链接数
+        self.cancelled = False
+        self.metrics = CrawlMetrics()
+        self.logs = TaskLog()  # 操作日志环形缓冲区
         self.themes = {
             "36": {"name": "亚洲无码", "url": "https://sehuatang.org/forum-36-1.html", "hot": "https://sehuatang.org/forum.php?mod=forumdisplay&fid=36&filter=heat&orderby=heats"},
             "37": {"name": "亚洲有码", "url": "https://sehuatang.org/forum-37-1.html", "hot": None},
@@ -34,271 +35,424 @@ class SehuatangCrawler:
 
     def add_log(self, message, level="INFO"):
         """添加日志"""
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {level}: {message}"
-        self.logs.append(log_entry)
-        logging.info(message)
+        self.logs.add(message, level)
 
     def get_logs(self):
-        """获取所有日志"""
-        return self.logs
-
-    def add_log(self, message, level="INFO"):
-        """添加日志"""
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {level}: {message}"
-        self.logs.append(log_entry)
-        logging.info(message)
-
-    def get_logs(self):
-        """获取所有日志"""
-        return self.logs
+        """获取缓冲区中的日志"""
+        return self.logs.lines()
 
     def set_progress_callback(self, callback):
         """设置进度回调函数"""
         self.progress_callback = callback
 
-    def setup_driver(self):
-        """设置 Selenium WebDriver，支持代理"""
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")  # 无头模式
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/139.0.0.0 Safari/537.36")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-plugins")
-        options.add_argument("--disable-images")
-        options.add_experimental_option("excludeSwitches", ["enable-logging"])
-        options.add_experimental_option('useAutomationExtension', False)
-        
-        # 添加代理支持
-        if self.proxy:
-            self.add_log(f"使用代理: {self.proxy}")
-            options.add_argument(f'--proxy-server={self.proxy}')
-        
-        try:
-            if USE_WEBDRIVER_MANAGER:
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=options)
-            else:
-                driver = webdriver.Chrome(options=options)
-            return driver
-        except Exception as e:
-            self.add_log(f"Chrome WebDriver 初始化失败: {str(e)}", "ERROR")
-            raise
+    def _init_fetchers(self):
+        """根据配置初始化抓取后端，Selenium 在首次需要时才启动"""
+        if self.fetch_backend == "http" and self.http_fetcher is None:
+            self.http_fetcher = HttpFetcher(
+                proxy=self.proxy,
+                timeout=crawler_config.get("http_timeout"),
+                pool_size=crawler_config.get("http_pool_size"),
+                log=self.add_log
+            )
+        if self.selenium_fetcher is None:
+            self.selenium_fetcher = SeleniumFetcher(proxy=self.proxy, log=self.add_log)
+
+    def close_fetchers(self):
+        """释放抓取后端占用的连接和浏览器"""
+        for fetcher in (self.http_fetcher, self.selenium_fetcher):
+            if fetcher:
+                fetcher.close()
+        self.http_fetcher = None
+        self.selenium_fetcher = None
 
     def fetch_page(self, url: str, retries: int = 3) -> str:
-        """使用 Selenium 抓取页面内容，包含重试机制和年龄确认处理"""
-        for attempt in range(retries):
-            try:
-                self.add_log(f"尝试抓取 {url} (第 {attempt + 1}/{retries} 次)")
-                self.driver.get(url)
-                wait = WebDriverWait(self.driver, 10)
-                
-                # 检查是否是年龄验证页面
-                current_url = self.driver.current_url
-                page_title = self.driver.title
-                
-                if "SEHUATANG.ORG" in page_title and "满18岁" in self.driver.page_source:
-                    self.add_log("检测到年龄验证页面，尝试点击进入按钮")
-                    try:
-                        # 尝试点击中文的进入按钮
-                        enter_buttons = self.driver.find_elements(By.CSS_SELECTOR, 'a.enter-btn')
-                        if enter_buttons:
-                            enter_buttons[0].click()
-                            self.add_log("已点击年龄验证进入按钮")
-                            time.sleep(3)  # 等待页面重定向
-                        else:
-                            # 尝试点击英文按钮
-                            enter_buttons = self.driver.find_elements(By.XPATH, '//a[contains(text(), "If you are over 18")]')
-                            if enter_buttons:
-                                enter_buttons[0].click()
-                                self.add_log("已点击英文年龄验证按钮")
-                                time.sleep(3)
-                    except Exception as age_error:
-                        self.add_log(f"年龄验证处理: {str(age_error)}")
-                
-                # 等待页面加载完成
-                time.sleep(2)
-                
-                # 再次检查页面内容
-                html = self.driver.page_source
-                if "满18岁" in html or "SEHUATANG.ORG" in self.driver.title:
-                    self.add_log("仍然在年龄验证页面，可能需要手动处理", "WARNING")
-                    return ""
-                
-                self.add_log(f"成功抓取 {url}")
-                return html
-                
-            except Exception as e:
-                self.add_log(f"抓取 {url} 失败 (第 {attempt + 1}/{retries} 次): {str(e)}", "ERROR")
-                if attempt < retries - 1:
-                    wait_time = 2 ** (attempt + 1)
-                    self.add_log(f"等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                else:
-                    self.add_log(f"达到最大重试次数，跳过 {url}", "ERROR")
-                    return ""
-        return ""
+        """抓取页面内容，缓存未过期时直接使用缓存；优先使用 HTTP 方式，失败时回退到 Selenium，
+        retries 为每种方式的尝试次数"""
+        cached = http_cache.get(url)
+        if cached and cached["fresh"]:
+            self.metrics.record_cache_hit()
+            return cached["body"]
+        self._init_fetchers()
+        started = time.monotonic()
+        html = ""
+        if self.http_fetcher:
+            html = self.http_fetcher.fetch(url, retries, cached=cached)
+            if html:
+                self.add_log(f"成功抓取 {url}", "DEBUG")
+            else:
+                self.add_log(f"HTTP 抓取失败，回退到 Selenium: {url}", "WARNING")
+        if not html:
+            html = self.selenium_fetcher.fetch(url, retries)
+            http_cache.put(url, html)
+        self.metrics.record_fetch(time.monotonic() - started, html)
+        return html
 
     def extract_thread_urls(self, html: str) -> list:
         """从主页面提取所有主题的第一页链接，去重"""
-        soup = BeautifulSoup(html, 'html.parser')
-        thread_urls = set()
-        thread_base = {}
-        
-        # 多种可能的链接模式
-        patterns = [
-            r'thread-\d+-\d+-\d+\.html',
-            r'thread-\d+\.html',
-            r'thread\.php\?tid=\d+',
-            r'forum\.php\?mod=viewthread&tid=\d+'
-        ]
-        
-        # 查找所有链接
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag.get('href', '')
-            
-            # 检查是否匹配任何模式
-            for pattern in patterns:
-                if re.search(pattern, href):
-                    # 处理相对URL
-                    if href.startswith('/'):
-                        href = f"https://sehuatang.org{href}"
-                    elif not href.startswith('http'):
-                        href = f"https://sehuatang.org/{href}"
-                    
-                    # 提取主题ID并生成第一页链接
-                    if 'thread-' in href and '.html' in href:
-                        # 处理 thread-xxx-xxx-xxx.html 格式
-                        match = re.match(r'.*?(thread-\d+)-\d+-\d+\.html', href)
-                        if match:
-                            thread_id = match.group(1)
-                            if thread_id not in thread_base:
-                                full_url = f"https://sehuatang.org/{thread_id}-1-1.html"
-                                thread_urls.add(full_url)
-                                thread_base[thread_id] = full_url
-                                self.add_log(f"找到主题第一页链接: {full_url}")
-                    elif 'tid=' in href:
-                        # 处理 tid=xxx 格式
-                        match = re.search(r'tid=(\d+)', href)
-                        if match:
-                            tid = match.group(1)
-                            thread_id = f"thread-{tid}"
-                            if thread_id not in thread_base:
-                                full_url = f"https://sehuatang.org/{thread_id}-1-1.html"
-                                thread_urls.add(full_url)
-                                thread_base[thread_id] = full_url
-                                self.add_log(f"找到主题第一页链接: {full_url}")
-                    break  # 匹配到一个模式就够了
+        thread_urls = parse_thread_urls(html)
+        for full_url in thread_urls:
+            self.add_log(f"找到主题第一页链接: {full_url}", "DEBUG")
         
         if not thread_urls:
             self.add_log("未找到任何主题链接，检查HTML结构或选择器", "WARNING")
         
-        return list(thread_urls)
+        return thread_urls
 
     def extract_magnet_links(self, html: str) -> list:
         """从二级页面提取磁力链接"""
-        soup = BeautifulSoup(html, 'html.parser')
-        magnet_links = []
-        for tag in soup.select('div.blockcode, div.t_msgfont, div.postcontent, div.message, p'):
-            text = tag.get_text()
-            magnet_matches = re.findall(r'magnet:\?xt=urn:[a-z0-9]+:[a-z0-9]{32,}', text, re.IGNORECASE)
-            magnet_links.extend(magnet_matches)
-        for a_tag in soup.select('a'):
-            href = a_tag.get('href', '')
-            if href.startswith('magnet:'):
-                magnet_links.append(href)
-        return magnet_links
+        return parse_magnet_links(html)
 
-    def crawl(self, theme_id: str, mode: str = '1', start_page: int = 1, end_page: int = 1, output_file: str = "magnet_links.txt"):
-        """执行爬取任务，支持多页爬取"""
+    def cancel(self):
+        """请求取消正在进行的爬取，已完成的进度保留在检查点中"""
+        self.cancelled = True
+        self.add_log("收到取消请求", "WARNING")
+
+    def listing_url(self, theme_info: dict, mode: str, page_num: int) -> str:
+        """构建列表页URL，热门排序的列表通过 page 参数翻页"""
+        if mode == "2" and theme_info["hot"]:
+            return f"{theme_info['hot']}&page={page_num}"
+        return theme_info["url"].replace("-1.html", f"-{page_num}.html")
+
+    def _fetch_thread_magnets(self, thread_url: str):
+        """抓取单个帖子页面并提取磁力链接，在线程池中执行；抓取失败时返回 None"""
+        if self.cancelled:
+            return None
         try:
-            # 验证主题ID
-            if theme_id not in self.themes:
-                return {"success": False, "error": f"无效的主题ID: {theme_id}"}
-            
-            theme_info = self.themes[theme_id]
-            self.add_log(f"开始爬取主题: {theme_info['name']} (ID: {theme_id})")
-            self.add_log(f"爬取模式: {'热门' if mode == '2' else '普通'}")
-            self.add_log(f"爬取页数: 第{start_page}页到第{end_page}页")
+            thread_html = self.fetch_page(thread_url)
+            if thread_html:
+                return self.extract_magnet_links(thread_html)
+        except Exception as e:
+            self.add_log(f"处理 {thread_url} 失败: {str(e)}", "ERROR")
+        return None
+
+    def _normalize_themes(self, themes, start_page: int, end_page: int) -> list:
+        """把主题ID列表或带页码范围的主题列表统一成 [{"theme_id", "start_page", "end_page"}]"""
+        normalized = []
+        for theme in themes:
+            if isinstance(theme, dict):
+                normalized.append({
+                    "theme_id": str(theme.get("theme_id")),
+                    "start_page": int(theme.get("start_page", start_page)),
+                    "end_page": int(theme.get("end_page", end_page))
+                })
+            else:
+                normalized.append({"theme_id": str(theme), "start_page": start_page, "end_page": end_page})
+        return normalized
+
+    def _plan_steps(self, themes: list) -> list:
+        """按页交错排列各主题的列表页，各主题轮流抓取"""
+        steps = []
+        for offset in range(max(theme["end_page"] - theme["start_page"] + 1 for theme in themes)):
+            for theme in themes:
+                page_num = theme["start_page"] + offset
+                if page_num <= theme["end_page"]:
+                    steps.append((theme["theme_id"], page_num))
+        return steps
+
+    def _begin_run(self, themes: list, mode: str, output_file: str, incremental: bool,
+                   stop_after_known_pages, resume: bool, task_id):
+        """初始化一次爬取：校验参数、加载检查点并打开结果文件，返回运行状态或错误结果"""
+        if not themes:
+            return None, {"success": False, "error": "缺少主题ID"}
+        for theme in themes:
+            if theme["theme_id"] not in self.themes:
+                return None, {"success": False, "error": f"无效的主题ID: {theme['theme_id']}"}
+            if theme["start_page"] > theme["end_page"]:
+                return None, {"success": False, "error": "起始页不能大于结束页"}
+        
+        for theme in themes:
+            theme_info = self.themes[theme["theme_id"]]
+            self.add_log(f"开始爬取主题: {theme_info['name']} (ID: {theme['theme_id']})")
+            self.add_log(f"爬取页数: 第{theme['start_page']}页到第{theme['end_page']}页")
+        self.add_log(f"爬取模式: {'热门' if mode == '2' else '普通'}")
+        self.add_log(f"抓取方式: {self.fetch_backend}")
+        if stop_after_known_pages is None:
+            stop_after_known_pages = crawler_config.get("stop_after_known_pages")
+        # 热门排序与发帖时间无关，不能据此提前停止
+        if not incremental or mode == "2":
+            stop_after_known_pages = 0
+        if incremental:
+            self.add_log("增量模式: 跳过已抓取过的帖子")
+        
+        steps = self._plan_steps(themes)
+        first_step = 0
+        
+        # 定期保存检查点，中断后可以从断点继续
+        checkpoint = CrawlCheckpoint(output_file, crawler_config.get("checkpoint_interval"))
+        if resume:
+            if not checkpoint.load(output_file):
+                return None, {"success": False, "error": "没有可继续的检查点", "logs": self.logs.lines()}
+            if checkpoint.step is not None:
+                first_step = checkpoint.step
+            elif checkpoint.page:
+                # 旧版检查点只记录了页码
+                first_step = max(0, checkpoint.page - themes[0]["start_page"])
+            self.add_log(f"从检查点继续: 第 {checkpoint.page} 页，已完成 {len(checkpoint.completed)} 个主题")
+        retry = [url for url in checkpoint.failed if url not in checkpoint.pending] if resume else []
+        if retry:
+            # 之前已处理完的页中有抓取失败的帖子：与中断时未完成的帖子一起重新抓取，
+            # 中断时没有正在处理的页则退回到上一页，只重新抓取失败的帖子
+            if not checkpoint.pending and first_step > 0:
+                first_step -= 1
+            checkpoint.processed_threads = max(0, checkpoint.processed_threads - len(retry))
+            self.add_log(f"重新抓取之前失败的 {len(retry)} 个主题")
+        checkpoint.params = {
+            "theme_id": themes[0]["theme_id"], "mode": mode,
+            "start_page": themes[0]["start_page"], "end_page": themes[0]["end_page"],
+            "incremental": incremental, "stop_after_known_pages": stop_after_known_pages, "proxy": self.proxy
+        }
+        if len(themes) > 1:
+            checkpoint.params["themes"] = themes
+        
+        self.new_magnet_count = 0
+        run = CrawlRun(
+            task_id=task_id or os.path.splitext(os.path.basename(output_file))[0],
+            themes=themes,
+            theme_names={theme["theme_id"]: self.themes[theme["theme_id"]]["name"] for theme in themes},
+            mode=mode,
+            output_file=output_file,
+            incremental=incremental,
+            stop_after_known_pages=stop_after_known_pages,
+            checkpoint=checkpoint,
+            steps=steps,
+            first_step=first_step,
+            resume_pending=checkpoint.pending + retry if resume and (checkpoint.pending or retry) else None
+        )
+        run.retry_themes = {url: checkpoint.failed[url] for url in retry}
+        # 结果边爬取边写入，中途失败也能保留已找到的链接
+        run.sink = MagnetSink(output_file, resume=resume)
+        return run, None
+
+    def _page_label(self, run, theme_id: str, page_num: int) -> str:
+        """日志中的页面名称，多主题任务带上主题名"""
+        if len(run.themes) > 1:
+            return f"[{run.theme_names[theme_id]}] 第 {page_num} 页"
+        return f"第 {page_num} 页"
+
+    def _pending_steps(self, run):
+        """依次返回要处理的 (序号, 主题ID, 页码)，已提前停止翻页的主题跳过"""
+        for step in range(run.first_step, len(run.steps)):
+            theme_id, page_num = run.steps[step]
+            if theme_id not in run.stopped_themes:
+                yield step, theme_id, page_num
+
+    def _listing_exhausted(self, run, theme_id: str, page_num: int, thread_urls: list) -> bool:
+        """列表页没有出现本次任务中未见过的帖子时，说明已超出最后一页(论坛会重复返回最后一页)，该主题停止翻页"""
+        seen = run.listed_threads.setdefault(theme_id, set())
+        new_urls = [url for url in thread_urls if url not in seen]
+        seen.update(new_urls)
+        if new_urls:
+            return False
+        self.add_log(f"{self._page_label(run, theme_id, page_num)}没有新的主题，已到达最后一页，停止翻页")
+        run.stopped_themes.add(theme_id)
+        return True
+
+    def _select_threads(self, run, theme_id: str, page_num: int, thread_urls: list) -> list:
+        """按增量模式和检查点过滤本页要抓取的帖子"""
+        label = self._page_label(run, theme_id, page_num)
+        self.add_log(f"{label}找到 {len(thread_urls)} 个主题")
+        
+        # 增量模式下只抓取新帖子或超过重新检查时长的帖子
+        if run.incremental:
+            found_count = len(thread_urls)
+            if thread_index.count_known(thread_urls) == found_count:
+                run.known_pages[theme_id] = run.known_pages.get(theme_id, 0) + 1
+            else:
+                run.known_pages[theme_id] = 0
+            thread_urls = thread_index.filter_unseen(thread_urls, crawler_config.get("thread_recheck_hours"))
+            self.add_log(f"{label}跳过 {found_count - len(thread_urls)} 个已抓取的主题")
+        
+        thread_urls = [url for url in thread_urls if url not in run.checkpoint.completed]
+        run.checkpoint.total_threads += len(thread_urls)
+        return thread_urls
+
+    def _take_resume_pending(self, run, theme_id: str, page_num: int):
+        """中断时正在处理的页直接使用检查点中未完成的主题，不再重新抓取列表页"""
+        if run.resume_pending is None:
+            return None
+        thread_urls = [url for url in run.resume_pending if url not in run.checkpoint.completed]
+        run.resume_pending = None
+        self.add_log(f"{self._page_label(run, theme_id, page_num)}继续处理剩余的 {len(thread_urls)} 个主题")
+        return thread_urls
+
+    def _should_stop(self, run, theme_id: str, page_num: int) -> bool:
+        """增量模式下主题连续多页均为已抓取的帖子时，该主题停止翻页"""
+        known_pages = run.known_pages.get(theme_id, 0)
+        if run.stop_after_known_pages and known_pages >= run.stop_after_known_pages:
+            self.add_log(f"连续 {known_pages} 页均为已抓取的主题，停止翻页 ({self._page_label(run, theme_id, page_num)})")
+            run.stopped_themes.add(theme_id)
+            return True
+        return False
+
+    def _handle_thread_result(self, run, theme_id: str, thread_url: str, magnet_links):
+        """处理一个帖子的抓取结果：写入结果库和结果文件，更新检查点和进度"""
+        # 重新抓取的失败帖子记在原来的主题下
+        theme_id = run.retry_themes.pop(thread_url, theme_id)
+        theme_stats = run.theme_stats[theme_id]
+        if magnet_links is not None:
+            unseen_links = thread_index.record(thread_url, magnet_links, task_id=run.task_id, theme_id=theme_id)
+            self.new_magnet_count += len(unseen_links)
+            self.metrics.record_thread(len(magnet_links), len(unseen_links))
+            theme_stats["threads"] += 1
+            theme_stats["magnets_found"] += len(magnet_links)
+            theme_stats["new_magnets"] += len(unseen_links)
+        if magnet_links:
+            new_links = run.sink.add(magnet_links)
+            theme_stats["magnet_count"] += len(new_links)
+            self.add_log(f"从 {thread_url} 提取到 {len(magnet_links)} 个磁力链接，"
+                         f"本任务新增 {len(new_links)} 个，首次收录 {len(unseen_links)} 个")
+        
+        checkpoint = run.checkpoint
+        checkpoint.processed_threads += 1
+        # 抓取失败或因取消未抓取的帖子不算完成，继续任务时重新抓取
+        if magnet_links is not None:
+            checkpoint.mark_done(thread_url)
+        elif not self.cancelled:
+            checkpoint.mark_failed(thread_url, theme_id)
+        
+        # 更新进度
+        if self.progress_callback:
+            self.progress_callback(checkpoint.processed_threads, checkpoint.total_threads, run.sink.count)
+
+    def _crawl_threads(self, executor, run, step: int, theme_id: str, page_num: int, thread_urls: list):
+        """并发抓取一页中的帖子，提取磁力链接并写入结果文件、结果库，更新检查点和进度"""
+        run.checkpoint.start_page(page_num, thread_urls, step)
+        futures = {
+            executor.submit(self._fetch_thread_magnets, thread_url): thread_url
+            for thread_url in thread_urls
+        }
+        for future in as_completed(futures):
+            self._handle_thread_result(run, theme_id, futures[future], future.result())
+
+    def _finish_run(self, run) -> dict:
+        """保存结果并生成爬取结果"""
+        if self.cancelled:
+            run.checkpoint.save(force=True)
+            self.add_log(f"任务已取消，已找到 {run.sink.count} 个磁力链接，可从检查点继续", "WARNING")
+            return {"success": False, "cancelled": True, "error": "任务已取消",
+                    "metrics": self.metrics.summary(), "logs": self.logs.lines()}
+        
+        # 保存结果，增量模式下没有新链接也视为成功
+        run.checkpoint.clear()
+        if run.sink.count or run.incremental:
+            run.sink.finalize()
+            self.add_log(f"总共找到 {run.sink.count} 个磁力链接，其中 {self.new_magnet_count} 个首次收录，已保存到 {run.output_file}")
             
-            # 初始化WebDriver
-            self.driver = self.setup_driver()
+            result = {
+                "success": True,
+                "magnet_count": run.sink.count,
+                "new_magnet_count": self.new_magnet_count,
+                "task_id": run.task_id,
+                "output_file": run.output_file,
+                "theme_name": "、".join(run.theme_names.values()),
+                "metrics": self.metrics.summary(),
+                "logs": self.logs.lines()
+            }
+            if len(run.themes) > 1:
+                result["themes"] = list(run.theme_stats.values())
+            return result
+        else:
+            run.sink.discard()
+            return {"success": False, "error": "未找到任何磁力链接", "metrics": self.metrics.summary(), "logs": self.logs.lines()}
+
+    def crawl(self, theme_id: str, mode: str = '1', start_page: int = 1, end_page: int = 1, output_file: str = "magnet_links.txt",
+              incremental: bool = False, stop_after_known_pages: int = None, resume: bool = False,
+              task_id: str = None):
+        """执行爬取任务，支持多页爬取；incremental 为 True 时跳过已抓取过的帖子，
+        并在连续 stop_after_known_pages 个列表页全部为已抓取帖子时停止翻页；
+        resume 为 True 时从 output_file 对应的检查点继续；
+        结果同时写入结果库，task_id 默认取输出文件名"""
+        return self.crawl_themes([theme_id], mode=mode, start_page=start_page, end_page=end_page,
+                                 output_file=output_file, incremental=incremental,
+                                 stop_after_known_pages=stop_after_known_pages, resume=resume, task_id=task_id)
+
+    def crawl_themes(self, themes: list, mode: str = '1', start_page: int = 1, end_page: int = 1,
+                     output_file: str = "magnet_links.txt", incremental: bool = False,
+                     stop_after_known_pages: int = None, resume: bool = False, task_id: str = None):
+        """在一个任务中爬取多个主题；themes 为主题ID列表，或带 start_page/end_page 的字典列表，
+        未指定页码范围的主题使用 start_page/end_page。各主题的列表页交错抓取，共用同一个抓取会话和线程池，
+        结果合并去重写入 output_file，返回结果中的 themes 为各主题的统计"""
+        executor = None
+        run = None
+        try:
+            run, error = self._begin_run(self._normalize_themes(themes, start_page, end_page), mode, output_file,
+                                         incremental, stop_after_known_pages, resume, task_id)
+            if error:
+                return error
             
-            all_magnet_links = set()
-            total_threads = 0
-            processed_threads = 0
+            thread_workers = crawler_config.get("thread_workers")
+            executor = ThreadPoolExecutor(max_workers=thread_workers)
+            self.add_log(f"帖子抓取线程数: {thread_workers}")
             
-            # 遍历指定页数
-            for page_num in range(start_page, end_page + 1):
-                self.add_log(f"开始处理第 {page_num} 页")
-                
-                # 构建URL
-                if mode == "2" and theme_info["hot"]:
-                    start_url = theme_info["hot"]
-                else:
-                    start_url = theme_info["url"].replace("-1.html", f"-{page_num}.html")
+            # 遍历各主题的指定页数
+            for step, theme_id, page_num in self._pending_steps(run):
+                if self.cancelled:
+                    break
+                label = self._page_label(run, theme_id, page_num)
+                self.add_log(f"开始处理{label}")
                 
-                # 抓取主页面
-                main_html = self.fetch_page(start_url)
-                if not main_html:
-                    self.add_log(f"无法访问第 {page_num} 页: {start_url}", "ERROR")
-                    continue
-                
-                # 提取所有主题第一页链接
-                thread_urls = self.extract_thread_urls(main_html)
-                if not thread_urls:
-                    self.add_log(f"第 {page_num} 页未找到任何主题链接", "WARNING")
-                    continue
-                
-                total_threads += len(thread_urls)
-                self.add_log(f"第 {page_num} 页找到 {len(thread_urls)} 个主题")
-                
-                # 遍历二级页面提取磁力链接
-                for i, thread_url in enumerate(thread_urls, 1):
-                    self.add_log(f"处理第 {page_num} 页 {i}/{len(thread_urls)}: {thread_url}")
-                    
-                    thread_html = self.fetch_page(thread_url)
-                    if thread_html:
-                        magnet_links = self.extract_magnet_links(thread_html)
-                        if magnet_links:
-                            all_magnet_links.update(magnet_links)
-                            self.add_log(f"从 {thread_url} 提取到 {len(magnet_links)} 个磁力链接")
+                thread_urls = self._take_resume_pending(run, theme_id, page_num)
+                if thread_urls is None:
+                    # 抓取主页面
+                    start_url = self.listing_url(self.themes[theme_id], mode, page_num)
+                    main_html = self.fetch_page(start_url)
+                    if not main_html:
+                        self.add_log(f"无法访问{label}: {start_url}", "ERROR")
+                        continue
+                    self.metrics.record_listing()
+                    run.theme_stats[theme_id]["pages"] += 1
                     
-                    processed_threads += 1
-                    
-                    # 更新进度
-                    if self.progress_callback:
-                        self.progress_callback(processed_threads, total_threads, len(all_magnet_links))
-                    
-                    time.sleep(0.5)  # 避免请求过快
-
-            # 保存结果
-            if all_magnet_links:
-                with open(output_file, "w", encoding="utf-8") as f:
-                    for link in all_magnet_links:
-                        f.write(link + "\n")
-                self.add_log(f"总共找到 {len(all_magnet_links)} 个磁力链接，已保存到 {output_file}")
+                    # 提取所有主题第一页链接
+                    thread_urls = self.extract_thread_urls(main_html)
+                    if not thread_urls:
+                        self.add_log(f"{label}未找到任何主题链接", "WARNING")
+                        continue
+                    if self._listing_exhausted(run, theme_id, page_num, thread_urls):
+                        continue
+                    thread_urls = self._select_threads(run, theme_id, page_num, thread_urls)
                 
-                return {
-                    "success": True,
-                    "magnet_count": len(all_magnet_links),
-                    "output_file": output_file,
-                    "theme_name": theme_info["name"],
-                    "logs": self.logs
-                }
-            else:
-                return {"success": False, "error": "未找到任何磁力链接", "logs": self.logs}
+                self._crawl_threads(executor, run, step, theme_id, page_num, thread_urls)
+                if self.cancelled:
+                    break
+                run.checkpoint.finish_page(page_num, step)
+                self._should_stop(run, theme_id, page_num)
+
+            return self._finish_run(run)
                 
         except Exception as e:
             self.add_log(f"爬取过程中发生错误: {str(e)}", "ERROR")
-            return {"success": False, "error": str(e), "logs": self.logs}
+            return {"success": False, "error": str(e), "logs": self.logs.lines()}
         finally:
-            if self.driver:
-                try:
-                    self.driver.quit()
-                except:
-                    pass
+            if executor:
+                executor.shutdown(wait=True)
+            if run and run.sink:
+                run.sink.close()
+            self.close_fetchers()
+
 
+class CrawlRun:
+    """一次爬取的运行状态，在同步和异步爬取引擎之间共用"""
+
+    def __init__(self, task_id, themes, theme_names, mode, output_file, incremental,
+                 stop_after_known_pages, checkpoint, steps, first_step, resume_pending):
+        self.task_id = task_id
+        self.themes = themes
+        self.theme_names = theme_names
+        self.mode = mode
+        self.output_file = output_file
+        self.incremental = incremental
+        self.stop_after_known_pages = stop_after_known_pages
+        self.checkpoint = checkpoint
+        self.steps = steps  # 按抓取顺序排列的 (主题ID, 页码)
+        self.first_step = first_step
+        self.resume_pending = resume_pending
+        self.retry_themes = {}  # 继续任务时重新抓取的失败帖子 -> 所属主题ID
+        self.known_pages = {}  # 每个主题连续全部为已抓取帖子的页数
+        self.listed_threads = {}  # 每个主题在本次任务的列表页中出现过的帖子
+        self.stopped_themes = set()
+        self.theme_stats = {
+            theme_id: {"theme_id": theme_id, "theme_name": name, "pages": 0, "threads": 0,
+                       "magnets_found": 0, "magnet_count": 0, "new_magnets": 0}
+            for theme_id, name in theme_names.items()
+        }
+        self.sink = None
@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+from crawler_config import crawler_config
+from result_store import ResultStore, result_store
+
+# 当前进程的唯一标识，多进程部署时用于区分任务和领导锁的持有者
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leader_locks (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class LeaderLock:
+    """基于共享 SQLite 库的租约锁，同一时间只有一个进程持有；持有者需要在租约过期前续约"""
+
+    def __init__(self, name: str, ttl: Optional[float] = None, store: ResultStore = None):
+        self.name = name
+        self.ttl = ttl or crawler_config.get("leader_lock_ttl")
+        self.store = store or result_store
+        self.owner = PROCESS_ID
+        self._ready = False
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            conn.executescript(SCHEMA)
+            self._ready = True
+
+    def acquire(self) -> bool:
+        """获取或续约，锁空闲、已过期或本来就由当前进程持有时成功"""
+        now = time.time()
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "INSERT INTO leader_locks (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leader_locks.owner = excluded.owner OR leader_locks.expires_at < ?",
+                (self.name, self.owner, now + self.ttl, now)
+            )
+            row = conn.execute("SELECT owner FROM leader_locks WHERE name = ?", (self.name,)).fetchone()
+        return bool(row and row[0] == self.owner)
+
+    def release(self):
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM leader_locks WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+    def holder(self) -> Optional[dict]:
+        """当前持有者，锁空闲或已过期时返回 None"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute(
+                "SELECT owner, expires_at FROM leader_locks WHERE name = ? AND expires_at >= ?", (self.name, time.time())
+            ).fetchone()
+        return {"owner": row[0], "expires_at": row[1]} if row else None
+
+
+class LeaderElection:
+    """后台线程定期争抢领导锁：成为领导时调用 on_elected，失去领导权时调用 on_demoted，
+    作为领导期间每次续约后调用 on_tick"""
+
+    def __init__(self, name: str, on_elected: Callable, on_demoted: Callable, on_tick: Callable = None):
+        self.lock = LeaderLock(name)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_tick = on_tick
+        self.is_leader = False
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name=f"leader-{self.lock.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            self.lock.release()
+
+    def _loop(self):
+        # 续约间隔为租约的三分之一，偶尔一次续约失败不会让租约过期
+        interval = max(1.0, self.lock.ttl / 3)
+        while not self._stop.is_set():
+            try:
+                elected = self.lock.acquire()
+            except Exception as e:
+                # 数据库暂时不可用时保持现状，租约未过期前其他进程也拿不到锁
+                print(f"领导锁 {self.lock.name} 续约失败: {e}")
+                self._stop.wait(interval)
+                continue
+            try:
+                if elected and not self.is_leader:
+                    self.is_leader = True
+                    print(f"进程 {PROCESS_ID} 成为 {self.lock.name} 领导")
+                    self.on_elected()
+                elif not elected and self.is_leader:
+                    self.is_leader = False
+                    print(f"进程 {PROCESS_ID} 失去 {self.lock.name} 领导权")
+                    self.on_demoted()
+                elif elected and self.on_tick:
+                    self.on_tick()
+            except Exception as e:
+                print(f"领导切换处理失败: {e}")
+            self._stop.wait(interval)
@@ -0,0 +1,57 @@
+import threading
+from typing import Optional, Set
+
+
+class Subscription:
+    """一个推送连接的订阅，记录自上次推送以来发生变化的任务ID"""
+
+    def __init__(self):
+        self._dirty: Set[str] = set()
+        self._cond = threading.Condition()
+
+    def notify(self, task_id: str):
+        with self._cond:
+            self._dirty.add(task_id)
+            self._cond.notify()
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """等待任务变化，返回期间变化过的任务ID；超时时返回空集合"""
+        with self._cond:
+            if not self._dirty:
+                self._cond.wait(timeout)
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+
+class TaskEvents:
+    """任务状态变化的广播，同一任务在两次推送之间的多次变化合并为一次"""
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, task_id: str):
+        """通知所有订阅者任务发生了变化"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.notify(task_id)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+# 全局任务事件广播
+task_events = TaskEvents()
@@ -0,0 +1,224 @@
+import json
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from crawler_config import crawler_config
+from result_store import ResultStore, result_store
+from shared_state import PROCESS_ID
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_task_history (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    theme_id TEXT,
+    created_at REAL NOT NULL,
+    output_file TEXT,
+    data TEXT NOT NULL,
+    logs TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_task_history_created ON crawl_task_history (created_at, task_id);
+"""
+
+ACTIVE_STATUSES = ("pending", "queued", "running")
+
+
+class TaskHistoryStore:
+    """爬取任务的持久化记录，保存在结果库的 SQLite 数据库中；任务从内存中淘汰后仍可以查询状态、日志和下载结果。
+    多进程部署时运行中的任务也定期写入，owner 为执行任务的进程，其他进程据此查询状态和请求取消。
+    删除的记录先标记为 deleted，由 owner 进程从内存中移除任务后清除，避免同步时被重新写入"""
+
+    def __init__(self, store: ResultStore = None):
+        self.store = store or result_store
+        self._ready = False
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            conn.executescript(SCHEMA)
+            self._ready = True
+
+    @staticmethod
+    def _load(data: str, owner: Optional[str], updated_at: float) -> dict:
+        """解析记录；其他进程的运行中任务长时间没有更新时，视为该进程已退出"""
+        record = json.loads(data)
+        stale_after = max(30, 10 * crawler_config.get("shared_state_interval"))
+        if record["status"] in ACTIVE_STATUSES and owner and owner != PROCESS_ID \
+                and time.time() - updated_at > stale_after:
+            record["status"] = "failed"
+            record["error_message"] = "执行任务的进程已退出"
+        return record
+
+    def fail_stale(self) -> int:
+        """把其他进程长时间没有更新的运行中任务改为失败，与 _load 的判断一致，使按状态查询的结果准确；
+        由调度领导进程定期调用，没有这样的任务时不写入"""
+        stale_after = max(30, 10 * crawler_config.get("shared_state_interval"))
+        where = (f"WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) AND owner IS NOT NULL AND owner != ? "
+                 f"AND updated_at < ? AND deleted = 0")
+        params = list(ACTIVE_STATUSES) + [PROCESS_ID, time.time() - stale_after]
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            if not conn.execute(f"SELECT 1 FROM crawl_task_history {where} LIMIT 1", params).fetchone():
+                return 0
+        with self.store.transaction() as conn:
+            return conn.execute(
+                f"UPDATE crawl_task_history SET status = 'failed', "
+                f"data = json_set(data, '$.status', 'failed', '$.error_message', '执行任务的进程已退出') {where}",
+                params
+            ).rowcount
+
+    def save(self, record: dict, logs: List[dict] = None):
+        """写入或更新任务记录，record 为任务的 to_dict() 加上 output_file；保留尚未处理的取消请求"""
+        self.save_many([(record, logs)])
+
+    def save_many(self, records: List[Tuple[dict, List[dict]]]):
+        now = time.time()
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "INSERT INTO crawl_task_history "
+                "(task_id, status, theme_id, created_at, output_file, data, logs, owner, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET status = excluded.status, theme_id = excluded.theme_id, "
+                "created_at = excluded.created_at, output_file = excluded.output_file, data = excluded.data, "
+                "logs = excluded.logs, owner = excluded.owner, updated_at = excluded.updated_at "
+                "WHERE crawl_task_history.deleted = 0",
+                [(record["task_id"], record["status"], record.get("theme_id"),
+                  datetime.fromisoformat(record["created_at"]).timestamp(),
+                  record.get("output_file"), json.dumps(record, ensure_ascii=False),
+                  json.dumps(logs or [], ensure_ascii=False), PROCESS_ID, now)
+                 for record, logs in records]
+            )
+
+    def touch(self, task_ids: List[str]):
+        """刷新运行中任务的更新时间，表示执行任务的进程仍然存活"""
+        if not task_ids:
+            return
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "UPDATE crawl_task_history SET updated_at = ? WHERE task_id = ? AND owner = ?",
+                [(time.time(), task_id, PROCESS_ID) for task_id in task_ids]
+            )
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute(
+                "SELECT data, owner, updated_at FROM crawl_task_history WHERE task_id = ? AND deleted = 0", (task_id,)
+            ).fetchone()
+        return self._load(*row) if row else None
+
+    def updated_since(self, since: float) -> List[str]:
+        """其他进程在 since 之后写入或删除过的任务ID"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute(
+                "SELECT task_id FROM crawl_task_history WHERE updated_at > ? AND owner != ?", (since, PROCESS_ID)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def request_cancel(self, task_id: str) -> bool:
+        """请求取消其他进程中运行的任务，由执行任务的进程在同步状态时处理"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            return conn.execute(
+                f"UPDATE crawl_task_history SET cancel_requested = 1 "
+                f"WHERE task_id = ? AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+                (task_id,) + ACTIVE_STATUSES
+            ).rowcount > 0
+
+    def take_cancel_requests(self) -> List[str]:
+        """取出发给当前进程的取消请求"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute(
+                "SELECT task_id FROM crawl_task_history WHERE cancel_requested = 1 AND owner = ?", (PROCESS_ID,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE crawl_task_history SET cancel_requested = 0 WHERE cancel_requested = 1 AND owner = ?",
+                (PROCESS_ID,)
+            )
+        return [row[0] for row in rows]
+
+    def get_logs(self, task_id: str) -> Optional[List[dict]]:
+        """任务结束时保存的日志，记录不存在时返回 None"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute(
+                "SELECT logs FROM crawl_task_history WHERE task_id = ? AND deleted = 0", (task_id,)
+            ).fetchone()
+        return json.loads(row[0] or "[]") if row else None
+
+    def query(self, statuses: List[str] = None, theme_id: str = None, since: float = None, until: float = None,
+              before: Tuple[float, str] = None, limit: int = 50, exclude: set = None) -> List[Tuple[float, str, dict]]:
+        """按条件查询任务记录，按 (创建时间, 任务ID) 倒序；before 为上一页最后一条的 (创建时间, 任务ID)，
+        返回 [(创建时间, 任务ID, 记录)]"""
+        conditions, params = ["deleted = 0"], []
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if theme_id:
+            # 多主题任务的 theme_id 为逗号分隔的主题ID
+            conditions.append("(',' || theme_id || ',') LIKE ?")
+            params.append(f"%,{theme_id},%")
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        exclude = exclude or set()
+        where = " AND ".join(conditions)
+        batch = limit + len(exclude)
+        records = []
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            while True:
+                cursor_condition, cursor_params = "", []
+                if before:
+                    cursor_condition = " AND (created_at < ? OR (created_at = ? AND task_id < ?))"
+                    cursor_params = [before[0], before[0], before[1]]
+                rows = conn.execute(
+                    f"SELECT created_at, task_id, data, owner, updated_at FROM crawl_task_history "
+                    f"WHERE {where}{cursor_condition} ORDER BY created_at DESC, task_id DESC LIMIT ?",
+                    params + cursor_params + [batch]
+                ).fetchall()
+                for created_at, task_id, data, owner, updated_at in rows:
+                    record = self._load(data, owner, updated_at)
+                    # 尚未被 fail_stale 改为失败的过期任务按解析后的状态过滤
+                    if task_id not in exclude and (not statuses or record["status"] in statuses):
+                        records.append((created_at, task_id, record))
+                if len(records) >= limit or len(rows) < batch:
+                    return records[:limit]
+                before = rows[-1][:2]
+
+    def delete(self, task_id: str):
+        """删除任务记录：先标记为已删除，owner 进程同步时从内存中移除任务并清除记录；
+        owner 已退出时标记在 task_retention_seconds 后清除"""
+        now = time.time()
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute(
+                "UPDATE crawl_task_history SET deleted = 1, updated_at = ? WHERE task_id = ?", (now, task_id)
+            )
+            conn.execute(
+                "DELETE FROM crawl_task_history WHERE deleted = 1 AND updated_at < ?",
+                (now - crawler_config.get("task_retention_seconds"),)
+            )
+
+    def take_deleted(self) -> List[str]:
+        """取出并清除当前进程任务的删除标记，返回被删除的任务ID"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            rows = conn.execute(
+                "SELECT task_id FROM crawl_task_history WHERE deleted = 1 AND owner = ?", (PROCESS_ID,)
+            ).fetchall()
+            conn.execute("DELETE FROM crawl_task_history WHERE deleted = 1 AND owner = ?", (PROCESS_ID,))
+        return [row[0] for row in rows]
+
+
+# 全局任务记录存储
+task_history = TaskHistoryStore()
@@ -0,0 +1,130 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+from crawler_config import crawler_config
+from result_store import ResultStore, result_store
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+RECENT_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recent_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    line TEXT NOT NULL
+);
+"""
+
+
+class LogRing:
+    """所有任务共用的最近日志环形缓冲区，用于查看全局最新日志而不必合并各任务的日志；
+    多进程部署时各进程的日志定期写入共享库，从共享库读取全部进程的最近日志"""
+
+    def __init__(self, max_size: Optional[int] = None, store: ResultStore = None):
+        self.max_size = max(1, int(max_size or crawler_config.get("recent_log_size")))
+        self._lines = deque(maxlen=self.max_size)
+        self._unsynced = deque(maxlen=self.max_size)
+        self._lock = threading.Lock()
+        self.store = store
+        self.shared = False
+        self._ready = False
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            conn.executescript(RECENT_LOG_SCHEMA)
+            self._ready = True
+
+    def enable_shared(self):
+        """多进程部署时调用，此后写入的日志同步到共享库"""
+        self.store = self.store or result_store
+        self.shared = True
+
+    def add(self, line: str):
+        with self._lock:
+            self._lines.append(line)
+            if self.shared:
+                self._unsynced.append(line)
+
+    def flush(self):
+        """把尚未同步的日志写入共享库，只保留最近的 max_size 条"""
+        with self._lock:
+            lines = list(self._unsynced)
+            self._unsynced.clear()
+        if not lines:
+            return
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.executemany("INSERT INTO recent_logs (line) VALUES (?)", [(line,) for line in lines])
+            conn.execute("DELETE FROM recent_logs WHERE id <= (SELECT MAX(id) FROM recent_logs) - ?",
+                         (self.max_size,))
+
+    def latest(self, limit: int = 50) -> List[str]:
+        """最新的 limit 条日志，新的在前"""
+        if self.shared:
+            self.flush()
+            with self.store.connection() as conn:
+                self._ensure_schema(conn)
+                rows = conn.execute("SELECT line FROM recent_logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            return [row[0] for row in rows]
+        with self._lock:
+            return list(itertools.islice(reversed(self._lines), limit))
+
+
+class TaskLog:
+    """任务日志环形缓冲区，只保留最近的 log_buffer_size 条，低于 log_level 的日志不写入；
+    每条日志带递增序号，客户端用序号作为游标增量读取"""
+
+    def __init__(self, max_size: Optional[int] = None, level: Optional[str] = None):
+        self.max_size = max(1, int(max_size or crawler_config.get("log_buffer_size")))
+        self.level = LOG_LEVELS.get(str(level or crawler_config.get("log_level")).upper(), LOG_LEVELS["INFO"])
+        self._entries = deque(maxlen=self.max_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.listener: Optional[Callable[[], None]] = None  # 写入日志后调用，用于推送新日志
+
+    def add(self, message: str, level: str = "INFO"):
+        """写入一条日志，同时输出到标准日志"""
+        levelno = LOG_LEVELS.get(level, LOG_LEVELS["INFO"])
+        logging.log(levelno, message)
+        if levelno < self.level:
+            return
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._seq += 1
+            self._entries.append((self._seq, timestamp, level, message))
+        recent_logs.add(f"[{timestamp}] {level}: {message}")
+        if self.listener:
+            self.listener()
+
+    def since(self, after: int = 0, limit: int = 500) -> dict:
+        """读取序号大于 after 的日志，最多 limit 条；dropped 为游标之后已被覆盖的日志条数"""
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[0] > after][:limit]
+            first = self._entries[0][0] if self._entries else self._seq + 1
+            last_seq = self._seq
+        return {
+            "entries": [
+                {"seq": seq, "time": timestamp, "level": level, "message": message}
+                for seq, timestamp, level, message in entries
+            ],
+            "next": entries[-1][0] if entries else max(after, first - 1),
+            "last_seq": last_seq,
+            "dropped": max(0, first - after - 1)
+        }
+
+    def lines(self) -> List[str]:
+        """以文本形式返回缓冲区中的全部日志"""
+        with self._lock:
+            return [f"[{timestamp}] {level}: {message}" for _, timestamp, level, message in self._entries]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+
+# 全局最近日志
+recent_logs = LogRing()
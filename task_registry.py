@@ -0,0 +1,212 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Set, Tuple
+from crawler_config import crawler_config
+from task_events import task_events
+from task_history import ACTIVE_STATUSES, TaskHistoryStore, task_history
+from task_log import recent_logs
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class TaskRegistry:
+    """内存中的爬取任务表，按状态和主题建立索引；
+    已结束的任务写入持久化历史，超过保留时间或任务数超出上限时从内存中淘汰"""
+
+    def __init__(self, history: TaskHistoryStore = None):
+        self.history = history or task_history
+        self._tasks: Dict[str, object] = {}
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_theme: Dict[str, Set[str]] = defaultdict(set)
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # 已结束的任务ID -> 结束时间，按结束先后排列
+        self._counter = itertools.count(1)
+        self._lock = threading.RLock()
+        self.evicted = 0
+        self.shared = False  # 多进程部署时把运行中任务的状态同步到共享库
+        self._sync_thread = None
+
+    def next_task_id(self) -> str:
+        with self._lock:
+            task_id = f"task_{next(self._counter)}_{int(time.time())}"
+        # 多进程部署时各进程的计数器相互独立，加上进程号避免重复
+        return f"{task_id}_{os.getpid()}" if self.shared else task_id
+
+    def add(self, task):
+        """登记任务，任务的状态变化通过 status_changed 更新索引"""
+        with self._lock:
+            self._tasks[task.task_id] = task
+            self._by_status[task.status].add(task.task_id)
+            for theme_id in self._theme_ids(task):
+                self._by_theme[theme_id].add(task.task_id)
+            task.registry = self
+            self._evict()
+
+    def get(self, task_id: str):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def __contains__(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._tasks
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def remove(self, task_id: str):
+        """从内存中移除任务，不影响持久化历史"""
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if not task:
+                return None
+            self._discard(self._by_status, task.status, task_id)
+            for theme_id in self._theme_ids(task):
+                self._discard(self._by_theme, theme_id, task_id)
+            self._finished.pop(task_id, None)
+            task.registry = None
+            return task
+
+    def status_changed(self, task, old_status: str):
+        """任务状态变化时更新状态索引，重新开始的任务不再参与淘汰"""
+        with self._lock:
+            if task.task_id not in self._tasks:
+                return
+            self._discard(self._by_status, old_status, task.task_id)
+            self._by_status[task.status].add(task.task_id)
+            if task.status not in FINISHED_STATUSES:
+                self._finished.pop(task.task_id, None)
+
+    def finish(self, task):
+        """任务结束：写入持久化记录并进入淘汰队列；已被删除的任务不再写入"""
+        if task.task_id not in self:
+            return
+        self.history.save(*task.snapshot())
+        with self._lock:
+            if task.task_id in self._tasks:
+                self._finished.pop(task.task_id, None)
+                self._finished[task.task_id] = time.monotonic()
+            self._evict()
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return len(self._by_status.get(status, ()))
+
+    def ids_by_status(self, status: str) -> Set[str]:
+        with self._lock:
+            return set(self._by_status.get(status, ()))
+
+    def ids_by_theme(self, theme_id: str) -> Set[str]:
+        with self._lock:
+            return set(self._by_theme.get(theme_id, ()))
+
+    def query(self, statuses: List[str] = None, theme_id: str = None, since: float = None, until: float = None,
+              before: Tuple[float, str] = None) -> List[Tuple[float, str, object]]:
+        """按条件筛选内存中的任务，先用状态和主题索引缩小范围；
+        返回按 (创建时间, 任务ID) 倒序排列的 [(创建时间, 任务ID, 任务)]"""
+        with self._lock:
+            self._evict()
+            if statuses:
+                ids = set().union(*(self._by_status.get(status, ()) for status in statuses))
+            else:
+                ids = set(self._tasks)
+            if theme_id:
+                ids &= self._by_theme.get(theme_id, set())
+            tasks = [self._tasks[task_id] for task_id in ids]
+        result = []
+        for task in tasks:
+            key = (task.created_at.timestamp(), task.task_id)
+            if since is not None and key[0] < since:
+                continue
+            if until is not None and key[0] >= until:
+                continue
+            if before and key >= tuple(before):
+                continue
+            result.append(key + (task,))
+        result.sort(key=lambda item: item[:2], reverse=True)
+        return result
+
+    def tasks(self) -> list:
+        """内存中全部任务的快照"""
+        with self._lock:
+            self._evict()
+            return list(self._tasks.values())
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._tasks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict()
+            return {
+                "in_memory": len(self._tasks),
+                "by_status": {status: len(ids) for status, ids in self._by_status.items() if ids},
+                "evicted": self.evicted
+            }
+
+    def start_sync(self):
+        """多进程部署时启动同步线程：把本进程任务的变化和最近日志定期写入共享库，并处理其他进程发来的取消和删除请求"""
+        if self._sync_thread:
+            return
+        self.shared = True
+        recent_logs.enable_shared()
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="task-sync", daemon=True)
+        self._sync_thread.start()
+
+    def _sync_loop(self):
+        subscription = task_events.subscribe()
+        while True:
+            interval = crawler_config.get("shared_state_interval")
+            # 同一任务在一个同步周期内的多次变化只写入一次
+            changed = subscription.wait(interval)
+            if changed:
+                time.sleep(interval)
+                changed |= subscription.wait(0)
+            try:
+                with self._lock:
+                    tasks = [self._tasks[task_id] for task_id in changed if task_id in self._tasks]
+                    active = [task_id for status in ACTIVE_STATUSES for task_id in self._by_status.get(status, ())]
+                self.history.save_many([task.snapshot() for task in tasks])
+                self.history.touch(active)
+                recent_logs.flush()
+                for task_id in self.history.take_cancel_requests():
+                    task = self.get(task_id)
+                    if task:
+                        task.request_cancel()
+                # 其他进程删除的任务从内存中移除，不再写入共享库
+                for task_id in self.history.take_deleted():
+                    if self.remove(task_id):
+                        task_events.publish(task_id)
+            except Exception as e:
+                print(f"同步任务状态失败: {e}")
+
+    def _evict(self):
+        # 按结束先后淘汰：超过保留时间的任务，以及任务数超过上限时最早结束的任务
+        ttl = crawler_config.get("task_retention_seconds")
+        max_tasks = crawler_config.get("max_tasks_in_memory")
+        now = time.monotonic()
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at < ttl and len(self._tasks) <= max_tasks:
+                break
+            self.remove(task_id)
+            self.evicted += 1
+
+    @staticmethod
+    def _theme_ids(task) -> List[str]:
+        return [theme_id for theme_id in str(task.theme_id or "").split(",") if theme_id]
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, task_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(task_id)
+            if not ids:
+                del index[key]
+
+
+# 全局任务表
+task_registry = TaskRegistry()
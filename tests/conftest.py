@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler_config import crawler_config  # noqa: E402
+
+# 全局单例(结果库、响应缓存)使用临时目录中的数据库，不读写工作目录中的 db_file
+_DB_DIR = tempfile.mkdtemp(prefix="crawler-tests-")
+crawler_config.config["db_file"] = os.path.join(_DB_DIR, "crawler.db")
+crawler_config.config["http_cache_file"] = os.path.join(_DB_DIR, "http_cache.db")
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture
+def load_fixture():
+    """读取 fixtures 目录中保存的页面"""
+    def load(name: str) -> str:
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            return f.read()
+    return load
+
+
+@pytest.fixture
+def store(tmp_path):
+    """独立的临时结果库，不影响工作目录中的 db_file"""
+    from result_store import ResultStore
+    return ResultStore(str(tmp_path / "test.db"))
@@ -0,0 +1,53 @@
+import hashlib
+import threading
+
+import pytest
+
+from async_crawler import AsyncSehuatangCrawler, async_engine
+from checkpoint import CrawlCheckpoint
+from thread_index import thread_index
+
+
+class FakeAsyncCrawler(AsyncSehuatangCrawler):
+    """用固定页面代替网络抓取，并记录同步步骤是在哪个线程中执行的"""
+
+    def __init__(self):
+        super().__init__()
+        self.sync_threads = []
+
+    async def fetch_page_async(self, url: str, retries: int = 3) -> str:
+        if "forum-36-" in url:
+            page = int(url.rsplit("-", 1)[1].split(".")[0])
+            return "".join(f'<a href="thread-{page * 10 + i}-1-1.html">t</a>' for i in range(3))
+        return f"<p>magnet:?xt=urn:btih:{hashlib.sha1(url.encode()).hexdigest()}</p>"
+
+    def extract_thread_urls(self, html: str) -> list:
+        self.sync_threads.append(threading.current_thread())
+        return super().extract_thread_urls(html)
+
+    def _listing_exhausted(self, run, theme_id, page_num, thread_urls) -> bool:
+        self.sync_threads.append(threading.current_thread())
+        return super()._listing_exhausted(run, theme_id, page_num, thread_urls)
+
+
+@pytest.fixture(autouse=True)
+def isolated_index(store, monkeypatch):
+    monkeypatch.setattr(thread_index, "store", store)
+
+
+def test_sync_steps_run_off_the_event_loop(tmp_path, monkeypatch):
+    crawler = FakeAsyncCrawler()
+    checkpoint_threads = []
+    for name in ("start_page", "finish_page"):
+        original = getattr(CrawlCheckpoint, name)
+
+        def recorder(self, *args, _original=original, **kwargs):
+            checkpoint_threads.append(threading.current_thread())
+            return _original(self, *args, **kwargs)
+        monkeypatch.setattr(CrawlCheckpoint, name, recorder)
+
+    result = crawler.crawl("36", start_page=1, end_page=2, output_file=str(tmp_path / "out.txt"))
+    assert result["success"] and result["magnet_count"] == 6
+    loop_thread = async_engine._thread
+    assert crawler.sync_threads and checkpoint_threads
+    assert loop_thread not in crawler.sync_threads + checkpoint_threads
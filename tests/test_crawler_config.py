@@ -0,0 +1,50 @@
+import pytest
+
+from crawler_config import DEFAULT_CONFIG, crawler_config, validate_config
+
+
+def test_defaults_are_valid():
+    assert validate_config(DEFAULT_CONFIG) is None
+
+
+@pytest.mark.parametrize("data", [
+    {"unknown_key": 1},
+    {"fetch_backend": "curl"},
+    {"crawl_engine": "process"},
+    {"log_level": "VERBOSE"},
+    {"requests_per_second": "5"},
+    {"requests_per_second": -1},
+    {"thread_workers": 0},
+    {"thread_workers": 2.5},
+    {"max_concurrent_crawls": True},
+    {"http_cache_max_mb": 0},
+    {"listing_cache_ttl": None},
+    {"http_cache_enabled": "yes"},
+    {"db_file": ""}
+])
+def test_invalid_values_are_rejected(data):
+    assert validate_config(data)
+
+
+def test_valid_values_are_accepted():
+    assert validate_config({"requests_per_second": 0.5, "driver_max_memory_mb": 0, "work_poll_interval": 1,
+                            "http_cache_enabled": False, "log_level": "DEBUG",
+                            "crawl_engine": "distributed"}) is None
+
+
+def test_endpoint_rejects_invalid_config_without_saving(tmp_path, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(crawler_config, "config_file", str(tmp_path / "crawler_config.json"))
+    monkeypatch.setattr(crawler_config, "config", dict(crawler_config.config))
+    # 保存后记录的是临时文件的修改时间，测试结束时一并恢复，避免之后重新加载配置
+    monkeypatch.setattr(crawler_config, "_mtime", crawler_config._mtime)
+    client = app_module.app.test_client()
+    response = client.post("/api/crawler/config", json={"thread_workers": 4, "http_cache_max_mb": -5})
+    assert response.status_code == 400
+    assert "http_cache_max_mb" in response.get_json()["error"]
+    assert crawler_config.config["thread_workers"] == DEFAULT_CONFIG["thread_workers"]
+    assert not (tmp_path / "crawler_config.json").exists()
+
+    response = client.post("/api/crawler/config", json={"thread_workers": 4})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["thread_workers"] == 4
@@ -0,0 +1,24 @@
+from werkzeug.http import parse_options_header
+
+from task_history import TaskHistoryStore
+from task_registry import TaskRegistry
+
+MAGNET = "magnet:?xt=urn:btih:" + "a" * 40
+
+
+def test_multi_theme_download_name_is_quoted(store, monkeypatch):
+    import app as app_module
+    registry = TaskRegistry(TaskHistoryStore(store))
+    monkeypatch.setattr(app_module, "task_registry", registry)
+    monkeypatch.setattr(app_module, "result_store", store)
+    task = app_module.CrawlTask("task_1", "36,2", "1", 1, 3, "", "magnet_links_task_1.txt")
+    registry.add(task)
+    task.status = "completed"
+    store.record_thread("task_1", "https://sehuatang.org/thread-1-1-1.html", "36", [MAGNET])
+
+    response = app_module.app.test_client().get("/api/download/task_1")
+    assert response.status_code == 200
+    disposition, options = parse_options_header(response.headers["Content-Disposition"])
+    assert disposition == "attachment"
+    assert options["filename"] == "magnet_links_36,2_1_1-3.txt"
+    assert response.get_data(as_text=True) == MAGNET + "\n"
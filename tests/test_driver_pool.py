@@ -0,0 +1,39 @@
+import threading
+
+from crawler_config import crawler_config
+from driver_pool import DriverPool
+
+
+class FakeDriver:
+    """quit 阻塞到 released 被设置，模拟关闭缓慢的浏览器"""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.quitting = threading.Event()
+        self.released = threading.Event()
+
+    def quit(self):
+        self.quitting.set()
+        self.released.wait(5)
+
+
+def test_slow_quit_does_not_block_the_pool(monkeypatch):
+    monkeypatch.setattr(crawler_config, "config", dict(crawler_config.config, driver_pool_size=1))
+    pool = DriverPool()
+    monkeypatch.setattr(pool, "create_driver", FakeDriver)
+    old = FakeDriver("http://proxy-a")
+    pool._idle.append(old)
+    pool._total = 1
+
+    leased = []
+    thread = threading.Thread(target=lambda: leased.append(pool._acquire("http://proxy-b", 5)))
+    thread.start()
+    assert old.quitting.wait(5)
+    # 关闭旧浏览器期间其他调用仍能拿到池的锁
+    acquired = pool._cond.acquire(timeout=1)
+    assert acquired
+    pool._cond.release()
+    assert pool.stats()["total"] == 1
+    old.released.set()
+    thread.join(5)
+    assert leased[0].proxy == "http://proxy-b"
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from fetcher import HttpFetcher
+from http_cache import CachedBody, http_cache
+from sehuatang_crawler import SehuatangCrawler
+from work_queue import KIND_THREAD
+from worker import CrawlWorker
+
+URL = "https://sehuatang.org/thread-revalidated-1-1.html"
+BODY = "<html>已缓存的帖子</html>"
+
+
+class NotModifiedSession:
+    """对条件请求始终返回 304 的会话"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests.append(headers)
+        return SimpleNamespace(status_code=304, headers={})
+
+    def close(self):
+        pass
+
+
+def _crawler_with_stale_cache(monkeypatch):
+    monkeypatch.setattr(http_cache, "get", lambda url: {
+        "body": BODY, "etag": '"v1"', "last_modified": None, "fresh": False
+    })
+    monkeypatch.setattr(http_cache, "touch", lambda url: None)
+    crawler = SehuatangCrawler(fetch_backend="http")
+    crawler.http_fetcher = HttpFetcher()
+    crawler.http_fetcher.session = NotModifiedSession()
+    return crawler
+
+
+def test_revalidated_page_is_not_counted_as_downloaded(monkeypatch):
+    crawler = _crawler_with_stale_cache(monkeypatch)
+    html = crawler.fetch_page(URL)
+    assert html == BODY and isinstance(html, CachedBody)
+    assert crawler.http_fetcher.session.requests == [{"If-None-Match": '"v1"'}]
+    summary = crawler.metrics.summary()
+    assert summary["fetches"] == 1
+    assert summary["bytes_downloaded"] == 0
+    assert summary["failed_fetches"] == 0
+
+
+def test_worker_reports_zero_size_for_revalidated_page(monkeypatch):
+    crawler = _crawler_with_stale_cache(monkeypatch)
+    worker = CrawlWorker.__new__(CrawlWorker)
+    monkeypatch.setattr(worker, "_crawler", lambda payload: crawler, raising=False)
+    result = worker.process({"kind": KIND_THREAD, "payload": {"url": URL}})
+    assert result["fetch"]["size"] == 0
+    assert not result["fetch"]["cached"]
@@ -0,0 +1,42 @@
+import asyncio
+
+import async_crawler
+from async_crawler import AsyncSehuatangCrawler
+from sehuatang_crawler import SehuatangCrawler
+
+URL = "https://sehuatang.org/thread-retries-1-1.html"
+
+
+class RecordingFetcher:
+    """记录收到的尝试次数，始终抓取失败"""
+
+    def __init__(self):
+        self.retries = []
+
+    def fetch(self, url, retries=2, cached=None):
+        self.retries.append(retries)
+        return ""
+
+    def close(self):
+        pass
+
+
+def test_fetch_page_passes_retries_to_both_backends():
+    crawler = SehuatangCrawler(fetch_backend="http")
+    crawler.http_fetcher, crawler.selenium_fetcher = RecordingFetcher(), RecordingFetcher()
+    crawler.fetch_page(URL, retries=5)
+    assert crawler.http_fetcher.retries == [5]
+    assert crawler.selenium_fetcher.retries == [5]
+
+
+def test_async_fetch_page_passes_retries(monkeypatch):
+    received = []
+
+    async def fetch(url, proxy=None, log=None, retries=2, cached=None):
+        received.append(retries)
+        return "<html></html>"
+
+    monkeypatch.setattr(async_crawler.async_engine, "fetch", fetch)
+    crawler = AsyncSehuatangCrawler(fetch_backend="http")
+    assert asyncio.run(crawler.fetch_page_async(URL, retries=4)) == "<html></html>"
+    assert received == [4]
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from crawler_config import crawler_config
+from job_queue import PRIORITY_MANUAL, PRIORITY_SCHEDULED, JobQueue
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def set_limits(max_workers, max_depth):
+        values = dict(crawler_config.config, max_concurrent_crawls=max_workers, max_queued_crawls=max_depth)
+        monkeypatch.setattr(crawler_config, "config", values)
+    return set_limits
+
+
+def test_manual_jobs_run_before_scheduled(limits):
+    limits(1, 5)
+    queue = JobQueue()
+    release, done = threading.Event(), threading.Event()
+    order = []
+
+    def job(name):
+        if name == "blocker":
+            release.wait(5)
+        order.append(name)
+        if len(order) == 4:
+            done.set()
+
+    assert queue.submit("blocker", job, ("blocker",)) == 0
+    assert queue.submit("s1", job, ("s1",), priority=PRIORITY_SCHEDULED) == 1
+    assert queue.submit("s2", job, ("s2",), priority=PRIORITY_SCHEDULED) == 2
+    # 手动任务插到定时任务之前
+    assert queue.submit("m1", job, ("m1",), priority=PRIORITY_MANUAL) == 1
+    assert queue.position("s1") == 2
+    release.set()
+    assert done.wait(5)
+    assert order == ["blocker", "m1", "s1", "s2"]
+
+
+def test_full_queue_rejects_until_a_slot_frees(limits):
+    limits(1, 1)
+    queue = JobQueue()
+    release = threading.Event()
+    assert queue.submit("running", release.wait, (5,)) == 0
+    assert queue.submit("queued", release.wait, (5,)) == 1
+    assert queue.submit("rejected", release.wait, (5,)) is None
+    assert queue.cancel("queued")
+    assert queue.submit("accepted", release.wait, (5,)) == 1
+    release.set()
+
+
+def test_crawl_endpoint_returns_429_when_queue_is_full(limits, monkeypatch):
+    import app as app_module
+    limits(1, 0)
+    queue = JobQueue()
+    release = threading.Event()
+    queue.submit("running", release.wait, (5,))
+    monkeypatch.setattr(app_module, "job_queue", queue)
+    try:
+        response = app_module.app.test_client().post("/api/crawl", json={"theme_id": "36"})
+        assert response.status_code == 429
+        assert response.get_json()["success"] is False
+        assert len(app_module.task_registry) == 0
+    finally:
+        release.set()
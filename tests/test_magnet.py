@@ -0,0 +1,31 @@
+from magnet import build_magnet, canonical_infohash, dedup_magnets, parse_magnet
+
+HEX = "356a192b7913b04c54574d18c28d46e6395428ab"
+
+
+def test_parse_magnet_normalizes_hex_and_base32():
+    assert parse_magnet(f"magnet:?xt=urn:btih:{HEX.upper()}")["infohash"] == HEX
+    assert canonical_infohash("magnet:?xt=urn:btih:MFRGGZDFMZTWQ2LKNNWG23TPOBYXE43U") == \
+        "6162636465666768696a6b6c6d6e6f7071727374"
+
+
+def test_parse_magnet_reads_name_and_trackers():
+    parsed = parse_magnet(f"magnet:?xt=urn:btih:{HEX}&amp;dn=ABC-123&amp;tr=udp://a:80&amp;tr=udp://a:80")
+    assert parsed == {"infohash": HEX, "name": "ABC-123", "trackers": ["udp://a:80"]}
+
+
+def test_parse_magnet_rejects_invalid():
+    assert parse_magnet("http://example.com") is None
+    assert parse_magnet("magnet:?xt=urn:btih:356a192b") is None
+    assert parse_magnet(f"magnet:?xt=urn:btih:{HEX}magnet") is None
+
+
+def test_dedup_merges_names_and_trackers_in_first_seen_order():
+    other = "da4b9237bacccdf19c0760cab7aec4a8359010b0"
+    links = dedup_magnets([
+        f"magnet:?xt=urn:btih:{HEX.upper()}",
+        f"magnet:?xt=urn:btih:{other}",
+        f"magnet:?xt=urn:btih:{HEX}&dn=Longer-Name&tr=udp://a:80",
+        "not a magnet",
+    ])
+    assert links == [build_magnet(HEX, "Longer-Name", ["udp://a:80"]), build_magnet(other)]
@@ -0,0 +1,44 @@
+from page_parser import MAGNET_PATTERN, parse_magnet_links, parse_thread_urls
+
+
+def test_consecutive_blockcode_items_are_separate_magnets(load_fixture):
+    links = parse_magnet_links(load_fixture("thread_blockcode.html"))
+    assert links == [
+        "magnet:?xt=urn:btih:356a192b7913b04c54574d18c28d46e6395428ab",
+        "magnet:?xt=urn:btih:da4b9237bacccdf19c0760cab7aec4a8359010b0&dn=ABC-123",
+        "magnet:?xt=urn:btih:6162636465666768696a6b6c6d6e6f7071727374",
+        "magnet:?xt=urn:btih:77de68daecd823babbb58edb1c8e14d7106e83bb&dn=abc-123",
+        "magnet:?xt=urn:btih:1b6453892473a467d07372d45eb05abc2031647a",
+    ]
+
+
+def test_pattern_stops_before_glued_magnet():
+    text = ("magnet:?xt=urn:btih:356a192b7913b04c54574d18c28d46e6395428ab"
+            "magnet:?xt=urn:btih:da4b9237bacccdf19c0760cab7aec4a8359010b0&dn=ABC"
+            "magnet:?xt=urn:btih:77de68daecd823babbb58edb1c8e14d7106e83bb")
+    assert MAGNET_PATTERN.findall(text) == [
+        "magnet:?xt=urn:btih:356a192b7913b04c54574d18c28d46e6395428ab",
+        "magnet:?xt=urn:btih:da4b9237bacccdf19c0760cab7aec4a8359010b0&dn=ABC",
+        "magnet:?xt=urn:btih:77de68daecd823babbb58edb1c8e14d7106e83bb",
+    ]
+
+
+def test_pattern_rejects_malformed_infohash():
+    assert MAGNET_PATTERN.findall("magnet:?xt=urn:btih:356a192b7913b04c54574d18c28d46e6395428abc") == []
+    assert MAGNET_PATTERN.findall("magnet:?xt=urn:btih:356a192b") == []
+
+
+def test_legacy_fixture(load_fixture):
+    links = parse_magnet_links(load_fixture("thread.html"))
+    assert "magnet:?xt=urn:btih:356a192b7913b04c54574d18c28d46e6395428ab" in links
+    assert len(links) == len({link.split("&")[0] for link in links})
+
+
+def test_parse_thread_urls_dedups_and_normalizes():
+    html = ('<a href="thread-100-1-1.html">a</a><a href="thread-100-2-1.html">b</a>'
+            '<a href="forum.php?mod=viewthread&tid=200">c</a><a href="thread.php?tid=300">d</a>')
+    assert parse_thread_urls(html) == [
+        "https://sehuatang.org/thread-100-1-1.html",
+        "https://sehuatang.org/thread-200-1-1.html",
+        "https://sehuatang.org/thread-300-1-1.html",
+    ]
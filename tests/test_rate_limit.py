@@ -0,0 +1,32 @@
+import threading
+import time
+
+from fetcher import SharedRateLimiter
+
+
+def take(limiter, count):
+    for _ in range(count):
+        with limiter.limit():
+            pass
+
+
+def test_shared_bucket_limits_all_processes_together(store):
+    # 两个限速器模拟两个工作进程，共用同一个库中的令牌桶
+    limiters = [SharedRateLimiter("example.com", 50, 8, store=store) for _ in range(2)]
+    started = time.monotonic()
+    threads = [threading.Thread(target=take, args=(limiter, 40)) for limiter in limiters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 初始容量 50 个令牌，其余 30 个按每秒 50 个补充
+    assert time.monotonic() - started >= 30 / 50 - 0.05
+
+
+def test_hosts_have_separate_buckets(store):
+    first = SharedRateLimiter("a.example.com", 5, 8, store=store)
+    second = SharedRateLimiter("b.example.com", 5, 8, store=store)
+    started = time.monotonic()
+    take(first, 5)
+    take(second, 5)
+    assert time.monotonic() - started < 0.5
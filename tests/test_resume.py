@@ -0,0 +1,82 @@
+import hashlib
+
+import pytest
+
+from checkpoint import CrawlCheckpoint
+from sehuatang_crawler import SehuatangCrawler
+from thread_index import thread_index
+
+
+def magnet_for(url: str) -> str:
+    return f"magnet:?xt=urn:btih:{hashlib.sha1(url.encode()).hexdigest()}"
+
+
+class FakeCrawler(SehuatangCrawler):
+    """用固定页面代替网络抓取：每个列表页 3 个帖子，failing 中的帖子抓取失败，cancel_on 页抓取时取消"""
+
+    def __init__(self, failing=(), cancel_on=None):
+        super().__init__()
+        self.failing = set(failing)
+        self.cancel_on = cancel_on
+        self.fetched = []
+
+    def fetch_page(self, url: str, retries: int = 3) -> str:
+        self.fetched.append(url)
+        if "forum-36-" in url:
+            page = int(url.rsplit("-", 1)[1].split(".")[0])
+            if page == self.cancel_on:
+                self.cancel()
+            return "".join(f'<a href="thread-{page * 10 + i}-1-1.html">t</a>' for i in range(3))
+        if url in self.failing:
+            return ""
+        return f"<p>{magnet_for(url)}</p>"
+
+
+@pytest.fixture(autouse=True)
+def isolated_index(store, monkeypatch):
+    monkeypatch.setattr(thread_index, "store", store)
+
+
+def thread_url(tid: int) -> str:
+    return f"https://sehuatang.org/thread-{tid}-1-1.html"
+
+
+def test_failed_thread_is_not_checkpointed_as_completed(tmp_path):
+    output_file = str(tmp_path / "out.txt")
+    result = FakeCrawler(failing={thread_url(11)}, cancel_on=2).crawl(
+        "36", start_page=1, end_page=3, output_file=output_file)
+    assert result.get("cancelled")
+    checkpoint = CrawlCheckpoint.read(output_file)
+    assert thread_url(11) not in checkpoint["completed"]
+    assert checkpoint["failed"] == {thread_url(11): "36"}
+
+
+def test_resume_retries_failed_threads_from_finished_pages(tmp_path):
+    output_file = str(tmp_path / "out.txt")
+    FakeCrawler(failing={thread_url(11)}, cancel_on=2).crawl("36", start_page=1, end_page=3, output_file=output_file)
+
+    crawler = FakeCrawler()
+    result = crawler.crawl("36", start_page=1, end_page=3, output_file=output_file, resume=True)
+    assert result["success"]
+    assert thread_url(11) in crawler.fetched
+    # 已完成的帖子不再重新抓取
+    assert thread_url(10) not in crawler.fetched and thread_url(12) not in crawler.fetched
+    with open(output_file, encoding="utf-8") as f:
+        saved = f.read()
+    assert magnet_for(thread_url(11)) in saved
+    assert magnet_for(thread_url(31)) in saved
+
+
+def test_resume_retries_failed_thread_on_interrupted_page(tmp_path):
+    output_file = str(tmp_path / "out.txt")
+    checkpoint = CrawlCheckpoint(output_file)
+    checkpoint.params = {"theme_id": "36"}
+    checkpoint.start_page(1, [thread_url(10), thread_url(11), thread_url(12)], 0)
+    checkpoint.mark_done(thread_url(10))
+    checkpoint.mark_failed(thread_url(11), "36")
+    checkpoint.save(force=True)
+
+    crawler = FakeCrawler()
+    result = crawler.crawl("36", start_page=1, end_page=1, output_file=output_file, resume=True)
+    assert result["success"]
+    assert sorted(crawler.fetched) == [thread_url(11), thread_url(12)]
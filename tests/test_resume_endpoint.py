@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from checkpoint import CrawlCheckpoint
+from crawler_config import crawler_config
+from job_queue import JobQueue
+from task_history import TaskHistoryStore
+from task_registry import TaskRegistry
+
+
+@pytest.fixture
+def app_module(store, tmp_path, monkeypatch):
+    """队列已满、使用临时任务表和检查点目录的应用"""
+    import app as app_module
+    monkeypatch.chdir(tmp_path)
+    values = dict(crawler_config.config, max_concurrent_crawls=1, max_queued_crawls=0)
+    monkeypatch.setattr(crawler_config, "config", values)
+    registry = TaskRegistry(TaskHistoryStore(store))
+    monkeypatch.setattr(app_module, "task_registry", registry)
+    monkeypatch.setattr(app_module, "task_history", registry.history)
+    queue = JobQueue()
+    release = threading.Event()
+    queue.submit("running", release.wait, (5,))
+    monkeypatch.setattr(app_module, "job_queue", queue)
+    yield app_module
+    release.set()
+
+
+def write_checkpoint(output_file):
+    checkpoint = CrawlCheckpoint(output_file)
+    checkpoint.params = {"theme_id": "36", "mode": "1", "start_page": 1, "end_page": 3}
+    checkpoint.start_page(2, [])
+
+
+def test_resume_with_full_queue_keeps_task_state(app_module):
+    task = app_module.CrawlTask("task_1", "36", "1", 1, 3, "", "magnet_links_task_1.txt")
+    app_module.task_registry.add(task)
+    task.status = "failed"
+    task.error_message = "网络错误"
+    write_checkpoint(task.output_file)
+
+    response = app_module.app.test_client().post("/api/tasks/task_1/resume")
+    assert response.status_code == 429
+    assert task.status == "failed"
+    assert task.error_message == "网络错误"
+    assert task.resume is False
+    assert app_module.task_registry.ids_by_status("failed") == {"task_1"}
+
+
+def test_resume_with_full_queue_does_not_register_rebuilt_task(app_module):
+    record = {"task_id": "task_2", "status": "cancelled", "theme_id": "36", "created_at": "2026-01-01T00:00:00",
+              "output_file": "magnet_links_task_2.txt"}
+    app_module.task_history.save(record)
+    write_checkpoint(record["output_file"])
+
+    response = app_module.app.test_client().post("/api/tasks/task_2/resume")
+    assert response.status_code == 429
+    assert "task_2" not in app_module.task_registry
+    assert app_module.task_history.get("task_2")["status"] == "cancelled"
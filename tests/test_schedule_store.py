@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from schedule_store import ScheduleStore
+
+
+@pytest.fixture
+def schedules(store):
+    return ScheduleStore(store)
+
+
+def run_status(schedules, run_id):
+    return {run["run_id"]: run["status"] for run in schedules.list_runs("task1")}[run_id]
+
+
+def set_run(store, run_id, owner, heartbeat):
+    with store.transaction() as conn:
+        conn.execute("UPDATE scheduled_runs SET owner = ?, heartbeat = ? WHERE run_id = ?", (owner, heartbeat, run_id))
+
+
+def test_own_running_runs_are_not_interrupted(schedules):
+    schedules.start_run("r1", "task1", "out.txt")
+    # 领导权失而复得时再次调用
+    assert schedules.mark_interrupted_runs(60) == 0
+    assert schedules.mark_interrupted_runs() == 0
+    assert run_status(schedules, "r1") == "running"
+
+
+def test_other_process_runs_interrupted_only_without_heartbeat(schedules, store):
+    schedules.start_run("alive", "task1", "a.txt")
+    schedules.start_run("gone", "task1", "b.txt")
+    set_run(store, "alive", "other-alive", time.time())
+    set_run(store, "gone", "other-gone", time.time() - 120)
+    assert schedules.mark_interrupted_runs(60) == 1
+    assert run_status(schedules, "alive") == "running"
+    assert run_status(schedules, "gone") == "interrupted"
+
+
+def test_touch_runs_refreshes_own_heartbeat(schedules, store):
+    schedules.start_run("r1", "task1", "out.txt", started_at=time.time() - 120)
+    schedules.touch_runs()
+    with store.connection() as conn:
+        heartbeat = conn.execute("SELECT heartbeat FROM scheduled_runs WHERE run_id = 'r1'").fetchone()[0]
+    assert heartbeat > time.time() - 5
+
+
+def write_config(path, task_ids):
+    import json
+    path.write_text(json.dumps({"tasks": [{"task_id": task_id} for task_id in task_ids]}), encoding="utf-8")
+
+
+def test_import_json_only_once_across_processes(store, tmp_path):
+    config_file = tmp_path / "scheduled_tasks.json"
+    write_config(config_file, ["a", "b"])
+    assert ScheduleStore(store).import_json(str(config_file)) == 2
+    assert not config_file.exists()
+    # 另一个进程在改名前已读到文件，数据库中已有任务时不再写入
+    write_config(config_file, ["c"])
+    assert ScheduleStore(store).import_json(str(config_file)) == 0
+    assert [task["task_id"] for task in ScheduleStore(store).load_all()] == ["a", "b"]
+
+
+def test_import_json_missing_file_is_already_migrated(schedules, tmp_path):
+    assert schedules.import_json(str(tmp_path / "scheduled_tasks.json")) == 0
+    assert schedules.load_all() == []
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler
+from checkpoint import checkpoint_path
+from result_writer import partial_path
+from schedule_store import ScheduleStore
+from scheduler import OVERLAP_POLICIES, ScheduledTask, TaskScheduler
+
+
+class FakeCrawler:
+    """写出未完成结果和检查点后按给定结果返回的爬虫"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def crawl(self, output_file, **kwargs):
+        for path in (partial_path(output_file), checkpoint_path(output_file)):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("partial")
+        return dict(self.result)
+
+    def cancel(self):
+        pass
+
+
+@pytest.fixture
+def task_scheduler(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return TaskScheduler(config_file=str(tmp_path / "scheduled_tasks.json"), store=ScheduleStore(store))
+
+
+def run_with(task_scheduler, monkeypatch, result):
+    monkeypatch.setattr(scheduler, "create_crawler", lambda proxy=None: FakeCrawler(result))
+    task = ScheduledTask("task1", "测试", "36", "full", 1, 1, "interval", "60")
+    task_scheduler.scheduled_tasks[task.task_id] = task
+    task_scheduler.execute_task(task, run_id="run1")
+    return "scheduled_magnet_links_run1.txt"
+
+
+def test_cancelled_run_removes_partial_files(task_scheduler, monkeypatch, tmp_path):
+    output_file = run_with(task_scheduler, monkeypatch, {"success": False, "cancelled": True, "error": "已取消"})
+    assert not (tmp_path / partial_path(output_file)).exists()
+    assert not (tmp_path / checkpoint_path(output_file)).exists()
+    assert task_scheduler.get_runs("task1")["runs"][0]["status"] == "cancelled"
+
+
+def test_failed_run_keeps_partial_files(task_scheduler, monkeypatch, tmp_path):
+    output_file = run_with(task_scheduler, monkeypatch, {"success": False, "error": "无法访问"})
+    assert (tmp_path / partial_path(output_file)).exists()
+    assert task_scheduler.get_runs("task1")["runs"][0]["status"] == "failed"
+
+
+class FakeQueue:
+    """只记录提交的运行，不执行，运行一直处于进行中"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id, target, args=(), priority=0):
+        self.submitted.append(job_id)
+        return 1
+
+    def cancel(self, job_id):
+        return False
+
+
+class LiveCrawler:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def dispatch_due(task_scheduler):
+    """调度循环的一步：派发所有已到期的任务"""
+    for task in list(task_scheduler.scheduled_tasks.values()):
+        if task.should_run():
+            task_scheduler._dispatch(task)
+
+
+@pytest.fixture
+def running_task(task_scheduler, monkeypatch, request):
+    """多进程部署下已派发、仍在运行中的定时任务"""
+    queue = FakeQueue()
+    monkeypatch.setattr(scheduler, "job_queue", queue)
+    task_scheduler.shared = True
+    task_id = task_scheduler.add_task("测试", "36", "1", 1, 1, "interval", "60", overlap_policy=request.param)
+    task = task_scheduler.scheduled_tasks[task_id]
+    task.next_run = datetime.now() - timedelta(seconds=1)
+    task_scheduler.save_task(task)
+    dispatch_due(task_scheduler)
+    assert len(queue.submitted) == 1
+    crawler = LiveCrawler()
+    task_scheduler.active_runs[task_id]["crawler"] = crawler
+    return task, queue, crawler
+
+
+def assert_not_due_again(task_scheduler, task, queue, crawler):
+    dispatch_due(task_scheduler)
+    assert task.next_run > datetime.now()
+    assert len(queue.submitted) == 1
+    assert not task_scheduler.active_runs[task.task_id]["rerun"]
+    assert not crawler.cancelled
+
+
+@pytest.mark.parametrize("running_task", OVERLAP_POLICIES, indirect=True)
+def test_refresh_during_run_keeps_next_run(task_scheduler, store, running_task, capsys):
+    task, queue, crawler = running_task
+    # 另一个任务在运行结束时保存，存储版本变化
+    ScheduleStore(store).save(ScheduledTask("other", "其他", "2", "1", 1, 1, "interval", "30").to_dict())
+    task_scheduler.refresh()
+    assert "other" in task_scheduler.scheduled_tasks
+    assert_not_due_again(task_scheduler, task, queue, crawler)
+    assert "上一次运行尚未结束" not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("running_task", OVERLAP_POLICIES, indirect=True)
+def test_refresh_ignores_stale_next_run_of_running_task(task_scheduler, store, running_task):
+    task, queue, crawler = running_task
+    stale = dict(task.to_dict(), next_run=(datetime.now() - timedelta(minutes=5)).isoformat())
+    ScheduleStore(store).save(stale)
+    task_scheduler.refresh()
+    assert_not_due_again(task_scheduler, task, queue, crawler)
@@ -0,0 +1,47 @@
+import os
+import zlib
+
+from crawler_config import crawler_config
+from http_cache import HttpCache
+from task_log import LogRing
+
+
+def test_recent_logs_are_shared_between_processes(store):
+    first, second = LogRing(max_size=3, store=store), LogRing(max_size=3, store=store)
+    first.enable_shared()
+    second.enable_shared()
+    first.add("a1")
+    second.add("b1")
+    first.add("a2")
+    second.flush()
+    first.flush()
+    # 按写入共享库的先后排列
+    assert second.latest(10) == ["a2", "a1", "b1"]
+    first.add("a3")
+    # 读取时先写入本进程尚未同步的日志，共享库只保留最近的 max_size 条
+    assert first.latest(10) == ["a3", "a2", "a1"]
+
+
+def test_recent_logs_stay_local_when_not_shared():
+    logs = LogRing(max_size=2)
+    for line in ("a", "b", "c"):
+        logs.add(line)
+    assert logs.latest(10) == ["c", "b"]
+
+
+def test_cache_eviction_counts_entries_from_other_processes(tmp_path, monkeypatch):
+    pages = [os.urandom(20000).hex() for _ in range(3)]
+    entry_size = len(zlib.compress(pages[0].encode("utf-8"), 6))
+    # 上限可容纳两个条目
+    values = dict(crawler_config.config, http_cache_enabled=True, http_cache_max_mb=entry_size * 2.5 / 1024 / 1024)
+    monkeypatch.setattr(crawler_config, "config", values)
+    db_file = str(tmp_path / "cache.db")
+    first, second = HttpCache(db_file), HttpCache(db_file)
+    second.stats()
+    first.put("https://example.com/forum-1.html", pages[0])
+    first.put("https://example.com/forum-2.html", pages[1])
+    # 第二个进程写入时总大小超出上限，需要把第一个进程写入的条目计算在内
+    second.put("https://example.com/forum-3.html", pages[2])
+    assert second.evicted == 1
+    assert first.get("https://example.com/forum-1.html") is None
+    assert second.stats()["entries"] == 2
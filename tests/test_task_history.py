@@ -0,0 +1,74 @@
+import pytest
+
+from task_history import TaskHistoryStore
+
+
+def record(task_id, status="completed", created_at="2026-01-01T00:00:00", theme_id="36"):
+    return {"task_id": task_id, "status": status, "theme_id": theme_id, "created_at": created_at,
+            "output_file": f"{task_id}.txt"}
+
+
+@pytest.fixture
+def history(store):
+    return TaskHistoryStore(store)
+
+
+def test_deleted_record_is_not_resurrected_by_owner_sync(history):
+    history.save(record("t1"))
+    history.delete("t1")
+    assert history.get("t1") is None
+    # owner 进程的同步线程随后再次写入同一任务
+    history.save_many([(record("t1", status="completed"), [])])
+    assert history.get("t1") is None
+    assert history.query() == []
+
+
+def test_owner_takes_deleted_ids_once(history):
+    history.save(record("t1"))
+    history.save(record("t2"))
+    history.delete("t1")
+    assert history.take_deleted() == ["t1"]
+    assert history.take_deleted() == []
+    assert [task_id for _, task_id, _ in history.query()] == ["t2"]
+
+
+def test_deleted_tasks_are_reported_to_other_processes(history, store):
+    history.save(record("t1"))
+    with store.transaction() as conn:
+        conn.execute("UPDATE crawl_task_history SET owner = 'other'")
+    history.delete("t1")
+    assert history.updated_since(0) == ["t1"]
+    assert history.take_deleted() == []
+
+
+def test_request_cancel_only_for_active_tasks(history, store):
+    history.save(record("t1", status="running"))
+    history.save(record("t2", status="completed"))
+    assert history.request_cancel("t1")
+    assert not history.request_cancel("t2")
+    assert history.take_cancel_requests() == ["t1"]
+
+
+def test_status_query_excludes_tasks_of_exited_processes(history, store):
+    history.save(record("t1", status="running", created_at="2026-01-01T00:00:01"))
+    history.save(record("t2", status="running", created_at="2026-01-01T00:00:02"))
+    with store.transaction() as conn:
+        conn.execute("UPDATE crawl_task_history SET owner = 'other', updated_at = 0 WHERE task_id = 't2'")
+    # 调度领导进程标记之前，按解析后的状态过滤，仍返回完整的一页
+    running = history.query(statuses=["running"], limit=1)
+    assert [(task_id, data["status"]) for _, task_id, data in running] == [("t1", "running")]
+    assert history.fail_stale() == 1
+    assert history.fail_stale() == 0
+    failed = history.query(statuses=["failed"])
+    assert [(task_id, data["status"]) for _, task_id, data in failed] == [("t2", "failed")]
+    assert failed[0][2]["error_message"] == "执行任务的进程已退出"
+
+
+def test_query_does_not_write(history, store):
+    history.save(record("t1", status="running"))
+    with store.transaction() as conn:
+        conn.execute("UPDATE crawl_task_history SET owner = 'other', updated_at = 0")
+        changes = conn.total_changes
+    assert history.query(statuses=["running"]) == []
+    with store.connection() as conn:
+        assert conn.total_changes == changes
@@ -0,0 +1,31 @@
+from task_log import TaskLog
+
+
+def test_cursor_reads_incrementally():
+    logs = TaskLog(max_size=10, level="INFO")
+    for i in range(3):
+        logs.add(f"line {i}")
+    first = logs.since(0, limit=2)
+    assert [entry["message"] for entry in first["entries"]] == ["line 0", "line 1"]
+    assert first["next"] == 2
+    second = logs.since(first["next"])
+    assert [entry["message"] for entry in second["entries"]] == ["line 2"]
+    assert logs.since(second["next"]) == {"entries": [], "next": 3, "last_seq": 3, "dropped": 0}
+
+
+def test_cursor_reports_overwritten_entries():
+    logs = TaskLog(max_size=3, level="INFO")
+    for i in range(5):
+        logs.add(f"line {i}")
+    page = logs.since(1)
+    assert page["dropped"] == 1
+    assert [entry["seq"] for entry in page["entries"]] == [3, 4, 5]
+    assert logs.since(0)["dropped"] == 2
+
+
+def test_entries_below_level_are_not_buffered():
+    logs = TaskLog(max_size=10, level="WARNING")
+    logs.add("detail", "INFO")
+    logs.add("problem", "WARNING")
+    assert [entry["message"] for entry in logs.since(0)["entries"]] == ["problem"]
+    assert logs.last_seq == 1
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from crawler_config import crawler_config
+from task_history import TaskHistoryStore
+from task_registry import TaskRegistry
+
+BASE_TIME = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def registry(store, monkeypatch):
+    values = dict(crawler_config.config, max_tasks_in_memory=3, task_retention_seconds=3600)
+    monkeypatch.setattr(crawler_config, "config", values)
+    return TaskRegistry(TaskHistoryStore(store))
+
+
+def finish(registry, task, status="completed"):
+    task.status = status
+    registry.finish(task)
+
+
+def test_task_pages_merge_memory_and_history(registry, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "task_registry", registry)
+    monkeypatch.setattr(app_module, "task_history", registry.history)
+    tasks = []
+    for i in range(7):
+        task = app_module.CrawlTask(f"task_{i:02d}", "2" if i % 2 else "36", "1", 1, 1, "", f"task_{i:02d}.txt")
+        task.created_at = BASE_TIME + timedelta(seconds=i)
+        registry.add(task)
+        tasks.append(task)
+    for task in tasks[:4]:
+        finish(registry, task)
+    # task_00 已淘汰，只在历史记录中
+    assert "task_00" not in registry
+
+    client = app_module.app.test_client()
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/tasks", query_string={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        body = response.get_json()
+        assert len(body["data"]) <= 2
+        seen.extend(task["task_id"] for task in body["data"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"task_{i:02d}" for i in range(6, -1, -1)]
+
+    body = client.get("/api/tasks", query_string={"status": "completed", "theme": "36"}).get_json()
+    assert [task["task_id"] for task in body["data"]] == ["task_02", "task_00"]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from crawler_config import crawler_config
+from task_history import TaskHistoryStore
+from task_registry import TaskRegistry
+
+BASE_TIME = datetime(2026, 1, 1)
+
+
+class FakeTask:
+    """只包含任务表用到的属性"""
+
+    def __init__(self, index, status="running", theme_id="36"):
+        self.task_id = f"task_{index:02d}"
+        self.theme_id = theme_id
+        self.created_at = BASE_TIME + timedelta(seconds=index)
+        self.registry = None
+        self._status = status
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        old_status, self._status = self._status, value
+        if self.registry:
+            self.registry.status_changed(self, old_status)
+
+    def to_dict(self):
+        return {"task_id": self.task_id, "status": self.status, "theme_id": self.theme_id,
+                "created_at": self.created_at.isoformat()}
+
+    def snapshot(self):
+        return dict(self.to_dict(), output_file=f"{self.task_id}.txt"), []
+
+
+@pytest.fixture
+def registry(store, monkeypatch):
+    values = dict(crawler_config.config, max_tasks_in_memory=3, task_retention_seconds=3600)
+    monkeypatch.setattr(crawler_config, "config", values)
+    return TaskRegistry(TaskHistoryStore(store))
+
+
+def finish(registry, task, status="completed"):
+    task.status = status
+    registry.finish(task)
+
+
+def test_earliest_finished_tasks_are_evicted_to_history(registry):
+    tasks = [FakeTask(i) for i in range(4)]
+    for task in tasks:
+        registry.add(task)
+    # 运行中的任务不会被淘汰
+    assert len(registry) == 4
+    finish(registry, tasks[2])
+    finish(registry, tasks[0])
+    assert registry.ids() == ["task_00", "task_01", "task_03"]
+    assert registry.evicted == 1
+    assert registry.history.get("task_02")["status"] == "completed"
+    assert registry.ids_by_status("completed") == {"task_00"}
+
+
+def test_tasks_past_retention_are_evicted(registry, monkeypatch):
+    task = FakeTask(0)
+    registry.add(task)
+    finish(registry, task)
+    assert "task_00" in registry
+    monkeypatch.setitem(crawler_config.config, "task_retention_seconds", 0)
+    assert registry.stats()["in_memory"] == 0
+    assert registry.history.get("task_00") is not None
+
+
+def test_restarted_task_leaves_eviction_queue(registry):
+    tasks = [FakeTask(i) for i in range(4)]
+    for task in tasks[:3]:
+        registry.add(task)
+    finish(registry, tasks[0], "failed")
+    # 继续执行的任务重新进入运行状态
+    tasks[0].status = "queued"
+    registry.add(tasks[3])
+    finish(registry, tasks[1])
+    assert "task_00" in registry
+    assert "task_01" not in registry
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from task_history import TaskHistoryStore
+from task_registry import TaskRegistry
+
+
+@pytest.fixture
+def app_module(store, monkeypatch):
+    import app as app_module
+    registry = TaskRegistry(TaskHistoryStore(store))
+    registry.shared = True
+    monkeypatch.setattr(app_module, "task_registry", registry)
+    monkeypatch.setattr(app_module, "task_history", registry.history)
+    return app_module
+
+
+def first_event(app_module):
+    response = app_module.app.test_client().get("/api/tasks/stream")
+    chunk = next(iter(response.response))
+    response.close()
+    event, data = chunk.decode("utf-8").strip().split("\n")
+    return event.split(": ", 1)[1], json.loads(data.split(": ", 1)[1])
+
+
+def test_shared_snapshot_includes_tasks_of_other_processes(app_module, store):
+    local = app_module.CrawlTask("task_local", "36", "1", 1, 1, "", "local.txt")
+    app_module.task_registry.add(local)
+    # 另一个工作进程中运行的任务
+    remote = app_module.CrawlTask("task_remote", "2", "1", 1, 1, "", "remote.txt")
+    remote._status = "running"
+    app_module.task_history.save(*remote.snapshot())
+    with store.transaction() as conn:
+        conn.execute("UPDATE crawl_task_history SET owner = 'other-worker'")
+
+    event, data = first_event(app_module)
+    assert event == "snapshot"
+    tasks = {task["task_id"]: task for task in data["tasks"]}
+    assert set(tasks) == {"task_local", "task_remote"}
+    assert tasks["task_remote"]["status"] == "running"
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from work_queue import KIND_LISTING, KIND_THREAD, WorkQueue
+
+
+@pytest.fixture
+def queue(store):
+    return WorkQueue(store)
+
+
+def test_lease_in_order_and_filter_by_kind(queue):
+    listing_id, = queue.enqueue("job", KIND_LISTING, [{"url": "a"}])
+    thread_ids = queue.enqueue("job", KIND_THREAD, [{"url": "b"}, {"url": "c"}])
+    item = queue.lease("w1", [KIND_THREAD], lease_seconds=60)
+    assert item["item_id"] == thread_ids[0] and item["payload"] == {"url": "b"} and item["attempts"] == 1
+    assert queue.lease("w2", lease_seconds=60)["item_id"] == listing_id
+    assert queue.lease("w3", lease_seconds=60)["item_id"] == thread_ids[1]
+    assert queue.lease("w4", lease_seconds=60) is None
+
+
+def test_complete_only_by_lease_owner(queue):
+    item_id, = queue.enqueue("job", KIND_THREAD, [{"url": "a"}])
+    queue.lease("w1", lease_seconds=60)
+    assert not queue.complete(item_id, "w2", {"magnets": []})
+    assert queue.collect([item_id]) == {}
+    assert queue.complete(item_id, "w1", {"magnets": ["m"]})
+    assert queue.collect([item_id]) == {item_id: ("done", {"magnets": ["m"]})}
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    item_id, = queue.enqueue("job", KIND_THREAD, [{"url": "a"}])
+    for attempt in range(1, 3):
+        item = queue.lease("w1", lease_seconds=60, max_attempts=2)
+        assert item["attempts"] == attempt
+        queue.fail(item_id, "w1", "boom", max_attempts=2)
+    assert queue.lease("w1", lease_seconds=60, max_attempts=2) is None
+    assert queue.collect([item_id]) == {item_id: ("failed", None)}
+
+
+def test_expired_lease_is_taken_over(queue):
+    item_id, = queue.enqueue("job", KIND_THREAD, [{"url": "a"}])
+    queue.lease("w1", lease_seconds=0.01, max_attempts=3)
+    time.sleep(0.02)
+    item = queue.lease("w2", lease_seconds=60, max_attempts=3)
+    assert item["item_id"] == item_id and item["attempts"] == 2
+    # 原持有者的租约已被接管，迟到的结果被忽略
+    assert not queue.complete(item_id, "w1", {"magnets": []})
+
+
+def test_expired_lease_fails_after_max_attempts(queue):
+    item_id, = queue.enqueue("job", KIND_THREAD, [{"url": "a"}])
+    for _ in range(2):
+        assert queue.lease("w1", lease_seconds=0.01, max_attempts=2)["item_id"] == item_id
+        time.sleep(0.02)
+    assert queue.lease("w2", lease_seconds=60, max_attempts=2) is None
+    assert queue.collect([item_id]) == {item_id: ("failed", None)}
+
+
+def test_cancel_and_purge(queue):
+    first, second = queue.enqueue("job", KIND_THREAD, [{"url": "a"}, {"url": "b"}])
+    other, = queue.enqueue("other", KIND_THREAD, [{"url": "c"}])
+    queue.lease("w1", lease_seconds=60)
+    queue.cancel([first, second])
+    # 已领取的工作项不会被取消
+    assert queue.stats()["items"] == {"leased": 1, "pending": 1}
+    queue.purge("job")
+    assert queue.stats()["items"] == {"pending": 1}
+    assert queue.lease("w1", lease_seconds=60)["item_id"] == other
@@ -0,0 +1,64 @@
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+from result_store import ResultStore, result_store, thread_id_from_url
+
+
+class ThreadIndex:
+    """已抓取帖子的持久化索引，数据保存在结果库的 threads 表中"""
+
+    def __init__(self, store: ResultStore = None):
+        self.store = store or result_store
+
+    def get(self, thread_id: str) -> Optional[dict]:
+        """获取单个帖子的索引记录"""
+        with self.store.connection() as conn:
+            row = conn.execute(
+                "SELECT thread_id, url, last_fetched, magnets FROM threads WHERE thread_id = ?",
+                (thread_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"thread_id": row[0], "url": row[1], "last_fetched": row[2], "magnets": json.loads(row[3])}
+
+    def last_fetched(self, thread_ids: Iterable[str]) -> Dict[str, float]:
+        """批量查询帖子的最后抓取时间，未抓取过的帖子不在结果中"""
+        thread_ids = list(thread_ids)
+        result = {}
+        with self.store.connection() as conn:
+            # SQLite 单条语句的参数数量有限，分批查询
+            for i in range(0, len(thread_ids), 500):
+                batch = thread_ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT thread_id, last_fetched FROM threads WHERE thread_id IN ({placeholders})",
+                    batch
+                ).fetchall()
+                result.update(rows)
+        return result
+
+    def count_known(self, thread_urls: List[str]) -> int:
+        """统计已在索引中的帖子数量"""
+        ids = {thread_id_from_url(url) for url in thread_urls}
+        ids.discard(None)
+        return len(self.last_fetched(ids))
+
+    def filter_unseen(self, thread_urls: List[str], ttl_hours: float = 0) -> List[str]:
+        """过滤掉已抓取过的帖子；ttl_hours 大于 0 时超过该时长的帖子会重新抓取"""
+        ids = {url: thread_id_from_url(url) for url in thread_urls}
+        seen = self.last_fetched(tid for tid in ids.values() if tid)
+        expire_before = time.time() - ttl_hours * 3600 if ttl_hours > 0 else None
+        unseen = []
+        for url in thread_urls:
+            fetched_at = seen.get(ids[url])
+            if fetched_at is None or (expire_before is not None and fetched_at < expire_before):
+                unseen.append(url)
+        return unseen
+
+    def record(self, thread_url: str, magnets: List[str], task_id: str = None, theme_id: str = None) -> List[str]:
+        """记录帖子已抓取及其磁力链接，返回此前从未收录过的链接"""
+        return self.store.record_thread(task_id, thread_url, theme_id, magnets)
+
+
+# 全局帖子索引实例
+thread_index = ThreadIndex()
@@ -0,0 +1,171 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from crawler_config import crawler_config
+from result_store import ResultStore, result_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_items_status ON work_items (status, item_id);
+CREATE INDEX IF NOT EXISTS idx_work_items_job ON work_items (job_id, status);
+"""
+
+# 工作项类型: 列表页返回帖子链接，帖子页返回磁力链接
+KIND_LISTING = "listing"
+KIND_THREAD = "thread"
+
+
+class WorkQueue:
+    """基于共享 SQLite 库的工作项队列：协调进程拆分爬取任务并写入工作项，
+    任意数量的工作进程租用工作项执行后写回结果；租约过期的工作项会被其他工作进程重新领取"""
+
+    def __init__(self, store: ResultStore = None):
+        self.store = store or result_store
+        self._ready = False
+
+    def _ensure_schema(self, conn):
+        if not self._ready:
+            conn.executescript(SCHEMA)
+            self._ready = True
+
+    def enqueue(self, job_id: str, kind: str, payloads: List[dict]) -> List[int]:
+        """写入一批工作项，返回工作项ID"""
+        now = time.time()
+        item_ids = []
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            for payload in payloads:
+                cursor = conn.execute(
+                    "INSERT INTO work_items (job_id, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now)
+                )
+                item_ids.append(cursor.lastrowid)
+        return item_ids
+
+    def lease(self, owner: str, kinds: Optional[List[str]] = None, lease_seconds: float = None,
+              max_attempts: int = None) -> Optional[dict]:
+        """领取一个待执行或租约已过期的工作项，没有可领取的工作项时返回 None；
+        租约过期时已执行 max_attempts 次的工作项(多半会让工作进程崩溃或卡住)视为失败，不再领取"""
+        lease_seconds = lease_seconds or crawler_config.get("work_lease_seconds")
+        max_attempts = max_attempts or crawler_config.get("work_max_attempts")
+        kind_filter = f"AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+        while True:
+            now = time.time()
+            with self.store.transaction() as conn:
+                self._ensure_schema(conn)
+                conn.execute(
+                    "UPDATE work_items SET status = 'failed', error = '租约过期', lease_owner = NULL, "
+                    "lease_expires = NULL, updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, max_attempts)
+                )
+                row = conn.execute(
+                    f"SELECT item_id, job_id, kind, payload, attempts FROM work_items "
+                    f"WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) {kind_filter} "
+                    f"ORDER BY item_id LIMIT 1",
+                    [now] + list(kinds or [])
+                ).fetchone()
+                if not row:
+                    return None
+                # 多个进程可能同时选中同一项，只有状态仍未被改变的那次更新生效
+                claimed = conn.execute(
+                    "UPDATE work_items SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? "
+                    "WHERE item_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))",
+                    (owner, now + lease_seconds, now, row[0], now)
+                ).rowcount
+            if claimed:
+                return {"item_id": row[0], "job_id": row[1], "kind": row[2],
+                        "payload": json.loads(row[3]), "attempts": row[4] + 1}
+
+    def complete(self, item_id: int, owner: str, result: dict) -> bool:
+        """写回工作项结果；租约已被其他工作进程接管时忽略"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            return conn.execute(
+                "UPDATE work_items SET status = 'done', result = ?, updated_at = ? "
+                "WHERE item_id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), item_id, owner)
+            ).rowcount > 0
+
+    def fail(self, item_id: int, owner: str, error: str, max_attempts: int = None) -> bool:
+        """工作项执行失败，未超过重试次数时放回队列"""
+        max_attempts = max_attempts or crawler_config.get("work_max_attempts")
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            return conn.execute(
+                "UPDATE work_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE item_id = ? AND status = 'leased' AND lease_owner = ?",
+                (max_attempts, error, time.time(), item_id, owner)
+            ).rowcount > 0
+
+    def collect(self, item_ids: List[int]) -> Dict[int, Tuple[str, Optional[dict]]]:
+        """读取已结束的工作项，返回 {工作项ID: (状态, 结果)}，状态为 done 或 failed"""
+        if not item_ids:
+            return {}
+        finished = {}
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            # 分批查询，避免超出 SQLite 参数个数上限
+            for offset in range(0, len(item_ids), 500):
+                batch = item_ids[offset:offset + 500]
+                rows = conn.execute(
+                    f"SELECT item_id, status, result FROM work_items "
+                    f"WHERE item_id IN ({', '.join('?' * len(batch))}) AND status IN ('done', 'failed')",
+                    batch
+                ).fetchall()
+                for item_id, status, result in rows:
+                    finished[item_id] = (status, json.loads(result) if result else None)
+        return finished
+
+    def leased_count(self, job_id: str) -> int:
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            return conn.execute(
+                "SELECT COUNT(*) FROM work_items WHERE job_id = ? AND status = 'leased'", (job_id,)
+            ).fetchone()[0]
+
+    def purge(self, job_id: str):
+        """删除一次爬取的全部工作项，未领取的工作项随之取消"""
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM work_items WHERE job_id = ?", (job_id,))
+
+    def cancel(self, item_ids: List[int]):
+        """取消尚未领取的工作项"""
+        if not item_ids:
+            return
+        with self.store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.executemany(
+                "DELETE FROM work_items WHERE item_id = ? AND status = 'pending'", [(item_id,) for item_id in item_ids]
+            )
+
+    def stats(self) -> dict:
+        """各状态的工作项数量和正在工作的进程"""
+        with self.store.connection() as conn:
+            self._ensure_schema(conn)
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall())
+            workers = [row[0] for row in conn.execute(
+                "SELECT DISTINCT lease_owner FROM work_items WHERE status = 'leased' AND lease_expires >= ?",
+                (time.time(),)
+            ).fetchall()]
+        return {"items": counts, "active_workers": workers}
+
+
+# 全局工作项队列
+work_queue = WorkQueue()
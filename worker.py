@@ -0,0 +1,112 @@
+"""分布式爬取的工作进程
+
+从共享工作队列(结果库所在的 SQLite 数据库 db_file)领取列表页和帖子页工作项，抓取并解析后写回结果，
+由提交任务的进程(crawl_engine 为 distributed)汇总。工作进程必须与 Web 服务在同一台机器上、使用本地磁盘上的
+同一个 db_file，SQLite 的 WAL 模式不支持网络文件系统。所有工作进程共用数据库中的令牌桶，
+每个站点的请求速率合计不超过 requests_per_second；max_in_flight 按进程计算。
+
+用法: python worker.py [-t 线程数] [--kinds listing,thread] [--proxy 代理地址]
+"""
+import argparse
+import logging
+import threading
+import time
+
+from crawl_metrics import fetched_size
+from crawler_config import crawler_config
+from fetcher import enable_shared_rate_limit
+from sehuatang_crawler import SehuatangCrawler
+from shared_state import PROCESS_ID
+from work_queue import KIND_LISTING, KIND_THREAD, work_queue
+
+
+class CrawlWorker:
+    """工作进程中的一个抓取线程；按代理和抓取方式分别保留爬虫实例，复用连接和浏览器"""
+
+    def __init__(self, index: int, kinds: list, proxy: str = None, stop: threading.Event = None):
+        self.owner = f"{PROCESS_ID}#{index}"
+        self.kinds = kinds
+        self.proxy = proxy  # 指定时覆盖工作项中的代理
+        self.stop = stop or threading.Event()
+        self._crawlers = {}
+
+    def _crawler(self, payload: dict) -> SehuatangCrawler:
+        proxy = self.proxy or payload.get("proxy")
+        key = (proxy, payload.get("fetch_backend"))
+        if key not in self._crawlers:
+            self._crawlers[key] = SehuatangCrawler(proxy=proxy, fetch_backend=payload.get("fetch_backend"))
+        return self._crawlers[key]
+
+    def process(self, item: dict) -> dict:
+        """抓取工作项中的页面并解析，返回写回队列的结果；抓取失败时抛出异常，工作项重新排队"""
+        crawler = self._crawler(item["payload"])
+        url = item["payload"]["url"]
+        cache_hits = crawler.metrics.cache_hits
+        started = time.monotonic()
+        html = crawler.fetch_page(url)
+        if not html:
+            raise RuntimeError(f"无法访问 {url}")
+        fetch = {
+            "cached": crawler.metrics.cache_hits > cache_hits,
+            "seconds": time.monotonic() - started,
+            "size": fetched_size(html)
+        }
+        if item["kind"] == KIND_LISTING:
+            return {"thread_urls": crawler.extract_thread_urls(html), "fetch": fetch}
+        return {"magnets": crawler.extract_magnet_links(html), "fetch": fetch}
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                item = work_queue.lease(self.owner, self.kinds)
+                if not item:
+                    self.stop.wait(crawler_config.get("work_poll_interval"))
+                    continue
+                try:
+                    result = self.process(item)
+                except Exception as e:
+                    logging.warning(f"工作项 {item['item_id']} 第 {item['attempts']} 次执行失败: {e}")
+                    work_queue.fail(item["item_id"], self.owner, str(e))
+                else:
+                    work_queue.complete(item["item_id"], self.owner, result)
+            except Exception as e:
+                # 数据库暂时不可用时稍后重试，未写回的工作项在租约过期后由其他线程重新领取
+                logging.error(f"访问工作队列失败: {e}")
+                self.stop.wait(crawler_config.get("work_poll_interval"))
+        for crawler in self._crawlers.values():
+            crawler.close_fetchers()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="分布式爬取工作进程")
+    arg_parser.add_argument("-t", "--threads", type=int, default=crawler_config.get("thread_workers"),
+                            help="并发抓取线程数，默认为 thread_workers 配置")
+    arg_parser.add_argument("--kinds", default=f"{KIND_LISTING},{KIND_THREAD}",
+                            help="处理的工作项类型，逗号分隔: listing, thread")
+    arg_parser.add_argument("--proxy", default=None, help="代理地址，默认使用提交任务时的代理")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s: %(message)s")
+    enable_shared_rate_limit()
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    stop = threading.Event()
+    threads = []
+    for index in range(max(1, args.threads)):
+        worker = CrawlWorker(index, kinds, proxy=args.proxy, stop=stop)
+        thread = threading.Thread(target=worker.run, name=f"worker-{index}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    logging.info(f"工作进程 {PROCESS_ID} 已启动，线程数: {len(threads)}，工作项类型: {', '.join(kinds)}")
+
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        logging.info("正在停止，等待进行中的工作项完成")
+        stop.set()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
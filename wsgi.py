@@ -0,0 +1,10 @@
+"""生产环境入口，多个工作进程共享任务状态，只有一个进程运行定时任务调度器
+
+gunicorn:  gunicorn -c gunicorn.conf.py wsgi:application
+waitress:  waitress-serve --listen=0.0.0.0:5000 --threads=16 wsgi:application
+"""
+from app import app, start_services
+
+start_services(shared=True)
+
+application = app